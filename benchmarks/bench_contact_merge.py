@@ -0,0 +1,72 @@
+"""
+Benchmark de la fusion des contacts: merge_and_deduplicate (contact par contact)
+contre merge_and_deduplicate_vectorized (pandas), sur des contacts synthétiques.
+
+Usage: python benchmarks/bench_contact_merge.py [nombre_de_contacts]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.chatwoot_prepare_contacts_service import (
+    merge_and_deduplicate, merge_and_deduplicate_vectorized
+)
+
+
+def synthetic_contacts(total: int, seed: int = 42):
+    """Contacts Zendesk/Intercom avec ~30% d'emails communs, doublons et contacts sans email"""
+    rng = random.Random(seed)
+    zendesk_total = total // 2
+    intercom_total = total - zendesk_total
+
+    def email(i):
+        return None if rng.random() < 0.05 else f"user{i}@example{i % 50}.com"
+
+    zendesk = [{
+        'id': i, 'email': email(i), 'name': f"Zendesk {i}", 'phone': f"+3361234{i:05d}"[:12],
+        'time_zone': 'Paris', 'locale': 'fr', 'organization_id': i % 100,
+        'created_at': '2024-01-01T00:00:00Z', 'tags': ['zd']
+    } for i in range(zendesk_total)]
+
+    intercom = []
+    for j in range(intercom_total):
+        # Une partie des contacts Intercom partage l'email d'un contact Zendesk
+        i = rng.randrange(zendesk_total) if rng.random() < 0.3 else zendesk_total + j
+        intercom.append({
+            'id': f"ic{j}", 'email': email(i), 'name': f"Intercom {j}", 'phone': None,
+            'avatar': None, 'external_id': str(j), 'location': {'country': 'France', 'city': 'Paris'},
+            'browser': 'firefox', 'os': 'linux', 'created_at': 1704067200,
+            'custom_attributes': {}, 'tags': []
+        })
+    return zendesk, intercom
+
+
+def without_timestamps(contacts):
+    return [{k: v for k, v in c.items() if not k.startswith('imported_from')} for c in contacts]
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    zendesk, intercom = synthetic_contacts(total)
+    print(f"Contacts synthétiques: {len(zendesk)} Zendesk, {len(intercom)} Intercom")
+
+    started = time.perf_counter()
+    python_contacts, python_stats = merge_and_deduplicate(zendesk, intercom)
+    python_time = time.perf_counter() - started
+    print(f"python: {python_time:.2f}s - {len(python_contacts)} contacts {python_stats}")
+
+    started = time.perf_counter()
+    pandas_contacts, pandas_stats = merge_and_deduplicate_vectorized(zendesk, intercom)
+    pandas_time = time.perf_counter() - started
+    print(f"pandas: {pandas_time:.2f}s - {len(pandas_contacts)} contacts {pandas_stats}")
+
+    same = python_stats == pandas_stats and without_timestamps(python_contacts) == without_timestamps(pandas_contacts)
+    print(f"Résultats identiques: {'oui' if same else 'NON'} - gain x{python_time / pandas_time:.1f}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""
+Benchmark du nettoyage: fonctions écrites à la main (version précédente, gardée ici comme
+référence) contre les projections compilées depuis les schémas déclarés
+(src.utils.projection), sur des exports synthétiques. Vérifie aussi que les sorties sont
+identiques, y compris sur des enregistrements incomplets.
+
+Usage: python benchmarks/bench_projection.py [--scale N] [--repeat 5]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_dataset import add_dataset_arguments, dataset_from_arguments
+from src.services import intercom_clean_service as intercom_clean
+from src.services import zendesk_clean_service as zendesk_clean
+
+
+# Références: boucles écrites à la main remplacées par les schémas
+
+def reference_zendesk_article(article: Dict) -> Dict:
+    return {
+        'id': article.get('id'),
+        'title': article.get('title'),
+        'content': article.get('body'),
+        'author_id': article.get('author_id'),
+        'created_at': article.get('created_at'),
+        'updated_at': article.get('updated_at'),
+        'locale': article.get('locale'),
+        'category_id': article.get('section_id')
+    }
+
+
+def reference_zendesk_macro(macro: Dict) -> Dict:
+    actions = macro.get('actions', [])
+    structured_actions = {}
+    for action in actions:
+        field = action.get('field')
+        value = action.get('value')
+        if field == 'comment_value_html':
+            structured_actions['comment'] = value
+        elif field == 'status':
+            structured_actions['status'] = value
+        elif field == 'assignee_id':
+            structured_actions['assignee_id'] = value
+        elif field == 'group_id':
+            structured_actions['group_id'] = value
+        else:
+            structured_actions[field] = value
+    return {
+        'id': macro.get('id'),
+        'title': macro.get('title'),
+        'raw_title': macro.get('raw_title'),
+        'description': macro.get('description'),
+        'active': macro.get('active'),
+        'default': macro.get('default'),
+        'position': macro.get('position'),
+        'actions': structured_actions,
+        'restriction': macro.get('restriction'),
+        'created_at': macro.get('created_at'),
+        'updated_at': macro.get('updated_at')
+    }
+
+
+def reference_zendesk_ticket(ticket: Dict) -> Dict:
+    comments = ticket.get('comments', [])
+    cleaned_comments = []
+    for comment in comments:
+        cleaned_comments.append({
+            'id': comment.get('id'),
+            'author_id': comment.get('author_id'),
+            'body': comment.get('body'),
+            'html_body': comment.get('html_body'),
+            'public': comment.get('public'),
+            'created_at': comment.get('created_at'),
+            'attachments': comment.get('attachments', [])
+        })
+    return {
+        'id': ticket.get('id'),
+        'subject': ticket.get('subject'),
+        'description': ticket.get('description'),
+        'status': ticket.get('status'),
+        'priority': ticket.get('priority'),
+        'type': ticket.get('type'),
+        'requester_id': ticket.get('requester_id'),
+        'assignee_id': ticket.get('assignee_id'),
+        'group_id': ticket.get('group_id'),
+        'organization_id': ticket.get('organization_id'),
+        'created_at': ticket.get('created_at'),
+        'updated_at': ticket.get('updated_at'),
+        'tags': ticket.get('tags', []),
+        'comments': cleaned_comments
+    }
+
+
+def reference_zendesk_user(user: Dict) -> Dict:
+    return {
+        'id': user.get('id'),
+        'name': user.get('name'),
+        'email': user.get('email'),
+        'phone': user.get('phone'),
+        'created_at': user.get('created_at'),
+        'updated_at': user.get('updated_at'),
+        'time_zone': user.get('time_zone'),
+        'locale': user.get('locale'),
+        'organization_id': user.get('organization_id'),
+        'active': user.get('active'),
+        'tags': user.get('tags', [])
+    }
+
+
+def reference_intercom_article(article: Dict) -> Dict:
+    tags_data = article.get('tags', {})
+    tags = []
+    if isinstance(tags_data, dict) and 'tags' in tags_data:
+        tags = [tag.get('name', '') for tag in tags_data.get('tags', [])]
+    return {
+        'id': article.get('id'),
+        'title': article.get('title'),
+        'description': article.get('description'),
+        'content': article.get('body'),
+        'author_id': article.get('author_id'),
+        'state': article.get('state'),
+        'parent_id': article.get('parent_id'),
+        'parent_type': article.get('parent_type'),
+        'created_at': article.get('created_at'),
+        'updated_at': article.get('updated_at'),
+        'tags': tags,
+        'url': article.get('url')
+    }
+
+
+def reference_intercom_contact(contact: Dict) -> Dict:
+    location = contact.get('location', {})
+    tags_data = contact.get('tags', {})
+    tags = []
+    if isinstance(tags_data, dict) and 'data' in tags_data:
+        tags = [tag.get('name', '') for tag in tags_data.get('data', [])]
+    companies_data = contact.get('companies', {})
+    company_ids = []
+    if isinstance(companies_data, dict) and 'data' in companies_data:
+        company_ids = [comp.get('id', '') for comp in companies_data.get('data', [])]
+    return {
+        'id': contact.get('id'),
+        'external_id': contact.get('external_id'),
+        'name': contact.get('name'),
+        'email': contact.get('email'),
+        'phone': contact.get('phone'),
+        'avatar': contact.get('avatar'),
+        'role': contact.get('role'),
+        'created_at': contact.get('created_at'),
+        'updated_at': contact.get('updated_at'),
+        'signed_up_at': contact.get('signed_up_at'),
+        'last_seen_at': contact.get('last_seen_at'),
+        'last_replied_at': contact.get('last_replied_at'),
+        'last_contacted_at': contact.get('last_contacted_at'),
+        'browser': contact.get('browser'),
+        'browser_language': contact.get('browser_language'),
+        'os': contact.get('os'),
+        'location': {
+            'country': location.get('country'),
+            'city': location.get('city'),
+            'country_code': location.get('country_code')
+        },
+        'tags': tags,
+        'company_ids': company_ids,
+        'unsubscribed_from_emails': contact.get('unsubscribed_from_emails'),
+        'custom_attributes': contact.get('custom_attributes', {})
+    }
+
+
+def reference_intercom_conversation(conversation: Dict) -> Dict:
+    contacts_data = conversation.get('contacts', {}).get('contacts', [])
+    contact_id = contacts_data[0].get('id') if contacts_data else None
+    source = conversation.get('source', {})
+    source_author = source.get('author', {})
+    messages = conversation.get('messages', [])
+    cleaned_messages = []
+    for message in messages:
+        if message.get('part_type') in ['comment', 'note']:
+            author = message.get('author', {})
+            cleaned_messages.append({
+                'id': message.get('id'),
+                'body': message.get('body'),
+                'message_type': message.get('part_type'),
+                'author_id': author.get('id'),
+                'author_type': author.get('type'),
+                'author_name': author.get('name'),
+                'author_email': author.get('email'),
+                'created_at': message.get('created_at'),
+                'attachments': message.get('attachments', [])
+            })
+    tags_data = conversation.get('tags', {})
+    tags = []
+    if isinstance(tags_data, dict) and 'tags' in tags_data:
+        tags = [tag.get('name', '') for tag in tags_data.get('tags', [])]
+    return {
+        'id': conversation.get('id'),
+        'title': conversation.get('title'),
+        'state': conversation.get('state'),
+        'open': conversation.get('open'),
+        'priority': conversation.get('priority'),
+        'contact_id': contact_id,
+        'admin_assignee_id': conversation.get('admin_assignee_id'),
+        'team_assignee_id': conversation.get('team_assignee_id'),
+        'created_at': conversation.get('created_at'),
+        'updated_at': conversation.get('updated_at'),
+        'waiting_since': conversation.get('waiting_since'),
+        'tags': tags,
+        'source': {
+            'subject': source.get('subject'),
+            'body': source.get('body'),
+            'author_name': source_author.get('name'),
+            'author_email': source_author.get('email')
+        },
+        'messages': cleaned_messages,
+        'message_count': len(cleaned_messages)
+    }
+
+
+# Enregistrements incomplets: clés absentes, listes vides, actions répétées
+EDGE_CASES = {
+    'zendesk_articles': [{}],
+    'zendesk_macros': [{}, {'actions': []}, {'actions': [
+        {'field': 'status', 'value': 'open'}, {'field': 'comment_value_html', 'value': '<p>a</p>'},
+        {'field': 'status', 'value': 'solved'}, {'field': None}]}],
+    'zendesk_tickets': [{}, {'comments': [{}], 'tags': None}],
+    'zendesk_users': [{}, {'tags': ['vip']}],
+    'intercom_articles': [{}, {'tags': {}}, {'tags': {'tags': [{'name': 'a'}, {}]}}, {'tags': []}],
+    'intercom_contacts': [{}, {'tags': {'data': [{}]}, 'companies': {'data': [{'id': 'c1'}]},
+                               'location': {'city': 'Lyon'}, 'custom_attributes': None}],
+    'intercom_conversations': [
+        {'contacts': {}, 'messages': []},
+        {'contacts': {'contacts': [{'id': 'u1'}, {'id': 'u2'}]}, 'source': {'author': {}},
+         'messages': [{'part_type': 'assignment'}, {'part_type': 'note', 'author': {'id': 'a1'}}, {'part_type': 'comment'}],
+         'tags': {'tags': [{'name': 'x'}]}}]
+}
+
+
+def entities(dataset):
+    """(nom, enregistrements bruts, référence, projection compilée)"""
+    return [
+        ('zendesk_articles', list(dataset.iter_zendesk_articles()), reference_zendesk_article, zendesk_clean.clean_article),
+        ('zendesk_macros', list(dataset.iter_zendesk_macros()), reference_zendesk_macro, zendesk_clean.clean_macro),
+        ('zendesk_tickets', list(dataset.iter_zendesk_tickets()), reference_zendesk_ticket, zendesk_clean.clean_ticket),
+        ('zendesk_users', list(dataset.iter_zendesk_users()), reference_zendesk_user, zendesk_clean.clean_user),
+        ('intercom_articles', list(dataset.iter_intercom_articles()), reference_intercom_article, intercom_clean.clean_article),
+        ('intercom_contacts', list(dataset.iter_intercom_contacts()), reference_intercom_contact, intercom_clean.clean_contact),
+        ('intercom_conversations', list(dataset.iter_intercom_conversations()), reference_intercom_conversation,
+         intercom_clean.clean_conversation)
+    ]
+
+
+def best_time(function, records, repeat: int) -> float:
+    """Meilleur temps sur repeat passes, ramasse-miettes désactivé (comme timeit)"""
+    best = float('inf')
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            [function(record) for record in records]
+            best = min(best, time.perf_counter() - started)
+    finally:
+        gc.enable()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Projections compilées contre nettoyage écrit à la main")
+    add_dataset_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=5, help="meilleur temps sur N passes")
+    args = parser.parse_args()
+    dataset = dataset_from_arguments(args)
+
+    identical = True
+    total_reference = total_compiled = 0.0
+    for name, records, reference, compiled in entities(dataset):
+        samples = records + EDGE_CASES[name]
+        same = [reference(record) for record in samples] == [compiled(record) for record in samples]
+        identical = identical and same
+        reference_seconds = best_time(reference, records, args.repeat)
+        compiled_seconds = best_time(compiled, records, args.repeat)
+        total_reference += reference_seconds
+        total_compiled += compiled_seconds
+        print(f"{name:>24}: {len(records):7d} items - à la main {reference_seconds * 1000:8.1f} ms, "
+              f"compilé {compiled_seconds * 1000:8.1f} ms (x{reference_seconds / compiled_seconds:.2f})"
+              f"{'' if same else ' - SORTIES DIFFÉRENTES'}")
+
+    print(f"Total: à la main {total_reference:.2f}s, compilé {total_compiled:.2f}s "
+          f"(x{total_reference / total_compiled:.2f}) - sorties identiques: {'oui' if identical else 'NON'}")
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Benchmark mémoire des messages en cours de traitement: dicts (json.loads) contre
+enregistrements compacts (src.utils.records, __slots__ + chaînes internées), sur des
+conversations préparées synthétiques. Mesure la mémoire retenue après chargement, le pic
+tracemalloc pendant le chargement et le temps de lecture/écriture.
+
+Usage: python benchmarks/bench_records.py [nombre_de_messages]
+"""
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.records import PREPARED_MESSAGES, json_default, record_hook
+
+MESSAGES_PER_CONVERSATION = 10
+
+
+def synthetic_conversations_json(total: int, seed: int = 42) -> str:
+    """Fichier de conversations préparées (format du stage prepare), ~total messages"""
+    rng = random.Random(seed)
+    agents = [f"Agent {i}" for i in range(20)]
+    conversations = []
+    for c in range(max(1, total // MESSAGES_PER_CONVERSATION)):
+        messages = [{
+            'source_message_id': f"source-{c}", 'content': f"Date originale: 2024-01-01\n\nDemande {c}",
+            'message_type': 'incoming', 'author_name': 'Client', 'created_at': 1704067200 + c
+        }]
+        for m in range(MESSAGES_PER_CONVERSATION - 1):
+            agent = rng.random() < 0.5
+            messages.append({
+                'source_message_id': c * MESSAGES_PER_CONVERSATION + m,
+                'content': f"Date originale: 2024-01-01\n\nMessage {m} de la conversation {c} " + "x" * rng.randrange(40, 160),
+                'content_type_msg': 'note' if rng.random() < 0.1 else 'comment',
+                'message_type': 'outgoing' if agent else 'incoming',
+                'author_name': rng.choice(agents) if agent else 'Client',
+                'created_at': 1704067200 + c + m,
+                'attachments': []
+            })
+        conversations.append({'contact_email': f"user{c}@example.com", 'title': f"Conversation {c}",
+                              'status': 'open', 'messages': messages})
+    return json.dumps({'conversations': conversations}, ensure_ascii=False)
+
+
+def measure(text: str, object_hook=None):
+    """Charger le JSON: (données, secondes, octets retenus, pic en octets)"""
+    # Temps mesuré sans tracemalloc, qui ralentit fortement les allocations
+    gc.collect()
+    started = time.perf_counter()
+    json.loads(text, object_hook=object_hook)
+    seconds = time.perf_counter() - started
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    data = json.loads(text, object_hook=object_hook)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return data, seconds, current - before, peak - before
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    text = synthetic_conversations_json(total)
+    messages = (total // MESSAGES_PER_CONVERSATION) * MESSAGES_PER_CONVERSATION
+    print(f"Messages synthétiques: {messages} ({len(text) / 1024 / 1024:.0f} MB de JSON)")
+
+    results = {}
+    for name, hook in (('dicts', None), ('records', record_hook(*PREPARED_MESSAGES))):
+        data, seconds, retained, peak = measure(text, hook)
+        started = time.perf_counter()
+        dumped = json.dumps(data, ensure_ascii=False, default=json_default)
+        dump_seconds = time.perf_counter() - started
+        results[name] = (retained, dumped)
+        print(f"{name:>8}: retenu {retained / 1024 / 1024:7.1f} MB ({retained / messages:5.0f} o/message), "
+              f"pic {peak / 1024 / 1024:7.1f} MB, lecture {seconds:.2f}s, écriture {dump_seconds:.2f}s")
+        del data, dumped
+        gc.collect()
+
+    same = results['dicts'][1] == results['records'][1]
+    print(f"Sérialisation identique: {'oui' if same else 'NON'} - "
+          f"mémoire x{results['dicts'][0] / results['records'][0]:.2f} "
+          f"(par million de messages: {results['dicts'][0] / messages:.0f} -> {results['records'][0] / messages:.0f} MB)")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,458 @@
+"""
+Serveurs locaux imitant les API Zendesk, Intercom et Chatwoot utilisées par le projet,
+pour mesurer le débit du pipeline sans comptes réels.
+
+Chaque service tourne sur son propre port avec:
+- une latence configurable (+ gigue aléatoire)
+- un quota en requêtes/minute: au-delà, réponse 429 avec Retry-After
+- la pagination réelle de chaque API (page/next_page, starting_after, end_of_stream)
+- l'injection d'erreurs 500 avec une probabilité donnée
+
+Usage:
+    # Lancer les serveurs et afficher les variables d'environnement à exporter
+    python benchmarks/fake_api_server.py --tickets 500 --latency 0.02 --rate-limit 3000
+
+    # Export, clean, transform, prepare et migrate_all_data de bout en bout contre les serveurs
+    python benchmarks/fake_api_server.py --tickets 200 --conversations 200 --end-to-end
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.synthetic_dataset import (
+    SyntheticDataset, add_dataset_arguments, dataset_from_arguments, epoch
+)
+
+
+class FakeDataset:
+    """
+    Données servies par les faux serveurs, produites par SyntheticDataset. Les listes
+    (utilisateurs, tickets, contacts, conversations) sont gardées en mémoire pour la pagination;
+    les commentaires et les parts de conversation sont générés à la requête.
+    """
+
+    def __init__(self, synthetic: SyntheticDataset):
+        self.synthetic = synthetic
+        self.zendesk_users = list(synthetic.iter_zendesk_users())
+        self.zendesk_tickets = [synthetic.zendesk_ticket(ticket_id) for ticket_id in range(1, synthetic.tickets + 1)]
+        self.zendesk_ticket_updated = [epoch(ticket['updated_at']) for ticket in self.zendesk_tickets]
+        self.intercom_contacts = list(synthetic.iter_intercom_contacts())
+        self.intercom_conversations = [synthetic.intercom_conversation(index)
+                                       for index in range(1, synthetic.conversations + 1)]
+
+        self.zendesk_articles = list(synthetic.iter_zendesk_articles())
+        self.zendesk_macros = list(synthetic.iter_zendesk_macros())
+        self.intercom_articles = list(synthetic.iter_intercom_articles())
+
+        self.zendesk_users_by_id = {user['id']: user for user in self.zendesk_users}
+        self.intercom_contacts_by_id = {contact['id']: contact for contact in self.intercom_contacts}
+        self.intercom_conversations_by_id = {conv['id']: conv for conv in self.intercom_conversations}
+
+    def zendesk_comments(self, ticket_id: int, base_url: str) -> List[Dict]:
+        return self.synthetic.zendesk_comments(self.zendesk_tickets[ticket_id - 1], base_url)
+
+    def intercom_parts(self, conversation: Dict, base_url: str) -> List[Dict]:
+        return self.synthetic.intercom_parts(conversation, base_url)
+
+
+class ChatwootState:
+    """Objets créés dans le faux Chatwoot (contacts uniques par email, conversations, messages)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.contacts = {}
+        self.emails = set()
+        self.conversations = {}
+        self.messages = 0
+
+    def summary(self) -> Dict[str, int]:
+        return {'contacts': len(self.contacts), 'conversations': len(self.conversations), 'messages': self.messages}
+
+
+class FakeApiServer(ThreadingHTTPServer):
+    """Serveur HTTP d'un service (zendesk, intercom ou chatwoot)"""
+
+    daemon_threads = True
+
+    def __init__(self, service: str, dataset: FakeDataset, port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, rate_limit: int = 0, retry_after: int = 1, error_rate: float = 0.0,
+                 page_size: int = 100, seed: int = 42):
+        super().__init__(('127.0.0.1', port), FakeApiHandler)
+        self.service = service
+        self.dataset = dataset
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit  # requêtes par minute, 0 = illimité
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.page_size = page_size
+        self.chatwoot = ChatwootState()
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window = deque()
+        self.counts = {'requests': 0, 'throttled': 0, 'errors': 0}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def admit(self) -> Tuple[int, float]:
+        """Décider du sort d'une requête: (statut forcé ou 0, latence à simuler)"""
+        with self.lock:
+            self.counts['requests'] += 1
+            now = time.monotonic()
+            if self.rate_limit:
+                while self.window and now - self.window[0] >= 60:
+                    self.window.popleft()
+                if len(self.window) >= self.rate_limit:
+                    self.counts['throttled'] += 1
+                    return 429, 0.0
+                self.window.append(now)
+            if self.error_rate and self.rng.random() < self.error_rate:
+                self.counts['errors'] += 1
+                return 500, self.latency
+            return 0, self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def start(self) -> 'FakeApiServer':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def page_slice(items: List, offset: int, size: int) -> Tuple[List, Optional[int]]:
+    """Une page d'éléments et l'offset de la suivante (None en fin de liste)"""
+    page = items[offset:offset + size]
+    return page, (offset + size if offset + size < len(items) else None)
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    server: FakeApiServer
+    protocol_version = 'HTTP/1.1'
+    # En-têtes et corps sont écrits séparément: sans TCP_NODELAY, Nagle + ACK différé
+    # ajoutent ~40 ms à chaque requête en keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    # Réponses
+
+    def send_json(self, status: int, payload, headers: Dict = None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self) -> Dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if raw and 'application/json' in (self.headers.get('Content-Type') or ''):
+            return json.loads(raw)
+        return {}
+
+    def handle_request(self, method: str):
+        parsed = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        body = self.read_body() if method in ('POST', 'PATCH') else {}
+
+        status, latency = self.server.admit()
+        if latency:
+            time.sleep(latency)
+        if status == 429:
+            return self.send_json(429, {'error': 'RateLimitExceeded'}, {'Retry-After': str(self.server.retry_after)})
+        if status:
+            return self.send_json(status, {'error': 'InternalServerError'})
+
+        if parsed.path.startswith('/attachments/'):
+            content = b'piece jointe de test\n'
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+            return
+
+        route = getattr(self, f"route_{self.server.service}")
+        result = route(method, parsed.path, query, body)
+        if result is None:
+            return self.send_json(404, {'error': 'RecordNotFound'})
+        self.send_json(*result) if isinstance(result, tuple) else self.send_json(200, result)
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PATCH(self):
+        self.handle_request('PATCH')
+
+    # Zendesk (/api/v2)
+
+    def route_zendesk(self, method: str, path: str, query: Dict, body: Dict):
+        dataset = self.server.dataset
+        base = f"{self.server.base_url}/api/v2"
+        path = path[len('/api/v2'):] if path.startswith('/api/v2') else path
+        path = path[:-5] if path.endswith('.json') else path
+        per_page = int(query.get('per_page', self.server.page_size))
+
+        def paginated(key: str, items: List[Dict], endpoint: str) -> Dict:
+            page = int(query.get('page', 1))
+            records, next_offset = page_slice(items, (page - 1) * per_page, per_page)
+            next_page = f"{base}/{endpoint}?page={page + 1}&per_page={per_page}" if next_offset is not None else None
+            return {key: records, 'next_page': next_page, 'previous_page': None, 'count': len(items)}
+
+        if path == '/users':
+            return paginated('users', dataset.zendesk_users, 'users.json')
+        if path == '/tickets':
+            return paginated('tickets', dataset.zendesk_tickets, 'tickets.json')
+        if path == '/help_center/articles':
+            return paginated('articles', dataset.zendesk_articles, 'help_center/articles.json')
+        if path == '/macros':
+            return paginated('macros', dataset.zendesk_macros, 'macros.json')
+        if path == '/users/show_many':
+            ids = [int(user_id) for user_id in query.get('ids', '').split(',') if user_id]
+            return {'users': [dataset.zendesk_users_by_id[user_id] for user_id in ids
+                              if user_id in dataset.zendesk_users_by_id]}
+
+        match = re.fullmatch(r'/tickets/(\d+)/comments', path)
+        if match:
+            ticket_id = int(match.group(1))
+            if not 1 <= ticket_id <= len(dataset.zendesk_tickets):
+                return None
+            return {'comments': dataset.zendesk_comments(ticket_id, self.server.base_url), 'next_page': None}
+
+        match = re.fullmatch(r'/users/(\d+)', path)
+        if match:
+            user = dataset.zendesk_users_by_id.get(int(match.group(1)))
+            return {'user': user} if user else None
+
+        if path in ('/incremental/users', '/incremental/tickets'):
+            # Curseur = offset dans la liste triée par mise à jour
+            start_time = int(query.get('start_time', 0))
+            items = dataset.zendesk_users if path == '/incremental/users' else [
+                ticket for ticket, updated in zip(dataset.zendesk_tickets, dataset.zendesk_ticket_updated)
+                if updated >= start_time]
+            key = path.rsplit('/', 1)[1]
+            offset = int(query.get('cursor', 0))
+            records, next_offset = page_slice(items, offset, per_page)
+            end_time = epoch(records[-1]['updated_at']) if records else start_time
+            next_page = (f"{base}{path}.json?start_time={query.get('start_time', 0)}&per_page={per_page}"
+                         f"&cursor={next_offset}") if next_offset is not None else None
+            return {key: records, 'next_page': next_page, 'end_of_stream': next_offset is None,
+                    'end_time': end_time, 'count': len(records)}
+        return None
+
+    # Intercom (racine)
+
+    def route_intercom(self, method: str, path: str, query: Dict, body: Dict):
+        dataset = self.server.dataset
+
+        def cursor_page(items: List[Dict], key: str, offset: int, per_page: int) -> Dict:
+            records, next_offset = page_slice(items, offset, per_page)
+            pages = {'type': 'pages', 'per_page': per_page}
+            if next_offset is not None:
+                pages['next'] = {'page': next_offset // per_page + 1, 'starting_after': str(next_offset)}
+            return {'type': 'list', key: records, 'pages': pages, 'total_count': len(items)}
+
+        per_page = int(query.get('per_page', self.server.page_size))
+        offset = int(query.get('starting_after', 0))
+
+        if method == 'GET' and path == '/contacts':
+            return cursor_page(dataset.intercom_contacts, 'data', offset, per_page)
+        if method == 'GET' and path == '/conversations':
+            return cursor_page(dataset.intercom_conversations, 'conversations', offset, per_page)
+        if method == 'GET' and path == '/articles':
+            records, next_offset = page_slice(dataset.intercom_articles, offset, per_page)
+            pages = {'type': 'pages'}
+            if next_offset is not None:
+                pages['next'] = f"{self.server.base_url}/articles?per_page={per_page}&starting_after={next_offset}"
+            return {'type': 'list', 'data': records, 'pages': pages}
+
+        match = re.fullmatch(r'/conversations/(\w+)', path)
+        if method == 'GET' and match:
+            conversation = dataset.intercom_conversations_by_id.get(match.group(1))
+            if not conversation:
+                return None
+            parts = dataset.intercom_parts(conversation, self.server.base_url)
+            return {**conversation, 'conversation_parts': {'type': 'conversation_part.list',
+                                                           'conversation_parts': parts, 'total_count': len(parts)}}
+
+        match = re.fullmatch(r'/contacts/(\w+)', path)
+        if method == 'GET' and match:
+            return dataset.intercom_contacts_by_id.get(match.group(1))
+
+        if method == 'POST' and path in ('/contacts/search', '/conversations/search'):
+            search = body.get('query', {})
+            pagination = body.get('pagination', {})
+            if path == '/contacts/search':
+                ids = set(search.get('value', [])) if search.get('operator') == 'IN' else set()
+                items, key = [contact for contact in dataset.intercom_contacts if contact['id'] in ids], 'data'
+            else:
+                since = int(search.get('value', 0))
+                items = sorted((conv for conv in dataset.intercom_conversations if conv['updated_at'] > since),
+                               key=lambda conv: conv['updated_at'])
+                key = 'conversations'
+            return cursor_page(items, key, int(pagination.get('starting_after', 0)),
+                               int(pagination.get('per_page', 150)))
+        return None
+
+    # Chatwoot (/api/v1)
+
+    def route_chatwoot(self, method: str, path: str, query: Dict, body: Dict):
+        state = self.server.chatwoot
+        match = re.fullmatch(r'/api/v1/accounts/(\d+)(/.*)?', path)
+        if not match:
+            return None
+        account_id, rest = int(match.group(1)), match.group(2) or ''
+
+        if method == 'GET' and rest == '':
+            return {'id': account_id, 'name': 'Compte de test', 'locale': 'fr'}
+
+        if rest == '/contacts':
+            if method == 'GET':
+                with state.lock:
+                    return {'payload': list(state.contacts.values())[:15], 'meta': {'count': len(state.contacts)}}
+            email = body.get('email')
+            with state.lock:
+                if email and email in state.emails:
+                    return 422, {'message': 'Email has already been taken'}
+                contact_id = len(state.contacts) + 1
+                contact = {'id': contact_id, 'name': body.get('name'), 'email': email,
+                           'contact_inboxes': [{'source_id': f"source-{contact_id}",
+                                                'inbox': {'id': body.get('inbox_id')}}]}
+                state.contacts[contact_id] = contact
+                if email:
+                    state.emails.add(email)
+            return {'payload': {'contact': contact, 'contact_inbox': contact['contact_inboxes'][0]}}
+
+        if method == 'POST' and rest == '/conversations':
+            with state.lock:
+                conversation_id = len(state.conversations) + 1
+                state.conversations[conversation_id] = {'id': conversation_id, 'status': body.get('status', 'open'),
+                                                        'contact_id': body.get('contact_id'), 'messages': 0}
+            return {'id': conversation_id, 'account_id': account_id, 'inbox_id': body.get('inbox_id'),
+                    'status': body.get('status', 'open')}
+
+        match = re.fullmatch(r'/conversations/(\d+)(/messages|/toggle_status)?', rest)
+        if match:
+            with state.lock:
+                conversation = state.conversations.get(int(match.group(1)))
+                if not conversation:
+                    return None
+                if match.group(2) == '/messages' and method == 'POST':
+                    conversation['messages'] += 1
+                    state.messages += 1
+                    return {'id': state.messages, 'conversation_id': conversation['id'],
+                            'content': body.get('content'), 'message_type': body.get('message_type')}
+                if match.group(2) == '/toggle_status' and method == 'POST':
+                    conversation['status'] = body.get('status') or conversation['status']
+                    return {'payload': {'success': True, 'conversation_id': conversation['id'],
+                                        'current_status': conversation['status']}}
+                if match.group(2) is None and method == 'GET':
+                    return dict(conversation)
+        return None
+
+
+def start_fake_servers(dataset: FakeDataset, latency: float = 0.0, jitter: float = 0.0,
+                       rate_limits: Dict[str, int] = None, retry_after: int = 1, error_rate: float = 0.0,
+                       page_size: int = 100) -> Dict[str, FakeApiServer]:
+    """Démarrer un serveur par service sur des ports libres"""
+    rate_limits = rate_limits or {}
+    return {
+        service: FakeApiServer(service, dataset, latency=latency, jitter=jitter,
+                               rate_limit=rate_limits.get(service, 0), retry_after=retry_after,
+                               error_rate=error_rate, page_size=page_size).start()
+        for service in ('zendesk', 'intercom', 'chatwoot')
+    }
+
+
+def server_environment(servers: Dict[str, FakeApiServer]) -> Dict[str, str]:
+    """Variables d'environnement pointant les clients vers les serveurs locaux"""
+    return {
+        'ZENDESK_BASE_URL': f"{servers['zendesk'].base_url}/api/v2",
+        'ZENDESK_DOMAIN': 'localhost', 'ZENDESK_EMAIL': 'bench@example.com', 'ZENDESK_API_TOKEN': 'fake',
+        'ZENDESK_TICKET_PAUSE': '0',
+        'INTERCOM_BASE_URL': servers['intercom'].base_url, 'INTERCOM_ACCESS_TOKEN': 'fake',
+        'CHATWOOT_BASE_URL': servers['chatwoot'].base_url, 'CHATWOOT_API_ACCESS_TOKEN': 'fake',
+        'CHATWOOT_ACCOUNT_ID': '2'
+    }
+
+
+def run_end_to_end(servers: Dict[str, FakeApiServer], workers: int, schedule: str) -> Dict:
+    """
+    Exécuter le pipeline complet contre les serveurs dans un dossier temporaire.
+    La configuration est lue à l'import: les variables sont posées avant d'importer src.
+    """
+    os.environ.update(server_environment(servers))
+    workdir = tempfile.mkdtemp(prefix='fake_api_run_')
+    os.chdir(workdir)
+    for directory in ('zendesk/origin_export', 'intercom/origin_export', 'chatwoot'):
+        os.makedirs(f"outputs/{directory}", exist_ok=True)
+
+    from src.main import STAGES, run_stages
+    from src.utils.metrics import get_metrics
+    from src.utils.run_manifest import get_manifest
+
+    get_manifest().start_run()
+    started = time.time()
+    run_stages(STAGES, workers=workers, schedule=schedule)
+
+    get_metrics().print_summary()
+    return {'workdir': workdir, 'seconds': round(time.time() - started, 1),
+            'chatwoot': servers['chatwoot'].chatwoot.summary(),
+            'servers': {service: server.counts for service, server in servers.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux serveurs Zendesk, Intercom et Chatwoot")
+    add_dataset_arguments(parser)
+    parser.add_argument('--latency', type=float, default=0.0, help="latence par requête (secondes)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="latence aléatoire ajoutée (secondes)")
+    parser.add_argument('--rate-limit', type=int, default=0, help="requêtes/minute par service (0 = illimité)")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="probabilité d'une réponse 500")
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--end-to-end', action='store_true', help="exécuter le pipeline complet puis s'arrêter")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--schedule', default='longest_first')
+    args = parser.parse_args()
+
+    dataset = FakeDataset(dataset_from_arguments(args))
+    rate_limits = {service: args.rate_limit for service in ('zendesk', 'intercom', 'chatwoot')}
+    servers = start_fake_servers(dataset, args.latency, args.jitter, rate_limits, args.retry_after,
+                                 args.error_rate, args.page_size)
+
+    if args.end_to_end:
+        print(json.dumps(run_end_to_end(servers, args.workers, args.schedule), indent=2))
+        return
+
+    for name, value in server_environment(servers).items():
+        print(f"export {name}={value}")
+    print("Serveurs prêts (Ctrl+C pour arrêter)")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
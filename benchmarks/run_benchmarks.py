@@ -0,0 +1,262 @@
+"""
+Suite de benchmarks des stages du pipeline avec seuils de régression.
+
+Pour chaque taille de jeu de données, les exports synthétiques (synthetic_dataset.py) sont
+générés dans un dossier temporaire puis chaque stage est exécuté dans l'ordre du pipeline:
+conversions HTML/Markdown, chaque *_clean_*, les deux transforms, les deux prepare et
+migrate_all_data contre le faux Chatwoot local (fake_api_server.py).
+
+Temps: meilleur de --repeat exécutions. Mémoire: pic tracemalloc d'une exécution à part.
+Les mesures sont comparées aux références de benchmarks/baselines.json: un stage plus lent
+ou plus gourmand que sa référence au-delà des tolérances fait échouer le run (code 1).
+Les références dépendent de la machine: les régénérer avec --update-baseline sur la machine
+qui exécute la suite.
+
+Usage:
+    python benchmarks/run_benchmarks.py                       # tailles 1000 et 10000
+    python benchmarks/run_benchmarks.py --sizes 1000 --stages clean,transform
+    python benchmarks/run_benchmarks.py --update-baseline
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.synthetic_dataset import SyntheticDataset
+from benchmarks.fake_api_server import ChatwootState, FakeApiServer, FakeDataset
+
+BASELINE_PATH = os.path.join(ROOT_DIR, 'benchmarks', 'baselines.json')
+
+
+class Stage:
+    """Stage mesuré: fonction à exécuter et artefact produit (oublié avant chaque exécution)"""
+
+    def __init__(self, name: str, group: str, run: Callable[[], object], artifact: Optional[str] = None):
+        self.name = name
+        self.group = group
+        self.run = run
+        self.artifact = artifact
+
+
+def build_stages(dataset: SyntheticDataset, chatwoot: FakeApiServer, import_limit: int) -> List[Stage]:
+    """Stages dans l'ordre du pipeline (la sortie de chacun est l'entrée du suivant)"""
+    from src.utils.helpers import clean_markdown_formatting, html_to_markdown
+    from src.services import zendesk_clean_service as zendesk_clean
+    from src.services import intercom_clean_service as intercom_clean
+    from src.services.zendesk_transform_service import zendesk_transform_tickets
+    from src.services.intercom_transform_service import intercom_transform_conversations
+    from src.services.chatwoot_prepare_contacts_service import prepare_contacts_for_chatwoot
+    from src.services.chatwoot_prepare_conversations_service import prepare_conversations_for_chatwoot
+    from src.services.chatwoot_service import migrate_all_data
+
+    # Corps HTML et textes représentatifs pour les conversions unitaires
+    html_bodies = [comment['html_body'] for ticket_id in range(1, min(dataset.tickets, 2000) + 1)
+                   for comment in dataset.zendesk_comments(dataset.zendesk_ticket(ticket_id))]
+    texts = [body.replace('\n', '<br>') for body in
+             (dataset.zendesk_ticket(ticket_id)['description'] for ticket_id in range(1, min(dataset.tickets, 2000) + 1))]
+
+    def migrate():
+        # Chatwoot vierge à chaque exécution (les emails déjà créés seraient refusés)
+        chatwoot.chatwoot = ChatwootState()
+        migrate_all_data(limit=import_limit, workers=4, schedule='longest_first')
+
+    return [
+        Stage('html_to_markdown', 'helpers', lambda: [html_to_markdown(body) for body in html_bodies]),
+        Stage('clean_markdown_formatting', 'helpers', lambda: [clean_markdown_formatting(text) for text in texts]),
+        Stage('zendesk_clean_tickets', 'clean', lambda: zendesk_clean.zendesk_clean_tickets(False), 'zendesk_tickets_clean'),
+        Stage('zendesk_clean_users', 'clean', lambda: zendesk_clean.zendesk_clean_users(False), 'zendesk_users_clean'),
+        Stage('zendesk_clean_articles', 'clean', lambda: zendesk_clean.zendesk_clean_articles(False),
+              'zendesk_articles_clean'),
+        Stage('zendesk_clean_macros', 'clean', lambda: zendesk_clean.zendesk_clean_macros(False), 'zendesk_macros_clean'),
+        Stage('intercom_clean_conversations', 'clean', lambda: intercom_clean.intercom_clean_conversations(False),
+              'intercom_conversations_clean'),
+        Stage('intercom_clean_contacts', 'clean', lambda: intercom_clean.intercom_clean_contacts(False),
+              'intercom_contacts_clean'),
+        Stage('intercom_clean_articles', 'clean', lambda: intercom_clean.intercom_clean_articles(False),
+              'intercom_articles_clean'),
+        Stage('zendesk_transform_tickets', 'transform', lambda: zendesk_transform_tickets(False),
+              'zendesk_tickets_transformed'),
+        Stage('intercom_transform_conversations', 'transform', lambda: intercom_transform_conversations(False),
+              'intercom_conversations_transformed'),
+        Stage('prepare_contacts_for_chatwoot', 'prepare', prepare_contacts_for_chatwoot, 'chatwoot_contacts_prepared'),
+        Stage('prepare_conversations_for_chatwoot', 'prepare', lambda: prepare_conversations_for_chatwoot(False, False),
+              'chatwoot_conversations_prepared'),
+        Stage('migrate_all_data', 'import', migrate),
+    ]
+
+
+def measure(stage: Stage, repeat: int) -> Dict[str, float]:
+    """Meilleur temps sur `repeat` exécutions, puis pic mémoire tracemalloc sur une exécution"""
+    from src.utils.run_manifest import get_manifest
+
+    def run_once():
+        if stage.artifact:
+            # Sinon le stage serait ignoré (entrées inchangées depuis l'exécution précédente)
+            get_manifest().data['artifacts'].pop(stage.artifact, None)
+        with contextlib.redirect_stdout(io.StringIO()):
+            stage.run()
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run_once()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        run_once()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'seconds': round(min(timings), 4), 'peak_mb': round(peak / 1024 / 1024, 2)}
+
+
+def benchmark_size(size: int, groups: Optional[List[str]], repeat: int, import_limit: int) -> Dict[str, Dict]:
+    """Générer le jeu de données d'une taille puis mesurer chaque stage"""
+    from benchmarks.synthetic_dataset import generate_exports
+    from src.utils import run_manifest
+
+    workdir = tempfile.mkdtemp(prefix=f"bench_{size}_")
+    os.chdir(workdir)
+    run_manifest._manifest = None  # manifeste propre au dossier de cette taille
+    run_manifest.get_manifest().start_run()
+
+    # Pièces jointes désactivées: l'import les téléchargerait depuis des URL externes
+    dataset = SyntheticDataset(tickets=size, users=max(1, size // 2), conversations=size,
+                               contacts=max(1, size // 2), articles=max(10, size // 100),
+                               macros=max(5, size // 200), attachment_rate=0.0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        generate_exports(dataset)
+
+    results = {}
+    for stage in build_stages(dataset, CHATWOOT_SERVER, import_limit):
+        if groups and stage.group not in groups and stage.name not in groups:
+            if stage.artifact:
+                # Non mesuré, mais sa sortie est l'entrée des stages suivants
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stage.run()
+            continue
+        results[stage.name] = measure(stage, repeat)
+        print(f"  {stage.name:<36} {results[stage.name]['seconds']:>9.3f}s {results[stage.name]['peak_mb']:>9.1f} MB")
+
+    os.chdir(ROOT_DIR)
+    shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict, time_tolerance: float, memory_tolerance: float,
+            min_seconds: float, min_mb: float) -> List[Tuple[str, str, str]]:
+    """Régressions par rapport aux références: [(taille, stage, raison)]"""
+    regressions = []
+    for size, stages in results.items():
+        for name, measured in stages.items():
+            reference = baseline.get('sizes', {}).get(size, {}).get(name)
+            if not reference:
+                continue
+            slower = measured['seconds'] - reference['seconds']
+            if slower > min_seconds and measured['seconds'] > reference['seconds'] * (1 + time_tolerance):
+                regressions.append((size, name, f"temps {reference['seconds']:.3f}s -> {measured['seconds']:.3f}s "
+                                                f"(+{100 * slower / reference['seconds']:.0f}%)"))
+            heavier = measured['peak_mb'] - reference['peak_mb']
+            if heavier > min_mb and measured['peak_mb'] > reference['peak_mb'] * (1 + memory_tolerance):
+                regressions.append((size, name, f"mémoire {reference['peak_mb']:.1f} MB -> {measured['peak_mb']:.1f} MB "
+                                                f"(+{100 * heavier / max(reference['peak_mb'], 0.01):.0f}%)"))
+    return regressions
+
+
+def machine_info() -> Dict[str, str]:
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'processor': platform.machine(),
+            'cpus': str(os.cpu_count())}
+
+
+def load_baseline(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, baseline: Dict, results: Dict[str, Dict]):
+    baseline.setdefault('sizes', {})
+    for size, stages in results.items():
+        baseline['sizes'].setdefault(size, {}).update(stages)
+    baseline['machine'] = machine_info()
+    baseline['updated_at'] = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+CHATWOOT_SERVER: Optional[FakeApiServer] = None
+
+
+def main():
+    global CHATWOOT_SERVER
+
+    parser = argparse.ArgumentParser(description="Benchmarks des stages avec seuils de régression")
+    parser.add_argument('--sizes', default='1000,10000', help="tailles (tickets et conversations), séparées par des virgules")
+    parser.add_argument('--stages', default=None,
+                        help="groupes (helpers, clean, transform, prepare, import) ou noms de stages, séparés par des virgules")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--import-limit', type=int, default=200, help="contacts importés par migrate_all_data")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help="enregistrer les mesures comme références")
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help="ralentissement toléré (0.25 = +25%%)")
+    parser.add_argument('--memory-tolerance', type=float, default=0.10, help="hausse mémoire tolérée")
+    parser.add_argument('--min-seconds', type=float, default=0.05, help="écart de temps ignoré (bruit)")
+    parser.add_argument('--min-mb', type=float, default=1.0, help="écart mémoire ignoré (bruit)")
+    parser.add_argument('--output', default=None, help="écrire les mesures dans ce fichier JSON")
+    args = parser.parse_args()
+
+    # Faux Chatwoot sans latence ni quota; la configuration est lue à l'import de src
+    CHATWOOT_SERVER = FakeApiServer('chatwoot', FakeDataset(SyntheticDataset(0, 0, 0, 0, 0, 0))).start()
+    os.environ.update({'CHATWOOT_BASE_URL': CHATWOOT_SERVER.base_url, 'CHATWOOT_API_ACCESS_TOKEN': 'fake',
+                       'CHATWOOT_RATE_LIMIT': '1000000000', 'STAGING_BACKEND': 'json'})
+
+    groups = args.stages.split(',') if args.stages else None
+    results = {}
+    for size in (int(value) for value in args.sizes.split(',')):
+        print(f"\nTaille {size}:")
+        results[str(size)] = benchmark_size(size, groups, args.repeat, args.import_limit)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'machine': machine_info(), 'sizes': results}, f, indent=2)
+
+    baseline = load_baseline(args.baseline)
+    if args.update_baseline:
+        save_baseline(args.baseline, baseline, results)
+        print(f"\nRéférences enregistrées: {args.baseline}")
+        return
+
+    if not baseline:
+        print(f"\nAucune référence ({args.baseline}): lancer avec --update-baseline")
+        return
+    if baseline.get('machine', {}).get('platform') != machine_info()['platform']:
+        print("\n⚠ Références mesurées sur une autre machine: comparaison indicative")
+
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance,
+                          args.min_seconds, args.min_mb)
+    if regressions:
+        print(f"\n{len(regressions)} régression(s):")
+        for size, name, reason in regressions:
+            print(f"  [{size}] {name}: {reason}")
+        sys.exit(1)
+    print("\nAucune régression par rapport aux références")
+
+
+if __name__ == "__main__":
+    main()
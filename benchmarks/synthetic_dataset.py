@@ -0,0 +1,452 @@
+"""
+Générateur de jeux de données synthétiques au format des exports d'origine
+(origin_export): tickets Zendesk avec commentaires, utilisateurs Zendesk,
+conversations Intercom avec messages, contacts Intercom.
+
+Les fichiers sont écrits en flux (mémoire constante) puis enregistrés dans le manifeste
+du run: les stages clean, transform et prepare les lisent comme un export réel.
+
+Usage:
+    python benchmarks/synthetic_dataset.py --scale 100000
+    python benchmarks/synthetic_dataset.py --tickets 1000000 --users 300000 --conversations 0 --contacts 0 \\
+        --message-words 80 --html-complexity 2 --attachment-rate 0.1 --duplicate-email-rate 0.3 \\
+        --workdir /tmp/bench_1m
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+END_EPOCH = 1735689600  # 2025-01-01
+
+WORDS = (
+    "bonjour merci commande facture livraison compte accès formation vidéo cours certificat paiement "
+    "remboursement abonnement problème erreur connexion mot de passe plateforme module chapitre "
+    "exercice question réponse délai semaine lien téléchargement support équipe client rapidement "
+    "besoin aide urgent email adresse numéro dossier licence entreprise devis session inscription"
+).split()
+FIRST_NAMES = ["Jean", "Marie", "Pierre", "Sophie", "Luc", "Claire", "Ahmed", "Fatima", "Paul", "Julie",
+               "Karim", "Emma", "Hugo", "Léa", "Nicolas", "Camille", "Yann", "Inès", "Thomas", "Sarah"]
+LAST_NAMES = ["Dupont", "Martin", "Bernard", "Durand", "Lefebvre", "Moreau", "Benali", "Laurent", "Simon",
+              "Michel", "Garcia", "Roux", "Fournier", "Girard", "Bonnet", "Mercier", "Faure", "André"]
+DOMAINS = ["gmail.com", "yahoo.fr", "outlook.com", "orange.fr", "free.fr", "entreprise.fr", "hotmail.com"]
+TAGS = ["support", "facturation", "technique", "formation", "urgent", "b2b", "remboursement", "vip"]
+STATUSES = ["new", "open", "pending", "hold", "solved", "closed"]
+
+
+def iso(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def epoch(iso_date: str) -> int:
+    return int(datetime.strptime(iso_date, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc).timestamp())
+
+
+class SyntheticDataset:
+    """
+    Enregistrements déterministes: chaque enregistrement a son propre générateur aléatoire
+    (seed, type, index), on peut donc produire l'enregistrement i sans produire les précédents.
+
+    - message_words / message_sigma: longueur des messages (loi log-normale, médiane en mots)
+    - html_complexity: 0 texte en paragraphes, 1 + gras/italique/liens, 2 + listes, tableaux,
+      div imbriqués, styles en ligne et images
+    - attachment_rate: probabilité qu'un message ait une pièce jointe
+    - duplicate_email_rate: part des contacts Intercom qui reprennent l'email d'un utilisateur
+      Zendesk (parfois avec une casse différente)
+    """
+
+    def __init__(self, tickets: int = 1000, users: int = 500, conversations: int = 1000, contacts: int = 500,
+                 articles: int = 100, macros: int = 50, comments_per_ticket: float = 4.0, parts_per_conversation: float = 4.0,
+                 message_words: int = 40, message_sigma: float = 0.8, html_complexity: int = 1,
+                 attachment_rate: float = 0.05, duplicate_email_rate: float = 0.3, agents: int = 10,
+                 days: int = 730, seed: int = 42):
+        self.tickets = tickets
+        self.users = users
+        self.conversations = conversations
+        self.contacts = contacts
+        self.articles = articles
+        self.macros = macros
+        self.comments_per_ticket = comments_per_ticket
+        self.parts_per_conversation = parts_per_conversation
+        self.message_words = message_words
+        self.message_sigma = message_sigma
+        self.html_complexity = html_complexity
+        self.attachment_rate = attachment_rate
+        self.duplicate_email_rate = duplicate_email_rate
+        self.agents = min(agents, users)
+        self.start_epoch = END_EPOCH - days * 86400
+        self.span = days * 86400
+        self.seed = seed
+
+    def _rng(self, kind: int, index) -> random.Random:
+        return random.Random(f"{self.seed}:{kind}:{index}")
+
+    # Contenu
+
+    def _message_length(self, rng: random.Random) -> int:
+        return max(1, int(rng.lognormvariate(math.log(self.message_words), self.message_sigma)))
+
+    def _sentences(self, rng: random.Random, words: int) -> List[str]:
+        tokens = rng.choices(WORDS, k=words)
+        sentences = []
+        for start in range(0, words, 12):
+            sentence = ' '.join(tokens[start:start + 12])
+            sentences.append(sentence[:1].upper() + sentence[1:] + '.')
+        return sentences
+
+    def text(self, rng: random.Random) -> str:
+        """Message en texte brut (paragraphes séparés par une ligne vide)"""
+        sentences = self._sentences(rng, self._message_length(rng))
+        return '\n\n'.join(' '.join(sentences[start:start + 3]) for start in range(0, len(sentences), 3))
+
+    def html(self, rng: random.Random) -> str:
+        """Message HTML selon html_complexity"""
+        sentences = self._sentences(rng, self._message_length(rng))
+        blocks = []
+        for start in range(0, len(sentences), 3):
+            paragraph = ' '.join(sentences[start:start + 3])
+            if self.html_complexity >= 1:
+                words = paragraph.split(' ')
+                position = rng.randrange(len(words))
+                style = rng.choice(['<b>{}</b>', '<i>{}</i>', '<a href="https://alphorm.com/aide">{}</a>'])
+                words[position] = style.format(words[position])
+                paragraph = ' '.join(words)
+            blocks.append(f"<p>{paragraph}</p>")
+
+        if self.html_complexity >= 2:
+            if rng.random() < 0.5:
+                items = ''.join(f"<li>{' '.join(rng.choices(WORDS, k=4))}</li>" for _ in range(rng.randint(2, 5)))
+                blocks.append(f"<ul>{items}</ul>")
+            if rng.random() < 0.2:
+                rows = ''.join(f"<tr><td>{rng.choice(WORDS)}</td><td>{rng.randint(1, 999)} €</td></tr>"
+                               for _ in range(rng.randint(2, 4)))
+                blocks.append(f'<table style="border:1px solid #ccc">{rows}</table>')
+            if rng.random() < 0.1:
+                blocks.append('<img src="https://alphorm.com/logo.png" alt="logo" width="120">')
+            blocks = [f'<div class="zd-comment" dir="auto"><div style="color:#333">{"".join(blocks)}</div></div>']
+        return ''.join(blocks)
+
+    def _attachments(self, rng: random.Random, message_id, base_url: str, intercom: bool) -> List[Dict]:
+        if rng.random() >= self.attachment_rate:
+            return []
+        extension, content_type = rng.choice([('pdf', 'application/pdf'), ('png', 'image/png'),
+                                              ('txt', 'text/plain')])
+        name = f"piece_{message_id}.{extension}"
+        size = rng.randint(1_000, 2_000_000)
+        if intercom:
+            return [{'type': 'upload', 'name': name, 'url': f"{base_url}/attachments/{name}",
+                     'content_type': content_type, 'filesize': size}]
+        return [{'id': message_id, 'file_name': name, 'content_url': f"{base_url}/attachments/{name}",
+                 'content_type': content_type, 'size': size, 'inline': False}]
+
+    def _count(self, rng: random.Random, mean: float) -> int:
+        """Nombre de messages: au moins 1, queue longue (loi géométrique de moyenne `mean`)"""
+        if mean <= 1:
+            return 1
+        return 1 + int(math.log(1 - rng.random()) / math.log(1 - 1 / mean))
+
+    def _person(self, rng: random.Random, index: int) -> Dict:
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        email = f"{first}.{last}{index}@{rng.choice(DOMAINS)}".lower()
+        return {'name': f"{first} {last}", 'email': email}
+
+    # Zendesk
+
+    def zendesk_user(self, user_id: int) -> Dict:
+        rng = self._rng(1, user_id)
+        person = self._person(rng, user_id)
+        created = self.start_epoch + rng.randrange(self.span)
+        agent = user_id <= self.agents
+        return {
+            'id': user_id, 'url': None, 'name': person['name'],
+            'email': None if not agent and rng.random() < 0.03 else person['email'],
+            'phone': f"+336{rng.randrange(10 ** 8):08d}" if rng.random() < 0.4 else None,
+            'role': 'agent' if agent else 'end-user', 'active': rng.random() > 0.02, 'verified': True,
+            'created_at': iso(created), 'updated_at': iso(created + rng.randrange(86400 * 30)),
+            'time_zone': 'Paris', 'locale': 'fr', 'organization_id': rng.randrange(1, 200) if rng.random() < 0.2 else None,
+            'tags': rng.sample(TAGS, rng.randint(0, 2)), 'user_fields': {}
+        }
+
+    def zendesk_ticket(self, ticket_id: int) -> Dict:
+        rng = self._rng(2, ticket_id)
+        created = self.start_epoch + rng.randrange(self.span)
+        updated = min(END_EPOCH, created + rng.randrange(86400 * 10))
+        requester_id = rng.randint(self.agents + 1, max(self.agents + 1, self.users))
+        return {
+            'id': ticket_id, 'url': None, 'external_id': None, 'via': {'channel': rng.choice(['email', 'web', 'api'])},
+            'subject': ' '.join(rng.choices(WORDS, k=rng.randint(3, 8))).capitalize(),
+            'description': self.text(rng),
+            'status': rng.choice(STATUSES), 'priority': rng.choice([None, 'low', 'normal', 'high', 'urgent']),
+            'type': rng.choice([None, 'question', 'incident', 'problem']),
+            'requester_id': requester_id, 'submitter_id': requester_id,
+            'assignee_id': rng.randint(1, max(1, self.agents)), 'group_id': rng.randrange(1, 5),
+            'organization_id': None, 'created_at': iso(created), 'updated_at': iso(updated),
+            'tags': rng.sample(TAGS, rng.randint(0, 3)), 'custom_fields': []
+        }
+
+    def zendesk_comments(self, ticket: Dict, base_url: str = "https://alphorm.zendesk.com") -> List[Dict]:
+        rng = self._rng(3, ticket['id'])
+        created = epoch(ticket['created_at'])
+        comments = []
+        for position in range(self._count(rng, self.comments_per_ticket)):
+            comment_id = ticket['id'] * 1000 + position
+            from_requester = position % 2 == 0
+            if position == 0:
+                html_body = ''.join(f"<p>{paragraph}</p>" for paragraph in ticket['description'].split('\n\n'))
+            else:
+                html_body = self.html(rng)
+            comments.append({
+                'id': comment_id, 'type': 'Comment',
+                'author_id': ticket['requester_id'] if from_requester else ticket['assignee_id'],
+                'body': html_body.replace('<p>', '').replace('</p>', '\n\n').strip(),
+                'html_body': html_body, 'plain_body': None,
+                'public': from_requester or rng.random() > 0.15,
+                'created_at': iso(created + position * rng.randint(600, 86400)),
+                'attachments': self._attachments(rng, comment_id, base_url, intercom=False),
+                'via': ticket['via']
+            })
+        return comments
+
+    # Intercom
+
+    def intercom_contact(self, index: int) -> Dict:
+        rng = self._rng(4, index)
+        person = self._person(rng, self.users + index)
+        if self.users and rng.random() < self.duplicate_email_rate:
+            # Même personne que côté Zendesk: email repris, parfois avec une autre casse
+            duplicate = self.zendesk_user(rng.randint(self.agents + 1, max(self.agents + 1, self.users)))
+            person = {'name': duplicate['name'], 'email': duplicate['email']}
+            if person['email'] and rng.random() < 0.3:
+                person['email'] = person['email'].capitalize()
+        created = self.start_epoch + rng.randrange(self.span)
+        return {
+            'type': 'contact', 'id': f"{self.seed:08x}{index:016x}", 'workspace_id': 'bench',
+            'external_id': str(index), 'role': rng.choice(['user', 'user', 'lead']),
+            'email': person['email'], 'name': person['name'],
+            'phone': f"+336{rng.randrange(10 ** 8):08d}" if rng.random() < 0.3 else None, 'avatar': None,
+            'created_at': created, 'updated_at': created + rng.randrange(86400 * 30), 'signed_up_at': created,
+            'last_seen_at': created + rng.randrange(86400 * 60), 'last_replied_at': None, 'last_contacted_at': None,
+            'browser': rng.choice(['chrome', 'firefox', 'safari']), 'browser_language': 'fr',
+            'os': rng.choice(['Windows 10', 'OS X', 'Linux', 'Android']),
+            'location': {'type': 'location', 'country': 'France', 'city': rng.choice(['Paris', 'Lyon', 'Lille']),
+                         'country_code': 'FRA'},
+            'tags': {'type': 'list', 'data': [{'type': 'tag', 'id': tag, 'name': tag}
+                                              for tag in rng.sample(TAGS, rng.randint(0, 2))]},
+            'companies': {'type': 'list', 'data': []},
+            'unsubscribed_from_emails': False, 'custom_attributes': {'plan': rng.choice(['free', 'pro'])}
+        }
+
+    def intercom_conversation(self, index: int) -> Dict:
+        rng = self._rng(5, index)
+        contact = self.intercom_contact(rng.randint(1, self.contacts)) if self.contacts else None
+        created = self.start_epoch + rng.randrange(self.span)
+        author = {'type': 'user', 'id': contact['id'] if contact else None,
+                  'name': contact['name'] if contact else None, 'email': contact['email'] if contact else None}
+        return {
+            'type': 'conversation', 'id': str(10 ** 9 + index), 'title': None,
+            'state': rng.choice(['open', 'closed', 'closed', 'snoozed']), 'open': True, 'read': True,
+            'priority': rng.choice(['priority', 'not_priority']),
+            'admin_assignee_id': rng.randint(1, max(1, self.agents)), 'team_assignee_id': None,
+            'created_at': created, 'updated_at': created + rng.randrange(86400 * 10), 'waiting_since': None,
+            'source': {'type': 'conversation', 'id': str(index), 'delivered_as': 'customer_initiated',
+                       'subject': '', 'body': self.html(rng), 'author': author, 'attachments': []},
+            'contacts': {'type': 'contact.list',
+                         'contacts': [{'type': 'contact', 'id': contact['id']}] if contact else []},
+            'tags': {'type': 'tag.list', 'tags': [{'type': 'tag', 'id': tag, 'name': tag}
+                                                   for tag in rng.sample(TAGS, rng.randint(0, 2))]}
+        }
+
+    def intercom_parts(self, conversation: Dict, base_url: str = "https://downloads.intercomcdn.com") -> List[Dict]:
+        rng = self._rng(6, conversation['id'])
+        customer = conversation['source']['author']
+        parts = []
+        for position in range(self._count(rng, self.parts_per_conversation)):
+            part_id = f"{conversation['id']}{position:04d}"
+            from_customer = position % 2 == 0
+            part_type = 'comment' if rng.random() > 0.1 else rng.choice(['note', 'assignment', 'close'])
+            parts.append({
+                'type': 'conversation_part', 'id': part_id, 'part_type': part_type,
+                'body': self.html(rng) if part_type in ('comment', 'note') else None,
+                'created_at': conversation['created_at'] + position * rng.randint(60, 86400),
+                'updated_at': conversation['created_at'] + position * 86400,
+                'notified_at': None, 'assigned_to': None,
+                'author': (dict(customer) if from_customer and part_type == 'comment' else
+                           {'type': 'admin', 'id': str(rng.randint(1, max(1, self.agents))),
+                            'name': 'Agent Alphorm', 'email': 'support@alphorm.com'}),
+                'attachments': self._attachments(rng, part_id, base_url, intercom=True),
+                'external_id': None, 'redacted': False
+            })
+        return parts
+
+    # Help Center
+
+    def zendesk_article(self, article_id: int) -> Dict:
+        rng = self._rng(7, article_id)
+        created = self.start_epoch + rng.randrange(self.span)
+        return {
+            'id': article_id, 'url': None, 'html_url': None, 'title': ' '.join(rng.choices(WORDS, k=5)).capitalize(),
+            'body': self.html(rng), 'author_id': rng.randint(1, max(1, self.agents)), 'draft': False,
+            'created_at': iso(created), 'updated_at': iso(created + rng.randrange(86400 * 90)),
+            'locale': 'fr', 'section_id': rng.randrange(1, 20), 'label_names': rng.sample(TAGS, rng.randint(0, 2))
+        }
+
+    def zendesk_macro(self, macro_id: int) -> Dict:
+        rng = self._rng(8, macro_id)
+        title = ' '.join(rng.choices(WORDS, k=3)).capitalize()
+        created = iso(self.start_epoch + rng.randrange(self.span))
+        return {
+            'id': macro_id, 'url': None, 'title': title, 'raw_title': title, 'description': None,
+            'active': rng.random() > 0.1, 'default': False, 'position': macro_id, 'restriction': None,
+            'actions': [{'field': 'comment_value_html', 'value': self.html(rng)},
+                        {'field': 'status', 'value': rng.choice(['open', 'pending', 'solved'])},
+                        {'field': 'set_tags', 'value': rng.choice(TAGS)}],
+            'created_at': created, 'updated_at': created
+        }
+
+    def intercom_article(self, article_id: int) -> Dict:
+        rng = self._rng(9, article_id)
+        created = self.start_epoch + rng.randrange(self.span)
+        return {
+            'type': 'article', 'id': str(article_id), 'workspace_id': 'bench',
+            'title': ' '.join(rng.choices(WORDS, k=5)).capitalize(), 'description': ' '.join(rng.choices(WORDS, k=10)),
+            'body': self.html(rng), 'author_id': rng.randint(1, max(1, self.agents)),
+            'state': rng.choice(['published', 'draft']), 'parent_id': rng.randrange(1, 10), 'parent_type': 'collection',
+            'created_at': created, 'updated_at': created + rng.randrange(86400 * 90), 'url': None,
+            'tags': {'type': 'tag.list', 'tags': []}
+        }
+
+    # Exports complets (tels que produits par les services d'export)
+
+    def iter_zendesk_articles(self) -> Iterator[Dict]:
+        return (self.zendesk_article(article_id) for article_id in range(1, self.articles + 1))
+
+    def iter_zendesk_macros(self) -> Iterator[Dict]:
+        return (self.zendesk_macro(macro_id) for macro_id in range(1, self.macros + 1))
+
+    def iter_intercom_articles(self) -> Iterator[Dict]:
+        return (self.intercom_article(article_id) for article_id in range(1, self.articles + 1))
+
+    def iter_zendesk_users(self) -> Iterator[Dict]:
+        return (self.zendesk_user(user_id) for user_id in range(1, self.users + 1))
+
+    def iter_zendesk_tickets(self) -> Iterator[Dict]:
+        for ticket_id in range(1, self.tickets + 1):
+            ticket = self.zendesk_ticket(ticket_id)
+            ticket['comments'] = self.zendesk_comments(ticket)
+            yield ticket
+
+    def iter_intercom_contacts(self) -> Iterator[Dict]:
+        return (self.intercom_contact(index) for index in range(1, self.contacts + 1))
+
+    def iter_intercom_conversations(self) -> Iterator[Dict]:
+        for index in range(1, self.conversations + 1):
+            conversation = self.intercom_conversation(index)
+            conversation['messages'] = self.intercom_parts(conversation)
+            yield conversation
+
+
+def write_export(filepath: str, key: str, records: Iterator[Dict], count: int) -> int:
+    """Écrire {metadata, key: [...]} enregistrement par enregistrement (même format que save_json)"""
+    metadata = {'exported_at': datetime.now().strftime('%Y%m%d_%H%M%S'), 'count': count, 'synthetic': True}
+    written = 0
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write('{"metadata": ' + json.dumps(metadata) + ', "' + key + '": [')
+        for record in records:
+            if written:
+                f.write(', ')
+            f.write(json.dumps(record, ensure_ascii=False))
+            written += 1
+        f.write(']}')
+    return written
+
+
+def generate_exports(dataset: SyntheticDataset) -> Dict[str, str]:
+    """Écrire les exports d'origine du run courant et les enregistrer dans le manifeste"""
+    from src.utils.run_manifest import get_run_date, record_artifact
+    from configs.config import ZENDESK_OUTPUT_DIR, INTERCOM_OUTPUT_DIR
+
+    date = get_run_date()
+    exports: List[tuple] = [
+        ('zendesk_users', ZENDESK_OUTPUT_DIR, 'users', dataset.iter_zendesk_users, dataset.users),
+        ('zendesk_tickets', ZENDESK_OUTPUT_DIR, 'tickets', dataset.iter_zendesk_tickets, dataset.tickets),
+        ('intercom_contacts', INTERCOM_OUTPUT_DIR, 'contacts', dataset.iter_intercom_contacts, dataset.contacts),
+        ('intercom_conversations', INTERCOM_OUTPUT_DIR, 'conversations', dataset.iter_intercom_conversations,
+         dataset.conversations),
+        ('zendesk_articles', ZENDESK_OUTPUT_DIR, 'articles', dataset.iter_zendesk_articles, dataset.articles),
+        ('zendesk_macros', ZENDESK_OUTPUT_DIR, 'macros', dataset.iter_zendesk_macros, dataset.macros),
+        ('intercom_articles', INTERCOM_OUTPUT_DIR, 'articles', dataset.iter_intercom_articles, dataset.articles),
+    ]
+    files = {}
+    for artifact_key, output_dir, json_key, records, count in exports:
+        if not count:
+            continue
+        directory = f"{output_dir}/origin_export"
+        os.makedirs(directory, exist_ok=True)
+        filepath = f"{directory}/{artifact_key}_{date}.json"
+        started = time.perf_counter()
+        written = write_export(filepath, json_key, records(), count)
+        record_artifact(artifact_key, filepath, written, "export")
+        size_mb = os.path.getsize(filepath) / 1024 / 1024
+        print(f"{artifact_key}: {written} enregistrements, {size_mb:.1f} MB en {time.perf_counter() - started:.1f}s")
+        files[artifact_key] = filepath
+    return files
+
+
+def add_dataset_arguments(parser: argparse.ArgumentParser):
+    """Options de forme du jeu de données (partagées avec les autres scripts de benchmarks/)"""
+    parser.add_argument('--scale', type=int, help="raccourci: N tickets, N conversations, N/2 utilisateurs et contacts")
+    parser.add_argument('--tickets', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--conversations', type=int, default=1000)
+    parser.add_argument('--contacts', type=int, default=500)
+    parser.add_argument('--articles', type=int, default=100, help="articles Zendesk et Intercom")
+    parser.add_argument('--macros', type=int, default=50)
+    parser.add_argument('--comments-per-ticket', type=float, default=4.0, help="moyenne (loi géométrique)")
+    parser.add_argument('--parts-per-conversation', type=float, default=4.0, help="moyenne (loi géométrique)")
+    parser.add_argument('--message-words', type=int, default=40, help="longueur médiane des messages (mots)")
+    parser.add_argument('--message-sigma', type=float, default=0.8, help="dispersion log-normale des longueurs")
+    parser.add_argument('--html-complexity', type=int, default=1, choices=(0, 1, 2))
+    parser.add_argument('--attachment-rate', type=float, default=0.05)
+    parser.add_argument('--duplicate-email-rate', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def dataset_from_arguments(args: argparse.Namespace) -> SyntheticDataset:
+    tickets, users, conversations, contacts = args.tickets, args.users, args.conversations, args.contacts
+    if args.scale:
+        tickets = conversations = args.scale
+        users = contacts = max(1, args.scale // 2)
+    return SyntheticDataset(
+        tickets=tickets, users=users, conversations=conversations, contacts=contacts,
+        articles=args.articles, macros=args.macros,
+        comments_per_ticket=args.comments_per_ticket, parts_per_conversation=args.parts_per_conversation,
+        message_words=args.message_words, message_sigma=args.message_sigma,
+        html_complexity=args.html_complexity, attachment_rate=args.attachment_rate,
+        duplicate_email_rate=args.duplicate_email_rate, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Générer des exports Zendesk/Intercom synthétiques")
+    add_dataset_arguments(parser)
+    parser.add_argument('--workdir', default=None, help="dossier de travail (outputs/ y est créé)")
+    args = parser.parse_args()
+
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        os.chdir(args.workdir)
+
+    from src.utils.run_manifest import get_manifest
+    get_manifest().start_run()
+    generate_exports(dataset_from_arguments(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,13 @@ load_dotenv(".env.local")
 ZENDESK_DOMAIN = os.getenv('ZENDESK_DOMAIN')
 ZENDESK_EMAIL = os.getenv('ZENDESK_EMAIL')
 ZENDESK_API_TOKEN = os.getenv('ZENDESK_API_TOKEN')
+# URL de l'API (défaut: https://{ZENDESK_DOMAIN}/api/v2), ex: serveur local de benchmarks/fake_api_server.py
+ZENDESK_BASE_URL = os.getenv('ZENDESK_BASE_URL', '')
+ZENDESK_TICKET_PAUSE = float(os.getenv('ZENDESK_TICKET_PAUSE', 0.5))  # pause entre deux tickets (secondes)
 
 # Intercom Configuration
 INTERCOM_ACCESS_TOKEN = os.getenv('INTERCOM_ACCESS_TOKEN')
+INTERCOM_BASE_URL = os.getenv('INTERCOM_BASE_URL', 'https://api.intercom.io')
 
 # Chatwoot Configuration
 CHATWOOT_BASE_URL = os.getenv('CHATWOOT_BASE_URL')
@@ -25,40 +29,90 @@ CHATWOOT_RATE_LIMIT = int(os.getenv('CHATWOOT_RATE_LIMIT', 600))
 # Batch Processing
 BATCH_SIZE = int(os.getenv('BATCH_SIZE', 50))
 
+# Stockage intermédiaire entre stages: "json" (fichiers) ou "sqlite" (outputs/staging.db)
+STAGING_BACKEND = os.getenv('STAGING_BACKEND', 'json').lower()
+STAGING_BATCH_SIZE = int(os.getenv('STAGING_BATCH_SIZE', 1000))
+
+# Copie NDJSON indexée (accès direct par ID) des tickets/conversations exportés
+EXPORT_NDJSON = os.getenv('EXPORT_NDJSON', 'false').lower() == 'true'
+
+# Fusion des contacts: "pandas" (par colonnes) ou "python" (contact par contact)
+CONTACT_MERGE_ENGINE = os.getenv('CONTACT_MERGE_ENGINE', 'pandas').lower()
+
+# Dédoublonnage des contacts: "exact" (email identique) ou "fuzzy" (email normalisé, téléphone, nom)
+CONTACT_DEDUP = os.getenv('CONTACT_DEDUP', 'exact').lower()
+DEDUP_MAX_BLOCK_SIZE = int(os.getenv('DEDUP_MAX_BLOCK_SIZE', 50))  # blocs plus grands ignorés (comparaisons par paires)
+DEFAULT_PHONE_COUNTRY_CODE = os.getenv('DEFAULT_PHONE_COUNTRY_CODE', '33')  # numéros nationaux (0...)
+
+# Résolution des orphelins: contacts référencés par des conversations mais absents de l'export
+RESOLVE_ORPHANS = os.getenv('RESOLVE_ORPHANS', 'false').lower() == 'true'
+CONTACT_LOOKUP_BATCH_SIZE = int(os.getenv('CONTACT_LOOKUP_BATCH_SIZE', 100))  # IDs par requête show_many/search
+
+# Export Intercom: seulement les contacts cités par les conversations (au lieu de tout le workspace)
+INTERCOM_REFERENCED_CONTACTS_ONLY = os.getenv('INTERCOM_REFERENCED_CONTACTS_ONLY', 'false').lower() == 'true'
+INTERCOM_EXPORT_WORKERS = int(os.getenv('INTERCOM_EXPORT_WORKERS', 4))  # recherches de contacts en parallèle
+
+# Stages incrémentaux: seuls les enregistrements modifiés depuis l'entrée de la sortie précédente
+# (couple entrée/sortie enregistré au manifeste) sont retraités
+INCREMENTAL_STAGES = os.getenv('INCREMENTAL_STAGES', 'false').lower() == 'true'
+
+# Graphe de tâches: tâches indépendantes exécutées en parallèle (1 = séquentiel)
+PIPELINE_JOBS = int(os.getenv('PIPELINE_JOBS', 4))
+
+# Clean multi-processus: chaque entité dans un processus du pool, CLEAN_PROCESSES au total
+# (1 = threads du graphe, sans processus). Hors worker, gros fichiers écrits par lots de
+# CLEAN_CHUNK_SIZE enregistrements en parallèle
+CLEAN_PROCESSES = int(os.getenv('CLEAN_PROCESSES', 1))
+CLEAN_CHUNK_SIZE = int(os.getenv('CLEAN_CHUNK_SIZE', 2000))
+
+# Migration Chatwoot (import parallèle)
+MIGRATION_WORKERS = int(os.getenv('MIGRATION_WORKERS', 1))
+CHATWOOT_REQUEST_LATENCY = float(os.getenv('CHATWOOT_REQUEST_LATENCY', 0.3))  # secondes par requête
+ATTACHMENT_BANDWIDTH = int(os.getenv('ATTACHMENT_BANDWIDTH', 1_000_000))  # octets par seconde
+RECENT_DAYS = int(os.getenv('RECENT_DAYS', 90))  # fenêtre "récente" du mode recency
+# longest_first, file, recency ou stream (import en flux à mémoire constante)
+MIGRATION_SCHEDULE = os.getenv('MIGRATION_SCHEDULE', 'longest_first')
+# Correspondance des IDs: journal écrit après chaque contact importé, fichier complet réécrit
+# toutes les MAPPING_COMPACT_EVERY opérations (contacts, conversations, messages, statuts)
+MAPPING_COMPACT_EVERY = int(os.getenv('MAPPING_COMPACT_EVERY', 10000))
+
+# Synchronisation continue (live sync)
+LIVE_SYNC_INTERVAL = int(os.getenv('LIVE_SYNC_INTERVAL', 300))  # secondes entre deux passes
+LIVE_SYNC_CACHE_SIZE = int(os.getenv('LIVE_SYNC_CACHE_SIZE', 10000))  # contacts gardés en mémoire
+
+# Affichage: DEBUG pour voir chaque requête/contact, INFO sinon
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+PROGRESS_INTERVAL = float(os.getenv('PROGRESS_INTERVAL', 2.0))  # secondes entre deux affichages de progression
+
+# Métriques du run (rapport JSON toujours écrit dans outputs/)
+METRICS_PROMETHEUS_FILE = os.getenv('METRICS_PROMETHEUS_FILE', '')  # ex: /var/lib/node_exporter/migration.prom
+
+# Profilage cProfile + tracemalloc par stage (export, clean, transform, prepare, import ou all),
+# écrit dans outputs/profiles/<run_id>/
+PROFILE_STAGES = [stage.strip() for stage in os.getenv('PROFILE_STAGES', '').split(',') if stage.strip()]
+PROFILE_TOP = int(os.getenv('PROFILE_TOP', 20))  # fonctions/allocations listées par profil
+
 # Paths
 OUTPUT_DIR = 'outputs'
 ZENDESK_OUTPUT_DIR = f'{OUTPUT_DIR}/zendesk'
 INTERCOM_OUTPUT_DIR = f'{OUTPUT_DIR}/intercom'
 CHATWOOT_OUTPUT_DIR = f'{OUTPUT_DIR}/chatwoot'
 
+# Variables requises par service (vérifiées seulement pour les stages qui appellent l'API)
+REQUIRED_VARS = {
+    'zendesk': ('ZENDESK_DOMAIN', 'ZENDESK_EMAIL', 'ZENDESK_API_TOKEN'),
+    'intercom': ('INTERCOM_ACCESS_TOKEN',),
+    'chatwoot': ('CHATWOOT_BASE_URL', 'CHATWOOT_API_ACCESS_TOKEN')
+}
+
 # Validation function
-def validate_config():
-    """Check if all required environment variables are set"""
-    required_vars = [
-        ZENDESK_DOMAIN,
-        ZENDESK_EMAIL, 
-        ZENDESK_API_TOKEN,
-        INTERCOM_ACCESS_TOKEN,
-        CHATWOOT_BASE_URL,
-        CHATWOOT_API_ACCESS_TOKEN
-    ]
-    
-    missing_vars = []
-    if not ZENDESK_DOMAIN:
-        missing_vars.append('ZENDESK_DOMAIN')
-    if not ZENDESK_EMAIL:
-        missing_vars.append('ZENDESK_EMAIL')
-    if not ZENDESK_API_TOKEN:
-        missing_vars.append('ZENDESK_API_TOKEN')
-    if not INTERCOM_ACCESS_TOKEN:
-        missing_vars.append('INTERCOM_ACCESS_TOKEN')
-    if not CHATWOOT_BASE_URL:
-        missing_vars.append('CHATWOOT_BASE_URL')
-    if not CHATWOOT_API_ACCESS_TOKEN:
-        missing_vars.append('CHATWOOT_API_ACCESS_TOKEN')
+def validate_config(services=('zendesk', 'intercom', 'chatwoot')):
+    """Check that the environment variables required by `services` are set"""
+    missing_vars = [name for service in services for name in REQUIRED_VARS[service] if not globals()[name]]
     
     if missing_vars:
         raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
     
-    print("✅ All configuration variables are set!")
-    return True
\ No newline at end of file
+    if services:
+        print(f"✅ Configuration OK ({', '.join(services)})")
+    return True
@@ -2,13 +2,16 @@ import requests
 import json
 import time
 from typing import Dict, List, Optional, Any
+from src.utils.metrics import get_metrics, instrument_session
+from src.utils.rate_limiter import RateLimiter
+from src.utils.helpers import debug
 from configs.config import CHATWOOT_BASE_URL, CHATWOOT_API_ACCESS_TOKEN, CHATWOOT_ACCOUNT_ID, CHATWOOT_RATE_LIMIT
 
 
 class ChatwootClient:
     """Client API pour importer les données dans Chatwoot"""
     
-    def __init__(self):
+    def __init__(self, rate_limit: float = None):
         # Configuration de base
         self.base_url = CHATWOOT_BASE_URL
         self.api_token = CHATWOOT_API_ACCESS_TOKEN
@@ -26,38 +29,36 @@ class ChatwootClient:
         })
         
         # Limitation du taux de requêtes
-        self.rate_limit = CHATWOOT_RATE_LIMIT / 60  # requêtes par seconde
-        self.last_request = 0
+        # rate_limit: requêtes par minute (partage du quota entre workers)
+        self.rate_limiter = RateLimiter(rate_limit or CHATWOOT_RATE_LIMIT, "chatwoot")
+        instrument_session(self.session, "chatwoot")
         
         print(f"Client Chatwoot initialisé pour le compte {self.account_id}")
     
     def _rate_limit_wait(self):
         """Attendre pour respecter les limites de taux"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request
-        min_interval = 1 / self.rate_limit
-        
-        if time_since_last < min_interval:
-            sleep_time = min_interval - time_since_last
-            time.sleep(sleep_time)
-        
-        self.last_request = time.time()
+        self.rate_limiter.wait()
+    
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Envoyer une requête; sur 429, attendre Retry-After puis réessayer"""
+        while True:
+            self._rate_limit_wait()
+            response = self.session.request(method, url, **kwargs)
+            if response.status_code != 429:
+                return response
+            retry_after = int(response.headers.get("Retry-After", 5))
+            print(f"⏳ Limite Chatwoot atteinte. Attente {retry_after} sec...")
+            time.sleep(retry_after)
+            get_metrics().record_retry("chatwoot", url, method)
     
     def _make_request(self, method: str, endpoint: str, data: Dict = None) -> Dict:
         """Effectuer une requête API avec gestion d'erreurs"""
-        self._rate_limit_wait()
+        if method not in ("GET", "POST", "PATCH"):
+            raise ValueError(f"Méthode HTTP non supportée: {method}")
         url = f"{self.application_api_url}/{endpoint}"
         
         try:
-            if method == "GET":
-                response = self.session.get(url)
-            elif method == "POST":
-                response = self.session.post(url, json=data)
-            elif method == "PATCH":
-                response = self.session.patch(url, json=data)
-            else:
-                raise ValueError(f"Méthode HTTP non supportée: {method}")
-            
+            response = self._send(method, url, json=data if method != "GET" else None)
             response.raise_for_status()
             return response.json()
             
@@ -114,7 +115,7 @@ class ChatwootClient:
             if 'payload' in response and 'contact' in response['payload']:
                 contact_id = response['payload']['contact'].get('id')
             
-            print(f"Contact créé: {contact_data.get('name')} (ID: {contact_id})")
+            debug(f"Contact créé: {contact_data.get('name')} (ID: {contact_id})")
             return response
             
         except Exception as e:
@@ -134,7 +135,7 @@ class ChatwootClient:
         
         try:
             response = self._make_request("POST", endpoint, conversation_data)
-            print(f"Conversation créée: ID {response.get('id')}")
+            debug(f"Conversation créée: ID {response.get('id')}")
             return response
         except Exception as e:
             print(f"Erreur création conversation: {e}")
@@ -156,7 +157,7 @@ class ChatwootClient:
         
         try:
             response = self._make_request("POST", endpoint, message_data)
-            print(f"Message ajouté à la conversation {conversation_id}")
+            debug(f"Message ajouté à la conversation {conversation_id}")
             return response
         except Exception as e:
             print(f"Erreur création message: {e}")
@@ -188,7 +189,7 @@ class ChatwootClient:
 
         try:
             response = self._make_request("POST", endpoint, data)
-            print(f"Statut de la conversation {conversation_id} mis à jour -> {status}")
+            debug(f"Statut de la conversation {conversation_id} mis à jour -> {status}")
             return response
         except Exception as e:
             print(f"Erreur mise à jour statut conversation {conversation_id}: {e}")
@@ -222,13 +223,13 @@ class ChatwootClient:
                     files.append(('attachments[]', (filename, file_content)))
             
             url = f"{self.application_api_url}/{endpoint}"
-            response = self.session.post(url, data=data, files=files)
+            response = self._send("POST", url, data=data, files=files)
             response.raise_for_status()
             
             # Restaurer les headers
             self.session.headers = old_headers
             
-            print(f"Message avec {len(files)} pièces jointes ajouté")
+            debug(f"Message avec {len(files)} pièces jointes ajouté")
             return response.json()
             
         except Exception as e:
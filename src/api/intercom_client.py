@@ -1,8 +1,13 @@
 import requests
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any
-from configs.config import INTERCOM_ACCESS_TOKEN, INTERCOM_RATE_LIMIT
+from src.utils.metrics import get_metrics, instrument_session
+from src.utils.rate_limiter import RateLimiter
+from src.utils.progress import ProgressReporter
+from src.utils.helpers import debug
+from configs.config import INTERCOM_ACCESS_TOKEN, INTERCOM_BASE_URL, INTERCOM_RATE_LIMIT
 
 
 class IntercomClient:
@@ -11,7 +16,7 @@ class IntercomClient:
     def __init__(self):
         # Configuration de base
         self.access_token = INTERCOM_ACCESS_TOKEN
-        self.base_url = "https://api.intercom.io"
+        self.base_url = INTERCOM_BASE_URL
         
         # Configuration de la session HTTP
         self.session = requests.Session()
@@ -22,30 +27,48 @@ class IntercomClient:
         })
         
         # Limitation du taux de requêtes
-        self.rate_limit = INTERCOM_RATE_LIMIT / 60  # requêtes par seconde
-        self.last_request = 0
+        self.rate_limiter = RateLimiter(INTERCOM_RATE_LIMIT, "intercom")
+        instrument_session(self.session, "intercom")
         
         print(f"Client Intercom initialisé")
     
     def _rate_limit_wait(self):
-        """Attendre pour respecter les limites de taux"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request
-        min_interval = 1 / self.rate_limit
-        
-        if time_since_last < min_interval:
-            sleep_time = min_interval - time_since_last
-            time.sleep(sleep_time)
-        
-        self.last_request = time.time()
+        """Attendre pour respecter les limites de taux (partagées entre threads)"""
+        self.rate_limiter.wait()
+    
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Envoyer une requête; sur 429, attendre Retry-After puis réessayer"""
+        while True:
+            self._rate_limit_wait()
+            response = self.session.request(method, url, **kwargs)
+            if response.status_code != 429:
+                return response
+            retry_after = int(response.headers.get("Retry-After", 5))
+            print(f"⏳ Limite Intercom atteinte. Attente {retry_after} sec...")
+            time.sleep(retry_after)
+            get_metrics().record_retry("intercom", url, method)
     
     def _make_request(self, endpoint: str, params: Dict = None) -> Dict:
         """Effectuer une requête API avec gestion d'erreurs"""
-        self._rate_limit_wait()
         url = f"{self.base_url}/{endpoint}"
         
         try:
-            response = self.session.get(url, params=params)
+            response = self._send("GET", url, params=params)
+            response.raise_for_status()
+            return response.json()
+            
+        except requests.exceptions.RequestException as e:
+            print(f"Erreur API Intercom: {e}")
+            if hasattr(e.response, 'text'):
+                print(f"Détails: {e.response.text}")
+            raise
+    
+    def _make_post_request(self, endpoint: str, data: Dict) -> Dict:
+        """Effectuer une requête POST (API search) avec gestion d'erreurs"""
+        url = f"{self.base_url}/{endpoint}"
+        
+        try:
+            response = self._send("POST", url, json=data)
             response.raise_for_status()
             return response.json()
             
@@ -59,7 +82,7 @@ class IntercomClient:
         """Tester la connexion à Intercom"""
         try:
             response = self._make_request("contacts", {"per_page": 1})
-            print(f"Réponse API reçue: {list(response.keys())}")
+            debug(f"Réponse API reçue: {list(response.keys())}")
             
             # Intercom peut retourner différents formats
             if 'data' in response or 'contacts' in response:
@@ -123,18 +146,80 @@ class IntercomClient:
         
         print(f"Récupération des messages pour {len(conversations)} conversations...")
         
-        for i, conversation in enumerate(conversations):
-            conversation_id = conversation['id']
-            messages = self.get_conversation_messages(conversation_id)
-            conversation['messages'] = messages
-            
-            # Afficher le progrès tous les 10 conversations
-            if (i + 1) % 10 == 0:
-                print(f"Traité {i + 1}/{len(conversations)} conversations")
+        with ProgressReporter("Conversations", len(conversations), "intercom", INTERCOM_RATE_LIMIT) as progress:
+            for conversation in conversations:
+                conversation_id = conversation['id']
+                messages = self.get_conversation_messages(conversation_id)
+                conversation['messages'] = messages
+                progress.update()
         
         print("Messages récupérés pour toutes les conversations")
         return conversations
     
+    def iter_conversations_updated_since(self, updated_since: int):
+        """
+        Parcourir les conversations modifiées depuis updated_since inclus (API search).
+        Produit les conversations page par page pour garder une mémoire bornée.
+        """
+        # Pas d'opérateur >= dans l'API search: > updated_since - 1 sur des timestamps entiers
+        query = {
+            "query": {"field": "updated_at", "operator": ">", "value": updated_since - 1},
+            "sort": {"field": "updated_at", "order": "ascending"},
+            "pagination": {"per_page": 150}
+        }
+        
+        while True:
+            data = self._make_post_request("conversations/search", query)
+            yield data.get('conversations', [])
+            
+            next_page = data.get('pages', {}).get('next')
+            if not next_page or 'starting_after' not in next_page:
+                break
+            query['pagination']['starting_after'] = next_page['starting_after']
+    
+    def get_contact(self, contact_id: str) -> Optional[Dict]:
+        """Récupérer un contact par son ID (None en cas d'erreur)"""
+        try:
+            return self._make_request(f"contacts/{contact_id}")
+        except Exception as e:
+            print(f"Erreur contact {contact_id}: {e}")
+            return None
+    
+    def search_contacts_by_ids(self, contact_ids: List[str]) -> List[Dict]:
+        """Récupérer un lot de contacts par ID en une recherche (opérateur IN, pages de 150)"""
+        query = {
+            "query": {"field": "id", "operator": "IN", "value": list(contact_ids)},
+            "pagination": {"per_page": 150}
+        }
+        contacts = []
+        
+        while True:
+            data = self._make_post_request("contacts/search", query)
+            contacts.extend(data.get('data', []))
+            
+            next_page = data.get('pages', {}).get('next')
+            if not next_page or 'starting_after' not in next_page:
+                break
+            query['pagination']['starting_after'] = next_page['starting_after']
+        
+        return contacts
+    
+    def get_contacts_many(self, contact_ids: List[str], batch_size: int = 100, workers: int = 1) -> List[Dict]:
+        """
+        Récupérer des contacts par ID, une recherche par lot de batch_size IDs.
+        Avec workers > 1, les lots sont recherchés en parallèle (quota partagé).
+        """
+        contact_ids = list(contact_ids)
+        batches = [contact_ids[start:start + batch_size] for start in range(0, len(contact_ids), batch_size)]
+        
+        if workers > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self.search_contacts_by_ids, batches))
+        else:
+            results = [self.search_contacts_by_ids(batch) for batch in batches]
+        
+        return [contact for batch_contacts in results for contact in batch_contacts]
+    
     def get_all_contacts(self) -> List[Dict]:
         """Récupérer tous les contacts"""
         print("Récupération des contacts...")
@@ -2,7 +2,12 @@ import requests
 import json
 import time
 from typing import Dict, List, Optional, Any
-from configs.config import ZENDESK_DOMAIN, ZENDESK_EMAIL, ZENDESK_API_TOKEN, ZENDESK_RATE_LIMIT
+from src.utils.metrics import get_metrics, instrument_session
+from src.utils.rate_limiter import RateLimiter
+from src.utils.progress import ProgressReporter
+from configs.config import (
+    ZENDESK_DOMAIN, ZENDESK_EMAIL, ZENDESK_API_TOKEN, ZENDESK_BASE_URL, ZENDESK_RATE_LIMIT, ZENDESK_TICKET_PAUSE
+)
 
 
 class ZendeskClient:
@@ -13,7 +18,7 @@ class ZendeskClient:
         self.domain = ZENDESK_DOMAIN
         self.email = ZENDESK_EMAIL
         self.token = ZENDESK_API_TOKEN
-        self.base_url = f"https://{self.domain}/api/v2"
+        self.base_url = ZENDESK_BASE_URL or f"https://{self.domain}/api/v2"
 
         # Configuration de la session HTTP
         self.session = requests.Session()
@@ -23,23 +28,15 @@ class ZendeskClient:
             'Accept': 'application/json'
         })
 
-        # Limitation du taux de requêtes (théorique)
-        self.rate_limit = ZENDESK_RATE_LIMIT / 60  # requêtes par seconde
-        self.last_request = 0
+        # Limitation du taux de requêtes (théorique) et métriques par endpoint
+        self.rate_limiter = RateLimiter(ZENDESK_RATE_LIMIT, "zendesk")
+        instrument_session(self.session, "zendesk")
 
         print(f"Client Zendesk initialisé pour {self.domain}")
 
     def _rate_limit_wait(self):
         """Attendre pour respecter les limites de taux"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request
-        min_interval = 1 / self.rate_limit
-
-        if time_since_last < min_interval:
-            sleep_time = min_interval - time_since_last
-            time.sleep(sleep_time)
-
-        self.last_request = time.time()
+        self.rate_limiter.wait()
 
     def _make_request(self, endpoint: str, params: Dict = None) -> Dict:
         """
@@ -58,6 +55,7 @@ class ZendeskClient:
                     retry_after = int(response.headers.get("Retry-After", 5))
                     print(f"⏳ Limite atteinte pour {endpoint}. Attente {retry_after} sec...")
                     time.sleep(retry_after)
+                    get_metrics().record_retry("zendesk", url)
                     continue
 
                 response.raise_for_status()
@@ -69,6 +67,7 @@ class ZendeskClient:
                     print(f"Détails: {e.response.text}")
                 # Attente avant de réessayer en cas d'erreur temporaire
                 time.sleep(3)
+                get_metrics().record_retry("zendesk", url)
                 continue
 
     def _make_paginated_request(self, initial_url: str) -> List[Dict]:
@@ -87,6 +86,7 @@ class ZendeskClient:
                     retry_after = int(response.headers.get("Retry-After", 5))
                     print(f"⏳ Limite atteinte. Attente {retry_after} sec...")
                     time.sleep(retry_after)
+                    get_metrics().record_retry("zendesk", next_page)
                     continue
 
                 response.raise_for_status()
@@ -102,6 +102,7 @@ class ZendeskClient:
             except requests.exceptions.RequestException as e:
                 print(f"⚠️ Erreur API Zendesk: {e}, reprise après 5s...")
                 time.sleep(5)
+                get_metrics().record_retry("zendesk", next_page)
                 continue
 
         return results
@@ -132,7 +133,7 @@ class ZendeskClient:
         """Récupérer tous les commentaires d'un ticket"""
         endpoint = f"tickets/{ticket_id}/comments"
         try:
-            time.sleep(0.5)  # pause courte entre tickets
+            time.sleep(ZENDESK_TICKET_PAUSE)  # pause courte entre tickets
             data = self._make_request(endpoint)
             return data.get('comments', [])
         except Exception as e:
@@ -144,14 +145,12 @@ class ZendeskClient:
         tickets = self.get_all_tickets()
         print(f"Récupération des commentaires pour {len(tickets)} tickets...")
 
-        for i, ticket in enumerate(tickets):
-            ticket_id = ticket['id']
-            comments = self.get_ticket_comments(ticket_id)
-            ticket['comments'] = comments
-
-            # Afficher le progrès tous les 15 tickets
-            if (i + 1) % 15 == 0:
-                print(f"Traité {i + 1}/{len(tickets)} tickets")
+        with ProgressReporter("Tickets", len(tickets), "zendesk", ZENDESK_RATE_LIMIT) as progress:
+            for ticket in tickets:
+                ticket_id = ticket['id']
+                comments = self.get_ticket_comments(ticket_id)
+                ticket['comments'] = comments
+                progress.update()
 
         print("✅ Commentaires récupérés pour tous les tickets")
         return tickets
@@ -172,6 +171,7 @@ class ZendeskClient:
                     retry_after = int(response.headers.get("Retry-After", 5))
                     print(f"⏳ Limite atteinte (users). Attente {retry_after} sec...")
                     time.sleep(retry_after)
+                    get_metrics().record_retry("zendesk", next_page_url)
                     continue
 
                 response.raise_for_status()
@@ -191,12 +191,70 @@ class ZendeskClient:
             except requests.exceptions.RequestException as e:
                 print(f"⚠️ Erreur API: {e}, reprise après 5s...")
                 time.sleep(5)
+                get_metrics().record_retry("zendesk", next_page_url)
                 continue
 
         unique_contacts = {c["id"]: c for c in all_contacts}.values()
         print(f"✅ Total final: {len(unique_contacts)} contacts uniques récupérés")
         return list(unique_contacts)
 
+    def get_user(self, user_id: int) -> Optional[Dict]:
+        """Récupérer un utilisateur par son ID (None s'il n'existe plus)"""
+        self._rate_limit_wait()
+        try:
+            response = self.session.get(f"{self.base_url}/users/{user_id}.json")
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            return response.json().get('user')
+        except requests.exceptions.RequestException as e:
+            print(f"Erreur utilisateur {user_id}: {e}")
+            return None
+
+    def get_users_many(self, user_ids: List[int], batch_size: int = 100) -> List[Dict]:
+        """Récupérer des utilisateurs par ID (users/show_many, 100 IDs max par requête)"""
+        users = []
+        user_ids = list(user_ids)
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            data = self._make_request("users/show_many.json", {"ids": ",".join(str(user_id) for user_id in batch)})
+            users.extend(data.get('users', []))
+        return users
+
+    def iter_incremental_tickets(self, start_time: int):
+        """
+        Parcourir les tickets modifiés depuis start_time (API Incremental Export).
+        Produit (tickets, end_time) page par page pour garder une mémoire bornée.
+        """
+        next_page_url = f"{self.base_url}/incremental/tickets.json?start_time={start_time}"
+
+        while next_page_url:
+            self._rate_limit_wait()
+            try:
+                response = self.session.get(next_page_url)
+
+                if response.status_code == 429:
+                    retry_after = int(response.headers.get("Retry-After", 5))
+                    print(f"⏳ Limite atteinte (incremental tickets). Attente {retry_after} sec...")
+                    time.sleep(retry_after)
+                    get_metrics().record_retry("zendesk", next_page_url)
+                    continue
+
+                response.raise_for_status()
+                data = response.json()
+
+                yield data.get("tickets", []), data.get("end_time")
+
+                if data.get("end_of_stream"):
+                    break
+                next_page_url = data.get("next_page")
+
+            except requests.exceptions.RequestException as e:
+                print(f"⚠️ Erreur API: {e}, reprise après 5s...")
+                time.sleep(5)
+                get_metrics().record_retry("zendesk", next_page_url)
+                continue
+
     def get_all_articles(self) -> List[Dict]:
         """Récupérer tous les articles du Help Center"""
         print("Récupération des articles Help Center...")
@@ -1,121 +1,99 @@
+import argparse
+import contextlib
+import json
 import os
 import sys
-from src.api.zendesk_client import ZendeskClient
-from src.api.intercom_client import IntercomClient
-from src.services.zendesk_service import ZendeskService
-from src.services.intercom_service import IntercomService
-from src.services.zendesk_clean_service import zendesk_clean_all
-from src.services.intercom_clean_service import intercom_clean_all
-from configs.config import validate_config
-from src.services.chatwoot_service import migrate_all_data
-
-def check_setup():
-    """Vérification rapide"""
+from src.utils.run_manifest import get_manifest
+from src.utils.metrics import get_metrics
+from configs.config import (validate_config, METRICS_PROMETHEUS_FILE, OUTPUT_DIR, PIPELINE_JOBS, CLEAN_PROCESSES,
+                            MIGRATION_WORKERS, MIGRATION_SCHEDULE, RESOLVE_ORPHANS)
+
+# Clients API et services importés à l'usage: un run clean/transform démarre sans requests ni pandas
+STAGES = ('export', 'clean', 'transform', 'prepare', 'import')
+SOURCES = ('zendesk', 'intercom')
+SERVICES = ('zendesk', 'intercom', 'chatwoot')
+
+
+def required_services(stages, sources=SOURCES) -> list:
+    """APIs appelées par les stages: exports (et résolution des orphelins) pour les sources, import pour Chatwoot"""
+    services = []
+    if 'export' in stages or ('prepare' in stages and RESOLVE_ORPHANS):
+        services.extend(source for source in SOURCES if source in sources)
+    if 'import' in stages:
+        services.append('chatwoot')
+    return services
+
+
+def check_setup(services=SERVICES):
+    """Vérification rapide des variables requises par les services utilisés"""
     print("Vérification configuration...")
     try:
-        validate_config()
+        validate_config(services)
         return True
     except ValueError as e:
         print(f"Erreur config: {e}")
         return False
 
 
-def test_apis():
-    """Test connexions"""
+def test_apis(sources=SOURCES):
+    """Test connexions (seulement pour les sources demandées)"""
     zendesk_ok = intercom_ok = False
     
-    try:
-        zendesk_ok = ZendeskClient().test_connection()
-    except:
-        print("Zendesk: Erreur connexion")
-    
-    try:
-        intercom_ok = IntercomClient().test_connection()
-    except:
-        print("Intercom: Erreur connexion")
-    
-    return zendesk_ok, intercom_ok
-
-
-def run_export(zendesk=True, intercom=True):
-    """Export données"""
-    files = {}
-    
-    if zendesk:
+    if 'zendesk' in sources:
         try:
-            print("\nExport Zendesk...")
-            files.update(ZendeskService().export_all())
-        except Exception as e:
-            print(f"Erreur export Zendesk: {e}")
+            from src.api.zendesk_client import ZendeskClient
+            zendesk_ok = ZendeskClient().test_connection()
+        except:
+            print("Zendesk: Erreur connexion")
     
-    if intercom:
+    if 'intercom' in sources:
         try:
-            print("\nExport Intercom...")
-            files.update(IntercomService().export_all())
-        except Exception as e:
-            print(f"Erreur export Intercom: {e}")
+            from src.api.intercom_client import IntercomClient
+            intercom_ok = IntercomClient().test_connection()
+        except:
+            print("Intercom: Erreur connexion")
     
-    return files
+    return zendesk_ok, intercom_ok
 
 
-def run_clean(zendesk=True, intercom=True):
-    """Clean données"""
-    files = {}
-    
-    if zendesk:
-        try:
-            print("\nClean Zendesk...")
-            files.update(zendesk_clean_all())
-        except Exception as e:
-            print(f"Erreur clean Zendesk: {e}")
-    
-    if intercom:
-        try:
-            print("\nClean Intercom...")
-            files.update(intercom_clean_all())
-        except Exception as e:
-            print(f"Erreur clean Intercom: {e}")
-    
-    return files
+def reachable_sources(stages, sources=SOURCES) -> list:
+    """Sources exportables: connexion testée seulement si le stage export est demandé"""
+    if 'export' not in stages:
+        return list(sources)
+    zendesk_ok, intercom_ok = test_apis(sources)
+    return [source for source, ok in zip(SOURCES, (zendesk_ok, intercom_ok)) if ok]
 
-def run_transform(zendesk=True, intercom=True):
-    """Transform données"""
-    files = {}
-    
-    if zendesk:
-        try:
-            print("\nTransform Zendesk...")
-            from src.services.zendesk_transform_service import zendesk_transform_tickets
-            files['zendesk_transformed'] = zendesk_transform_tickets()
-        except Exception as e:
-            print(f"Erreur transform Zendesk: {e}")
-    
-    if intercom:
-        try:
-            print("\nTransform Intercom...")
-            from src.services.intercom_transform_service import intercom_transform_conversations
-            files['intercom_transformed'] = intercom_transform_conversations()
-        except Exception as e:
-            print(f"Erreur transform Intercom: {e}")
-    
-    return files
 
-def run_prepare_chatwoot():
-    """Préparer données pour Chatwoot"""
-    files = {}
-    
+def run_stages(stages, sources=SOURCES, reachable=SOURCES, jobs: int = PIPELINE_JOBS, force: bool = False,
+               limit: int = None, workers: int = MIGRATION_WORKERS, schedule: str = MIGRATION_SCHEDULE,
+               processes: int = CLEAN_PROCESSES) -> dict:
+    """
+    Exécuter les stages demandés via le graphe de tâches (pipeline_service): tâches
+    indépendantes en parallèle, tâches aux entrées inchangées ignorées.
+    reachable: sources dont l'API répond (les autres ne sont pas exportées)
+    processes: processus pour les tâches clean (1 = dans les threads du graphe)
+    """
+    from src.services.pipeline_service import build_pipeline
+    from src.utils.parallel import shutdown_process_pool
+    from src.utils.task_graph import print_task_summary
+
+    graph = build_pipeline(limit, workers, schedule, processes).select(stages, sources)
+    graph = graph.without([task.name for task in graph.tasks.values()
+                           if task.stage == 'export' and task.source not in reachable])
     try:
-        print("\nPréparation contacts Chatwoot...")
-        from src.services.chatwoot_prepare_contacts_service import prepare_contacts_for_chatwoot
-        files['contacts'] = prepare_contacts_for_chatwoot()
-        
-        print("\nPréparation conversations Chatwoot...")
-        from src.services.chatwoot_prepare_conversations_service import prepare_conversations_for_chatwoot
-        files['conversations'] = prepare_conversations_for_chatwoot()
-    except Exception as e:
-        print(f"Erreur préparation Chatwoot: {e}")
-    
-    return files
+        status = graph.run(jobs=jobs, force=force, processes=processes)
+    finally:
+        shutdown_process_pool()
+    print_task_summary(status)
+    return status
+
+
+@get_metrics().stage("import")
+def run_migration(limit: int = None, workers: int = MIGRATION_WORKERS, schedule: str = MIGRATION_SCHEDULE):
+    """Migration vers Chatwoot (limit: nombre de contacts, None pour tout)"""
+    from src.services.chatwoot_service import migrate_all_data
+    return migrate_all_data(limit=limit, workers=workers, schedule=schedule)
+
 
 def ask_and_run_migration():
     """Demande à l'utilisateur s'il veut migrer les données"""
@@ -124,11 +102,11 @@ def ask_and_run_migration():
         if do_migration == "o":
             limit_str = input("Entrez un nombre de contacts à migrer (ou 'all' pour tout): ").strip().lower()
             if limit_str == "all":
-                migrate_all_data()
+                run_migration()
             else:
                 try:
                     limit = int(limit_str)
-                    migrate_all_data(limit=limit)
+                    run_migration(limit=limit)
                 except ValueError:
                     print("⚠ Valeur invalide, aucune migration lancée.")
         else:
@@ -137,6 +115,118 @@ def ask_and_run_migration():
         print("\nMigration annulée par l'utilisateur.")
 
 
+def save_run_report(run_id: str):
+    """Rapport du run: JSON dans outputs/, textfile Prometheus si configuré, résumé console"""
+    metrics = get_metrics()
+    report_path = metrics.save_report(f"{OUTPUT_DIR}/run_report_{run_id}.json")
+    print(f"\nRapport du run: {report_path}")
+    if METRICS_PROMETHEUS_FILE:
+        metrics.write_prometheus(METRICS_PROMETHEUS_FILE)
+        print(f"Métriques Prometheus: {METRICS_PROMETHEUS_FILE}")
+    metrics.print_summary()
+
+
+def csv_choices(choices):
+    """Type argparse: liste séparée par des virgules, valeurs parmi `choices`"""
+    def parse(value: str):
+        values = [item.strip().lower() for item in value.split(',') if item.strip()]
+        invalid = [item for item in values if item not in choices]
+        if invalid:
+            raise argparse.ArgumentTypeError(f"valeur(s) invalide(s): {', '.join(invalid)} (choix: {', '.join(choices)})")
+        return values
+    return parse
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Migration Zendesk & Intercom vers Chatwoot (sans argument: menu interactif)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="exécuter des stages du pipeline")
+    run.add_argument('--stages', type=csv_choices(STAGES), default=list(STAGES),
+                     help=f"stages à exécuter, dans l'ordre du pipeline (défaut: {','.join(STAGES)})")
+    run.add_argument('--sources', type=csv_choices(SOURCES), default=list(SOURCES),
+                     help="sources pour export, clean et transform (défaut: zendesk,intercom)")
+    run.add_argument('--limit', type=int, default=None, help="nombre de contacts à migrer (défaut: tous)")
+    run.add_argument('--workers', type=int, default=MIGRATION_WORKERS, help="imports Chatwoot parallèles")
+    run.add_argument('--schedule', choices=('longest_first', 'file', 'recency', 'stream'), default=MIGRATION_SCHEDULE)
+    run.add_argument('--jobs', type=int, default=PIPELINE_JOBS, help="tâches indépendantes exécutées en parallèle")
+    run.add_argument('--force', action='store_true', help="exécuter aussi les tâches dont les entrées n'ont pas changé")
+    run.add_argument('--processes', type=int, default=CLEAN_PROCESSES,
+                     help="processus pour le clean (entités en parallèle, gros fichiers écrits par lots)")
+
+    delta = commands.add_parser('delta', help="synchronisation delta (nouveaux messages vers Chatwoot)")
+    delta.add_argument('--workers', type=int, default=MIGRATION_WORKERS)
+
+    commands.add_parser('sync', help="synchronisation continue (live sync)")
+    commands.add_parser('test', help="tester les connexions API")
+
+    for command in (run, delta):
+        command.add_argument('--format', choices=('text', 'json'), default='text',
+                             help="json: rapport du run sur stdout, journal sur stderr")
+    return parser
+
+
+def run_pipeline(args) -> dict:
+    """Commande run: tâches des stages et sources demandés"""
+    reachable = reachable_sources(args.stages, args.sources)
+    return run_stages(args.stages, args.sources, reachable, args.jobs, args.force,
+                      args.limit, args.workers, args.schedule, args.processes)
+
+
+def run_cli(argv) -> int:
+    """Mode non interactif: python -m src.main run --stages clean,transform --sources zendesk"""
+    args = build_parser().parse_args(argv)
+
+    if args.command == 'test':
+        zendesk_ok, intercom_ok = test_apis()
+        print(f"Zendesk: {'OK' if zendesk_ok else 'ERREUR'}")
+        print(f"Intercom: {'OK' if intercom_ok else 'ERREUR'}")
+        return 0 if zendesk_ok and intercom_ok else 1
+
+    if args.command == 'sync':
+        if not check_setup(SERVICES):
+            return 1
+        from src.services.live_sync_service import LiveSyncService
+        return 0 if LiveSyncService().run() else 1
+
+    # En json, stdout ne contient que le rapport final
+    log = sys.stderr if args.format == 'json' else sys.stdout
+    with contextlib.redirect_stdout(log):
+        services = required_services(args.stages, args.sources) if args.command == 'run' else ['chatwoot']
+        if not check_setup(services):
+            return 1
+        run_id = get_manifest().start_run()
+        tasks = {}
+        if args.command == 'run':
+            tasks = run_pipeline(args)
+        elif args.command == 'delta':
+            from src.services.chatwoot_service import migrate_delta
+            with get_metrics().stage("import"):
+                # Même statuts que les tâches du graphe: code de sortie 1 si le delta échoue
+                tasks['chatwoot_delta'] = 'ok' if migrate_delta(workers=args.workers) else 'échec'
+        save_run_report(run_id)
+
+    if args.format == 'json':
+        artifacts = {key: entry['path'] for key, entry in get_manifest().data['artifacts'].items()}
+        json.dump({'run_id': run_id, 'tasks': tasks, 'artifacts': artifacts, 'report': get_metrics().report()},
+                  sys.stdout, indent=2, ensure_ascii=False, default=str)
+        print()
+    return 1 if any(result in ('échec', 'bloquée') for result in tasks.values()) else 0
+
+
+# Choix du menu: stages, sources et question de migration à la fin
+MENU_RUNS = {
+    "1": (('export', 'clean', 'transform', 'prepare'), SOURCES, True),
+    "2": (('export', 'clean', 'transform'), ('zendesk',), False),
+    "3": (('export', 'clean', 'transform'), ('intercom',), False),
+    "4": (('export',), SOURCES, False),
+    "5": (('clean',), SOURCES, False),
+    "6": (('transform', 'prepare'), SOURCES, True)
+}
+# Autres choix: test connexions, delta (Chatwoot seulement), live sync
+MENU_SERVICES = {"7": ('zendesk', 'intercom'), "8": ('chatwoot',), "9": SERVICES}
+
+
 def main():
     """Menu principal"""
     print("MIGRATION ZENDESK & INTERCOM")
@@ -147,48 +237,50 @@ def main():
     print("5. Clean seulement")
     print("6. Transform + Prepare + Migration")
     print("7. Test connexions")
+    print("8. Synchronisation delta (nouveaux messages vers Chatwoot)")
+    print("9. Synchronisation continue (live sync)")
     
-    choice = input("Choix (1-7): ")
+    choice = input("Choix (1-9): ")
     
-    if not check_setup():
+    if choice in MENU_RUNS:
+        stages, sources, migration = MENU_RUNS[choice]
+        services = required_services((*stages, 'import') if migration else stages, sources)
+    else:
+        services = MENU_SERVICES.get(choice, SERVICES)
+    if not check_setup(services):
         return
     
-    zendesk_ok, intercom_ok = test_apis()
+    run_id = get_manifest().start_run()
     
-    if choice == "1":
-        run_export(zendesk_ok, intercom_ok)
-        run_clean(zendesk_ok, intercom_ok)
-        run_transform(zendesk_ok, intercom_ok)
-        run_prepare_chatwoot()
-        ask_and_run_migration()
-    elif choice == "2":
-        if zendesk_ok:
-            run_export(True, False)
-            run_clean(True, False)
-            run_transform(True, False)
-    elif choice == "3":
-        if intercom_ok:
-            run_export(False, True)
-            run_clean(False, True)
-            run_transform(False, True)
-    elif choice == "4":
-        run_export(zendesk_ok, intercom_ok)
-    elif choice == "5":
-        run_clean(True, True)
-    elif choice == "6":
-        run_transform(True, True)
-        run_prepare_chatwoot()
-        ask_and_run_migration()
+    if choice in MENU_RUNS:
+        run_stages(stages, sources, reachable_sources(stages, sources))
+        if migration:
+            ask_and_run_migration()
     elif choice == "7":
+        zendesk_ok, intercom_ok = test_apis()
         print(f"Zendesk: {'OK' if zendesk_ok else 'ERREUR'}")
         print(f"Intercom: {'OK' if intercom_ok else 'ERREUR'}")
+    elif choice == "8":
+        from src.services.chatwoot_service import migrate_delta
+        with get_metrics().stage("import"):
+            migrate_delta()
+    elif choice == "9":
+        from src.services.live_sync_service import LiveSyncService
+        LiveSyncService().run()
     
+    save_run_report(run_id)
     print("\nTerminé!")
 
 if __name__ == "__main__":
     try:
-        main()
+        if len(sys.argv) > 1:
+            # CLI: une erreur remonte avec sa trace (stderr) et le code de sortie 1
+            sys.exit(run_cli(sys.argv[1:]))
+        try:
+            main()
+        except Exception as e:
+            print(f"Erreur: {e}", file=sys.stderr)
+            sys.exit(1)
     except KeyboardInterrupt:
-        print("\nInterrompu")
-    except Exception as e:
-        print(f"Erreur: {e}")
\ No newline at end of file
+        print("\nInterrompu", file=sys.stderr)
+        sys.exit(130)
\ No newline at end of file
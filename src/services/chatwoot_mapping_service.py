@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+from src.utils.helpers import save_json, get_timestamp
+from configs.config import CHATWOOT_OUTPUT_DIR, MAPPING_COMPACT_EVERY
+
+
+MAPPING_PATH = f"{CHATWOOT_OUTPUT_DIR}/chatwoot_id_mapping.json"
+
+
+def conversation_key(conversation: Dict) -> Optional[str]:
+    """Clé source d'une conversation préparée (zendesk:<ticket_id> ou intercom:<conversation_id>)"""
+    if conversation.get('zendesk_ticket_id') is not None:
+        return f"zendesk:{conversation['zendesk_ticket_id']}"
+    if conversation.get('intercom_conversation_id') is not None:
+        return f"intercom:{conversation['intercom_conversation_id']}"
+    return None
+
+
+def message_key(message: Dict) -> str:
+    """Clé source d'un message: ID d'origine, sinon empreinte date + contenu"""
+    if message.get('source_message_id') is not None:
+        return str(message['source_message_id'])
+    raw = f"{message.get('created_at')}|{message.get('content', '')}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class MigrationMapping:
+    """
+    Correspondance IDs source -> IDs Chatwoot, persistée entre les runs.
+    checkpoint() ajoute les changements récents à un journal (fichier voisin .journal, une
+    opération par ligne): coût proportionnel aux changements, appelable après chaque unité.
+    save() réécrit le fichier complet et vide le journal (tous les compact_every changements
+    et en fin de run). Au chargement, le journal est rejoué: un run interrompu ne perd que
+    les changements postérieurs au dernier checkpoint.
+    """
+
+    def __init__(self, path: str = MAPPING_PATH, compact_every: int = MAPPING_COMPACT_EVERY):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._pending = []
+        self._journaled = 0
+        self.data = {'updated_at': None, 'contacts': {}, 'conversations': {}}
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.data.update(json.load(f))
+        self._replay_journal()
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    operation = json.loads(line)
+                except ValueError:
+                    break  # dernière ligne tronquée par l'interruption
+                self._apply(operation, replay=True)
+                self._journaled += 1
+
+    def _apply(self, operation: List, replay: bool = False):
+        kind, key, *values = operation
+        if kind == 'contact':
+            self.data['contacts'][key] = {'contact_id': values[0], 'source_id': values[1]}
+        elif kind == 'conversation':
+            self.data['conversations'][key] = {
+                'conversation_id': values[0],
+                'contact_email': values[1],
+                'status': None,
+                'messages': []
+            }
+        elif kind == 'message':
+            messages = self.data['conversations'][key]['messages']
+            # Rejeu d'un journal déjà compacté (arrêt entre la réécriture et sa suppression)
+            if not (replay and values[0] in messages):
+                messages.append(values[0])
+        elif kind == 'status':
+            self.data['conversations'][key]['status'] = values[0]
+
+    def _record(self, operation: List):
+        with self._lock:
+            self._apply(operation)
+            self._pending.append(operation)
+
+    def checkpoint(self):
+        """Ajouter au journal les changements depuis le dernier checkpoint (compacte au-delà du seuil)"""
+        with self._lock:
+            operations, self._pending = self._pending, []
+            if operations:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                with open(self.journal_path, 'a', encoding='utf-8') as f:
+                    f.write(''.join(json.dumps(operation, ensure_ascii=False) + '\n' for operation in operations))
+                self._journaled += len(operations)
+            compact = self._journaled >= self.compact_every
+        if compact:
+            self.save()
+
+    def save(self) -> str:
+        """Sauvegarder la correspondance complète sur disque (écriture atomique) et vider le journal"""
+        with self._lock:
+            self.data['updated_at'] = get_timestamp(True)
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            save_json(self.data, f"{self.path}.tmp")
+            os.replace(f"{self.path}.tmp", self.path)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._pending = []
+            self._journaled = 0
+            return self.path
+
+    def get_contact(self, email: str) -> Optional[Dict]:
+        return self.data['contacts'].get(email)
+
+    def set_contact(self, email: str, contact_id: int, source_id: str):
+        self._record(['contact', email, contact_id, source_id])
+
+    def get_conversation(self, key: str) -> Optional[Dict]:
+        return self.data['conversations'].get(key)
+
+    def set_conversation(self, key: str, conversation_id: int, contact_email: str):
+        self._record(['conversation', key, conversation_id, contact_email])
+
+    def add_message(self, key: str, msg_key: str):
+        self._record(['message', key, msg_key])
+
+    def set_status(self, key: str, status: str):
+        self._record(['status', key, status])
+
+    def posted_messages(self, key: str) -> List[str]:
+        entry = self.get_conversation(key)
+        return entry['messages'] if entry else []
@@ -1,45 +1,74 @@
 import json
 import os
 from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from src.services.contact_dedup_service import dedup_source_contacts, merged_source_ids
 from src.utils.helpers import save_json, get_file_size, get_timestamp
-from configs.config import ZENDESK_OUTPUT_DIR, INTERCOM_OUTPUT_DIR, CHATWOOT_OUTPUT_DIR
+from src.utils.staging_store import load_records, stage_records
+from src.utils.ndjson_index import write_ndjson, ndjson_path, ndjson_available
+from src.utils.run_manifest import get_run_date, resolve_artifact, up_to_date_artifact, record_artifact
+from configs.config import ZENDESK_OUTPUT_DIR, INTERCOM_OUTPUT_DIR, CHATWOOT_OUTPUT_DIR, CONTACT_MERGE_ENGINE, CONTACT_DEDUP
+
+
+def clean_data_paths() -> Tuple[str, str]:
+    """Chemins des contacts nettoyés Zendesk et Intercom (via le manifeste du run)"""
+    date = get_run_date()
+    zendesk_path = resolve_artifact(
+        "zendesk_users_clean", f"{ZENDESK_OUTPUT_DIR}/clean_export_data/zendesk_users_clean_{date}.json")
+    intercom_path = resolve_artifact(
+        "intercom_contacts_clean", f"{INTERCOM_OUTPUT_DIR}/clean_export_data/intercom_contacts_clean_{date}.json")
+    return zendesk_path, intercom_path
+
+
+def contacts_prepared_path() -> str:
+    """Chemin des contacts préparés (via le manifeste du run)"""
+    return resolve_artifact(
+        "chatwoot_contacts_prepared", f"{CHATWOOT_OUTPUT_DIR}/chatwoot_contacts_prepared_{get_run_date()}.json")
 
 
 def load_clean_data() -> Tuple[List[Dict], List[Dict]]:
     """Charger les données nettoyées de Zendesk et Intercom"""
-    date = get_timestamp()
-    
-    # Paths
-    zendesk_path = f"{ZENDESK_OUTPUT_DIR}/clean_export_data/zendesk_users_clean_{date}.json"
-    intercom_path = f"{INTERCOM_OUTPUT_DIR}/clean_export_data/intercom_contacts_clean_{date}.json"
+    zendesk_path, intercom_path = clean_data_paths()
     
     # Load data
-    with open(zendesk_path, 'r', encoding='utf-8') as f:
-        zendesk_data = json.load(f).get('users', [])
-    
-    with open(intercom_path, 'r', encoding='utf-8') as f:
-        intercom_data = json.load(f).get('contacts', [])
+    zendesk_data = load_records('clean', 'zendesk_users', zendesk_path, 'users')
+    intercom_data = load_records('clean', 'intercom_contacts', intercom_path, 'contacts')
     
     print(f"Chargé: {len(zendesk_data)} Zendesk, {len(intercom_data)} Intercom")
     return zendesk_data, intercom_data
 
 
-def format_contact(data: Dict, source: str, email: str = None) -> Dict:
+def rewrite_email(email: str) -> str:
+    """Adresse Chatwoot d'un email source: user@domaine -> user_domaine@alphorm.com"""
+    if email and '@' in email:
+        username, domain = email.split('@', 1)
+        return f"{username}_{domain}@alphorm.com"
+    return email
+
+
+def source_email(data: Dict, source: str) -> str:
+    """Email de fusion d'un contact source: son email, sinon l'adresse synthétique no-email-<zd|ic>-<id>"""
+    email = data.get('email')
+    if email is None:
+        email = f"no-email-{'zd' if source == 'zendesk' else 'ic'}-{data.get('id')}@alphorm.com"
+    return email
+
+
+def format_contact(data: Dict, source: str, email: str = None, imported_at: str = None) -> Dict:
     """Formater un contact selon la source"""
     final_email = email if email is not None else data.get('email')
-    
-    if final_email and '@' in final_email:
-        username, domain = final_email.split('@', 1)
-        final_email = f"{username}_{domain}@alphorm.com"
+    imported_at = imported_at or get_timestamp(True)
     
     base = {
-        "email": final_email,
+        "email": rewrite_email(final_email),
         "name": data.get('name'),
         "phone_number": data.get('phone'),
         "zendesk_id": data.get('id') if source == "zendesk" else None,
         "intercom_id": data.get('id') if source == "intercom" else None,
-        "imported_from_zd_at": get_timestamp(True) if source == "zendesk" else None,
-        "imported_from_intercom_at": get_timestamp(True) if source == "intercom" else None
+        "imported_from_zd_at": imported_at if source == "zendesk" else None,
+        "imported_from_intercom_at": imported_at if source == "intercom" else None
     }
     
     if source == "zendesk":
@@ -107,14 +136,148 @@ def merge_and_deduplicate(zendesk_data: List[Dict], intercom_data: List[Dict]) -
     return list(contacts.values()), stats
 
 
+def merge_keys(records: List[Dict], prefix: str) -> pd.Series:
+    """Clés de fusion d'une source: email, sinon adresse synthétique no-email-<source>-<id>"""
+    emails = pd.Series([record.get('email') for record in records], dtype=object)
+    ids = pd.Series([record.get('id') for record in records], dtype=object)
+    synthetic = f"no-email-{prefix}-" + ids.map(str) + "@alphorm.com"
+    return emails.where(emails.notna(), synthetic)
+
+
+def last_positions(codes: np.ndarray, size: int) -> np.ndarray:
+    """Position de la dernière occurrence de chaque clé dans une source (-1 si absente)"""
+    positions = np.full(size, -1, dtype=np.int64)
+    # Affectation dans l'ordre des lignes: la dernière occurrence l'emporte
+    positions[codes] = np.arange(len(codes))
+    return positions
+
+
+def merge_and_deduplicate_vectorized(zendesk_data: List[Dict],
+                                     intercom_data: List[Dict]) -> Tuple[List[Dict], Dict]:
+    """
+    Même résultat que merge_and_deduplicate, avec clés, jointure et stats calculées par
+    colonnes (pandas/numpy): chaque contact final est formaté une seule fois, avec une
+    seule date d'import pour tout le lot.
+    """
+    imported_at = get_timestamp(True)
+    zendesk_keys = merge_keys(zendesk_data, 'zd')
+    intercom_keys = merge_keys(intercom_data, 'ic')
+
+    # Codes de clés communs aux deux sources, numérotés par ordre de première apparition
+    codes, keys = pd.factorize(pd.concat([zendesk_keys, intercom_keys], ignore_index=True))
+    zendesk_codes = codes[:len(zendesk_keys)]
+    intercom_codes = codes[len(zendesk_keys):]
+
+    # Une ligne Intercom est une fusion si sa clé est déjà vue (Zendesk ou Intercom précédent)
+    _, first_rows = np.unique(codes, return_index=True)
+    intercom_new = int((first_rows >= len(zendesk_keys)).sum())
+    stats = {
+        'zendesk': len(zendesk_keys),
+        'intercom': intercom_new,
+        'merged': len(intercom_keys) - intercom_new,
+        'no_email': sum(1 for record in zendesk_data if record.get('email') is None) +
+                    sum(1 for record in intercom_data if record.get('email') is None)
+    }
+
+    zendesk_last = last_positions(zendesk_codes, len(keys))
+    intercom_last = last_positions(intercom_codes, len(keys))
+
+    contacts = []
+    for key, zendesk_pos, intercom_pos in zip(keys.tolist(), zendesk_last.tolist(), intercom_last.tolist()):
+        if intercom_pos < 0:
+            contacts.append(format_contact(zendesk_data[zendesk_pos], "zendesk", key, imported_at))
+            continue
+
+        # Fusion: données Intercom + ID Zendesk
+        contact = format_contact(intercom_data[intercom_pos], "intercom", key, imported_at)
+        if zendesk_pos >= 0:
+            contact['zendesk_id'] = zendesk_data[zendesk_pos].get('id')
+            contact['imported_from_zd_at'] = imported_at
+        contacts.append(contact)
+
+    return contacts, stats
+
+
+def attach_merged_ids(contacts: List[Dict], clusters: List[Dict]):
+    """
+    Garder sur chaque contact fusionné tous les IDs source de son cluster (merged_ids),
+    pour rattacher les conversations de chacun d'eux.
+    """
+    by_email = {contact['email']: contact for contact in contacts}
+    for email, ids in merged_source_ids(clusters).items():
+        contact = by_email.get(rewrite_email(email))
+        if contact:
+            contact['merged_ids'] = ids
+
+
+def add_prepared_contacts(new_contacts: List[Dict]) -> int:
+    """
+    Ajouter des contacts au fichier des contacts préparés du run (ex: orphelins résolus).
+    Un contact dont l'email existe déjà y est rattaché par merged_ids.
+    Retourne le nombre de contacts ajoutés.
+    """
+    filepath = contacts_prepared_path()
+    with open(filepath, 'r', encoding='utf-8') as f:
+        output_data = json.load(f)
+    contacts = output_data.get('contacts', [])
+    by_email = {contact['email']: contact for contact in contacts}
+
+    added = 0
+    for contact in new_contacts:
+        existing = by_email.get(contact['email'])
+        if existing is None:
+            contacts.append(contact)
+            by_email[contact['email']] = contact
+            added += 1
+            continue
+        merged_ids = existing.setdefault('merged_ids', {'zendesk': [], 'intercom': []})
+        if contact.get('zendesk_id'):
+            merged_ids['zendesk'].append(contact['zendesk_id'])
+        if contact.get('intercom_id'):
+            merged_ids['intercom'].append(contact['intercom_id'])
+
+    output_data['contacts'] = contacts
+    output_data['metadata']['total_contacts'] = len(contacts)
+    output_data['metadata'].setdefault('stats', {})['resolved_orphans'] = \
+        output_data['metadata'].get('stats', {}).get('resolved_orphans', 0) + added
+    save_json(output_data, filepath)
+    write_ndjson(contacts, ndjson_path(filepath))
+    stage_records('prepared', 'chatwoot_contacts', contacts, filepath)
+    input_paths = [path for path in clean_data_paths() if os.path.exists(path)]
+    record_artifact("chatwoot_contacts_prepared", filepath, len(contacts), "prepare", input_paths)
+    return added
+
+
 def prepare_contacts_for_chatwoot() -> str:
     """Préparer les contacts pour l'import Chatwoot"""
     print("Préparation contacts Chatwoot")
     print("=" * 30)
     
+    input_paths = list(clean_data_paths())
+    unchanged = up_to_date_artifact("chatwoot_contacts_prepared", input_paths)
+    if unchanged and ndjson_available(ndjson_path(unchanged)):
+        print(f"Stage ignoré (entrées inchangées): {os.path.basename(unchanged)}")
+        return unchanged
+    
     # Load, merge, save
     zendesk_data, intercom_data = load_clean_data()
-    contacts, stats = merge_and_deduplicate(zendesk_data, intercom_data)
+    clusters = []
+    if CONTACT_DEDUP == "fuzzy":
+        zendesk_data, intercom_data, clusters = dedup_source_contacts(zendesk_data, intercom_data)
+    
+    if CONTACT_MERGE_ENGINE == "pandas":
+        contacts, stats = merge_and_deduplicate_vectorized(zendesk_data, intercom_data)
+    else:
+        contacts, stats = merge_and_deduplicate(zendesk_data, intercom_data)
+    
+    if clusters:
+        attach_merged_ids(contacts, clusters)
+        stats['fuzzy_clusters'] = len(clusters)
+        clusters_path = os.path.join(CHATWOOT_OUTPUT_DIR, f"contact_dedup_clusters_{get_run_date()}.json")
+        os.makedirs(CHATWOOT_OUTPUT_DIR, exist_ok=True)
+        save_json({'metadata': {'prepared_at': get_timestamp(True), 'total_clusters': len(clusters)},
+                   'clusters': clusters}, clusters_path)
+        print(f"Doublons détectés: {len(clusters)} clusters ({os.path.basename(clusters_path)})")
     
     output_data = {
         'metadata': {
@@ -126,9 +289,13 @@ def prepare_contacts_for_chatwoot() -> str:
     }
     
     # Save
-    filepath = os.path.join(CHATWOOT_OUTPUT_DIR, f"chatwoot_contacts_prepared_{get_timestamp()}.json")
+    filepath = os.path.join(CHATWOOT_OUTPUT_DIR, f"chatwoot_contacts_prepared_{get_run_date()}.json")
     os.makedirs(CHATWOOT_OUTPUT_DIR, exist_ok=True)
     save_json(output_data, filepath)
+    # Copie NDJSON: l'import en flux parcourt les contacts sans tout charger (pas d'index, jamais cherchés)
+    write_ndjson(contacts, ndjson_path(filepath))
+    stage_records('prepared', 'chatwoot_contacts', contacts, filepath)
+    record_artifact("chatwoot_contacts_prepared", filepath, len(contacts), "prepare", input_paths)
     
     print(f"Contacts préparés: {len(contacts)} ({get_file_size(filepath)})")
     print(f"Stats: ZD:{stats['zendesk']}, IC:{stats['intercom']}, Fusionnés:{stats['merged']}")
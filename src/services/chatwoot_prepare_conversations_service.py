@@ -2,21 +2,47 @@ import json
 import os
 from typing import Dict, List, Tuple
 from src.utils.helpers import save_json, get_file_size, get_timestamp
-from configs.config import ZENDESK_OUTPUT_DIR, INTERCOM_OUTPUT_DIR, CHATWOOT_OUTPUT_DIR
+from src.utils.staging_store import load_records, stage_records, use_staging_store, get_store
+from src.utils.ndjson_index import write_ndjson, ndjson_path, ndjson_available
+from src.utils.records import (
+    PreparedComment, PreparedMessage, PreparedSourceMessage, TRANSFORMED_MESSAGES, intern_value, record_hook
+)
+from src.utils.run_manifest import (
+    file_checksum, get_run_date, resolve_artifact, recorded_artifact, up_to_date_artifact, record_artifact
+)
+from src.services.chatwoot_mapping_service import conversation_key
+from src.services.chatwoot_prepare_contacts_service import contacts_prepared_path
+from src.services.orphan_resolution_service import resolve_orphans
+from src.services.snapshot_diff_service import diff_records, load_snapshot, print_diff_stats
+from configs.config import ZENDESK_OUTPUT_DIR, INTERCOM_OUTPUT_DIR, CHATWOOT_OUTPUT_DIR, INCREMENTAL_STAGES, RESOLVE_ORPHANS
+
+
+# Index de la copie NDJSON des conversations préparées
+CONVERSATION_INDEXES = {
+    'key': conversation_key,
+    'contact_email': lambda conversation: conversation.get('contact_email')
+}
+
+
+def transformed_data_paths() -> Tuple[str, str]:
+    """Chemins des tickets/conversations transformés (via le manifeste du run)"""
+    date = get_run_date()
+    zendesk_path = resolve_artifact(
+        "zendesk_tickets_transformed", f"{ZENDESK_OUTPUT_DIR}/transformed_data/zendesk_tickets_transformed_{date}.json")
+    intercom_path = resolve_artifact(
+        "intercom_conversations_transformed",
+        f"{INTERCOM_OUTPUT_DIR}/transformed_data/intercom_conversations_transformed_{date}.json")
+    return zendesk_path, intercom_path
 
 
 def load_transformed_data() -> Tuple[List[Dict], List[Dict]]:
     """Charger les conversations/tickets transformés"""
-    date = get_timestamp()
-    
-    zendesk_path = f"{ZENDESK_OUTPUT_DIR}/transformed_data/zendesk_tickets_transformed_{date}.json"
-    intercom_path = f"{INTERCOM_OUTPUT_DIR}/transformed_data/intercom_conversations_transformed_{date}.json"
-    
-    with open(zendesk_path, 'r', encoding='utf-8') as f:
-        zendesk_data = json.load(f).get('tickets', [])
+    zendesk_path, intercom_path = transformed_data_paths()
     
-    with open(intercom_path, 'r', encoding='utf-8') as f:
-        intercom_data = json.load(f).get('conversations', [])
+    # Messages chargés directement en enregistrements compacts (pas de dict par message)
+    hook = record_hook(*TRANSFORMED_MESSAGES)
+    zendesk_data = load_records('transformed', 'zendesk_tickets', zendesk_path, 'tickets', hook)
+    intercom_data = load_records('transformed', 'intercom_conversations', intercom_path, 'conversations', hook)
     
     print(f"Chargé: {len(zendesk_data)} tickets, {len(intercom_data)} conversations")
     return zendesk_data, intercom_data
@@ -24,12 +50,25 @@ def load_transformed_data() -> Tuple[List[Dict], List[Dict]]:
 
 def load_contact_index() -> Tuple[Dict, Dict]:
     """Charger index des contacts pour mapping rapide"""
-    date = get_timestamp()
-    contacts_path = f"{CHATWOOT_OUTPUT_DIR}/chatwoot_contacts_prepared_{date}.json"
+    contacts_path = contacts_prepared_path()
+    
+    # Avec le staging SQLite (copie de ce même fichier), l'index est une requête sur deux colonnes
+    if use_staging_store() and get_store().staged_from('prepared', 'chatwoot_contacts', contacts_path):
+        zendesk_index, intercom_index = get_store().contact_index()
+        print(f"Index contacts: {len(zendesk_index)} Zendesk, {len(intercom_index)} Intercom")
+        return zendesk_index, intercom_index
+    
     
     with open(contacts_path, 'r', encoding='utf-8') as f:
         contacts = json.load(f).get('contacts', [])
     
+    zendesk_index, intercom_index = build_contact_index(contacts)
+    print(f"Index contacts: {len(zendesk_index)} Zendesk, {len(intercom_index)} Intercom")
+    return zendesk_index, intercom_index
+
+
+def build_contact_index(contacts: List[Dict]) -> Tuple[Dict, Dict]:
+    """Index zendesk_id/intercom_id -> email des contacts préparés (IDs fusionnés compris)"""
     zendesk_index = {}
     intercom_index = {}
     
@@ -38,8 +77,12 @@ def load_contact_index() -> Tuple[Dict, Dict]:
             zendesk_index[contact['zendesk_id']] = contact['email']
         if contact.get('intercom_id'):
             intercom_index[contact['intercom_id']] = contact['email']
-    
-    print(f"Index contacts: {len(zendesk_index)} Zendesk, {len(intercom_index)} Intercom")
+        # Contacts fusionnés par le dédoublonnage: tous les IDs du cluster
+        merged_ids = contact.get('merged_ids') or {}
+        for zendesk_id in merged_ids.get('zendesk', []):
+            zendesk_index[zendesk_id] = contact['email']
+        for intercom_id in merged_ids.get('intercom', []):
+            intercom_index[intercom_id] = contact['email']
     return zendesk_index, intercom_index
 
 def format_conversation(data: Dict, source: str, contact_email: str) -> Dict:
@@ -52,18 +95,19 @@ def format_conversation(data: Dict, source: str, contact_email: str) -> Dict:
             # Si author_id = requester_id, c'est le client
             is_client_message = comment.get('author_id') == data.get('requester_id')
             
-            messages.append({
-                'content': comment['content'].replace('<br>', '\n'),
-                'message_type': 'incoming' if is_client_message else 'outgoing',
-                'author_name': 'Client' if is_client_message else 'Agent',
-                'created_at': comment.get('created_at'),
-                'attachments': comment.get('attachments', [])
-            })
+            messages.append(PreparedComment(
+                source_message_id=comment.get('id'),
+                content=comment['content'].replace('<br>', '\n'),
+                message_type='incoming' if is_client_message else 'outgoing',
+                author_name='Client' if is_client_message else 'Agent',
+                created_at=comment.get('created_at'),
+                attachments=comment.get('attachments', [])
+            ))
         
         return {
             'contact_email': contact_email,
             'title': data.get('subject', 'Sans titre'),
-            'status': 'resolved' if data.get('status') in ['solved', 'closed'] else data.get('status'),
+            'status': 'resolved' if data.get('status') in ['solved', 'closed'] else intern_value(data.get('status')),
             'zendesk_ticket_id': data.get('id'),
             'intercom_conversation_id': None,
             'created_at': data.get('created_at'),
@@ -82,12 +126,13 @@ def format_conversation(data: Dict, source: str, contact_email: str) -> Dict:
         source_desc = data.get('source', {}).get('description')
         if source_desc:
             author_name = data.get('source', {}).get('author_name', 'Client')
-            messages.append({
-                'content': source_desc.replace('<br>', '\n'),
-                'message_type': 'incoming',
-                'author_name': author_name,
-                'created_at': data.get('created_at')
-            })
+            messages.append(PreparedSourceMessage(
+                source_message_id=f"source-{data.get('id')}",
+                content=source_desc.replace('<br>', '\n'),
+                message_type='incoming',
+                author_name=author_name,
+                created_at=data.get('created_at')
+            ))
         
         # Traiter les messages
         for msg in data.get('messages', []):
@@ -100,14 +145,15 @@ def format_conversation(data: Dict, source: str, contact_email: str) -> Dict:
             else:
                 message_type = 'outgoing'
             
-            messages.append({
-                'content': msg['content'].replace('<br>', '\n'),
-                'content_type_msg': msg.get('message_type'),
-                'message_type': message_type,
-                'author_name': msg.get('author_name', 'Unknown'),
-                'created_at': msg.get('created_at'),
-                'attachments': msg.get('attachments', [])
-            })
+            messages.append(PreparedMessage(
+                source_message_id=msg.get('id'),
+                content=msg['content'].replace('<br>', '\n'),
+                content_type_msg=msg.get('message_type'),
+                message_type=message_type,
+                author_name=msg.get('author_name', 'Unknown'),
+                created_at=msg.get('created_at'),
+                attachments=msg.get('attachments', [])
+            ))
         
         # Retourner la conversation formatée
         return {
@@ -126,17 +172,80 @@ def format_conversation(data: Dict, source: str, contact_email: str) -> Dict:
             'messages': messages
         }
 
-def prepare_conversations_for_chatwoot() -> str:
-    """Préparer conversations pour l'import Chatwoot"""
+def load_previous_preparation(zendesk_tickets: List[Dict], intercom_convs: List[Dict]) -> Dict:
+    """
+    Charger la préparation précédente et les conversations inchangées depuis.
+    Le diff est fait contre les fichiers transformés exacts de cette préparation (entrées
+    enregistrées au manifeste, checksums vérifiés): sinon, traitement complet.
+    Retourne {'previous': {clé: conversation préparée}, 'unchanged': {clés}}.
+    """
+    entry = recorded_artifact("chatwoot_conversations_prepared")
+    if not entry:
+        print("Incrémental conversations: aucune préparation précédente, traitement complet")
+        return {'previous': {}, 'unchanged': set()}
+
+    # Entrées de la préparation précédente, encore identiques sur disque
+    inputs = {}
+    for path, checksum in entry.get('inputs', {}).items():
+        if os.path.exists(path) and file_checksum(path) == checksum:
+            inputs[os.path.basename(path)] = path
+    zendesk_previous = next((path for name, path in inputs.items()
+                             if name.startswith("zendesk_tickets_transformed")), None)
+    intercom_previous = next((path for name, path in inputs.items()
+                              if name.startswith("intercom_conversations_transformed")), None)
+    if not zendesk_previous and not intercom_previous:
+        print("Incrémental conversations: entrées de la préparation précédente introuvables, traitement complet")
+        return {'previous': {}, 'unchanged': set()}
+
+    previous = {conversation_key(conv): conv for conv in load_snapshot(entry['path'], 'conversations')}
+    unchanged = set()
+    if zendesk_previous:
+        diff = diff_records(load_snapshot(zendesk_previous, 'tickets'), zendesk_tickets)
+        print_diff_stats("tickets", diff)
+        unchanged.update(f"zendesk:{ticket_id}" for ticket_id in diff['unchanged'])
+    if intercom_previous:
+        diff = diff_records(load_snapshot(intercom_previous, 'conversations'), intercom_convs)
+        print_diff_stats("conversations", diff)
+        unchanged.update(f"intercom:{conv_id}" for conv_id in diff['unchanged'])
+
+    return {'previous': previous, 'unchanged': unchanged}
+
+def prepare_conversations_for_chatwoot(incremental: bool = INCREMENTAL_STAGES,
+                                       resolve_missing: bool = RESOLVE_ORPHANS) -> str:
+    """
+    Préparer conversations pour l'import Chatwoot.
+    resolve_missing: récupérer par lots les contacts absents de l'export au lieu d'ignorer leurs conversations
+    """
     print("Préparation conversations Chatwoot")
     print("=" * 35)
     
+    input_paths = [*transformed_data_paths(), contacts_prepared_path()]
+    unchanged = up_to_date_artifact("chatwoot_conversations_prepared", input_paths)
+    if unchanged and ndjson_available(ndjson_path(unchanged)):
+        print(f"Stage ignoré (entrées inchangées): {os.path.basename(unchanged)}")
+        return unchanged
+    
     # Charger données
     zendesk_tickets, intercom_convs = load_transformed_data()
     zendesk_index, intercom_index = load_contact_index()
+    if resolve_missing:
+        resolve_orphans(zendesk_tickets, intercom_convs, zendesk_index, intercom_index)
     
     conversations = []
-    stats = {'zendesk': 0, 'intercom': 0, 'orphans': 0}
+    stats = {'zendesk': 0, 'intercom': 0, 'orphans': 0, 'reused': 0}
+    
+    reuse = {'previous': {}, 'unchanged': set()}
+    if incremental:
+        reuse = load_previous_preparation(zendesk_tickets, intercom_convs)
+    
+    def prepare(data: Dict, source: str, email: str) -> Dict:
+        # Reprendre la conversation préparée si ni la source ni le contact n'ont changé
+        key = f"{source}:{data.get('id')}"
+        previous = reuse['previous'].get(key)
+        if key in reuse['unchanged'] and previous and previous.get('contact_email') == email:
+            stats['reused'] += 1
+            return previous
+        return format_conversation(data, source, email)
     
     # Traiter tickets Zendesk
     for ticket in zendesk_tickets:
@@ -144,7 +253,7 @@ def prepare_conversations_for_chatwoot() -> str:
         email = zendesk_index.get(requester_id)
         
         if email:
-            conv = format_conversation(ticket, 'zendesk', email)
+            conv = prepare(ticket, 'zendesk', email)
             conversations.append(conv)
             stats['zendesk'] += 1
         else:
@@ -156,7 +265,7 @@ def prepare_conversations_for_chatwoot() -> str:
         email = intercom_index.get(contact_id)
         
         if email:
-            formatted_conv = format_conversation(conv, 'intercom', email)
+            formatted_conv = prepare(conv, 'intercom', email)
             conversations.append(formatted_conv)
             stats['intercom'] += 1
         else:
@@ -173,9 +282,13 @@ def prepare_conversations_for_chatwoot() -> str:
     }
     
     # Sauvegarde
-    filepath = os.path.join(CHATWOOT_OUTPUT_DIR, f"chatwoot_conversations_prepared_{get_timestamp()}.json")
+    filepath = os.path.join(CHATWOOT_OUTPUT_DIR, f"chatwoot_conversations_prepared_{get_run_date()}.json")
     os.makedirs(CHATWOOT_OUTPUT_DIR, exist_ok=True)
     save_json(output_data, filepath)
+    # Copie NDJSON indexée: accès à une conversation ou aux conversations d'un contact sans tout charger
+    write_ndjson(conversations, ndjson_path(filepath), CONVERSATION_INDEXES)
+    stage_records('prepared', 'chatwoot_conversations', conversations, filepath, key=conversation_key)
+    record_artifact("chatwoot_conversations_prepared", filepath, len(conversations), "prepare", input_paths)
     
     print(f"Conversations préparées: {len(conversations)} ({get_file_size(filepath)})")
     print(f"Stats: ZD:{stats['zendesk']}, IC:{stats['intercom']}, Orphelins:{stats['orphans']}")
@@ -0,0 +1,128 @@
+import heapq
+import time
+from datetime import datetime
+from typing import Dict, List
+from configs.config import CHATWOOT_RATE_LIMIT, CHATWOOT_REQUEST_LATENCY, ATTACHMENT_BANDWIDTH, RECENT_DAYS
+
+
+# Requêtes Chatwoot fixes par unité de travail
+REQUESTS_PER_CONTACT = 1        # création du contact
+REQUESTS_PER_CONVERSATION = 2   # création + toggle_status
+
+
+def seconds_per_request(workers: int = 1) -> float:
+    """Durée estimée d'une requête pour un worker (latence ou quota partagé)"""
+    rate_per_worker = CHATWOOT_RATE_LIMIT / 60 / max(workers, 1)
+    return max(CHATWOOT_REQUEST_LATENCY, 1 / rate_per_worker)
+
+
+def estimate_attachment_bytes(message: Dict) -> int:
+    """Taille totale des pièces jointes d'un message (Zendesk: size, Intercom: filesize)"""
+    total = 0
+    for attachment in message.get('attachments', []) or []:
+        total += attachment.get('size') or attachment.get('filesize') or 0
+    return total
+
+
+def estimate_conversation_cost(conversation: Dict, workers: int = 1) -> float:
+    """Coût estimé (secondes) de l'import d'une conversation"""
+    messages = conversation.get('messages', [])
+    attachment_bytes = sum(estimate_attachment_bytes(m) for m in messages)
+
+    requests_count = REQUESTS_PER_CONVERSATION + len(messages)
+    # Les pièces jointes sont téléchargées puis renvoyées à Chatwoot
+    transfer_time = 2 * attachment_bytes / ATTACHMENT_BANDWIDTH
+
+    return requests_count * seconds_per_request(workers) + transfer_time
+
+
+def estimate_unit_cost(conversations: List[Dict], workers: int = 1) -> float:
+    """Coût estimé (secondes) d'un contact et de toutes ses conversations"""
+    cost = REQUESTS_PER_CONTACT * seconds_per_request(workers)
+    for conv in conversations:
+        cost += estimate_conversation_cost(conv, workers)
+    return cost
+
+
+def build_work_units(contacts: List[Dict], conversations_by_email: Dict[str, List[Dict]],
+                     workers: int = 1) -> List[Dict]:
+    """Construire les unités de travail (contact + conversations) avec leur coût"""
+    units = []
+    for contact in contacts:
+        conversations = conversations_by_email.get(contact.get('email'), [])
+        units.append({
+            'contact': contact,
+            'conversations': conversations,
+            'cost': estimate_unit_cost(conversations, workers)
+        })
+    return units
+
+
+def order_longest_first(units: List[Dict]) -> List[Dict]:
+    """Trier les unités par coût décroissant (LPT), ordre stable à coût égal"""
+    return sorted(units, key=lambda unit: unit['cost'], reverse=True)
+
+
+def predict_makespan(units: List[Dict], workers: int = 1) -> float:
+    """Simuler l'ordonnancement glouton des unités sur N workers"""
+    if not units:
+        return 0.0
+
+    loads = [0.0] * max(workers, 1)
+    heapq.heapify(loads)
+    for unit in units:
+        # Chaque unité part sur le premier worker libre
+        heapq.heappush(loads, heapq.heappop(loads) + unit['cost'])
+    return max(loads)
+
+
+def parse_created_at(value) -> float:
+    """Convertir un created_at (ISO Zendesk ou timestamp Unix Intercom) en timestamp"""
+    if value is None or value == '':
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def build_recency_units(contacts: List[Dict], conversations_by_email: Dict[str, List[Dict]],
+                        workers: int = 1) -> List[Dict]:
+    """
+    Une unité par conversation, triées par created_at décroissant tous contacts confondus.
+    Les contacts sans conversation sont ajoutés à la fin.
+    """
+    recent_since = time.time() - RECENT_DAYS * 86400
+    conversation_units = []
+    contact_units = []
+
+    for contact in contacts:
+        conversations = conversations_by_email.get(contact.get('email'), [])
+        if not conversations:
+            contact_units.append({
+                'contact': contact,
+                'conversations': [],
+                'cost': estimate_unit_cost([], workers),
+                'created_at': 0.0,
+                'recent': False
+            })
+            continue
+        for conv in conversations:
+            created_at = parse_created_at(conv.get('created_at'))
+            conversation_units.append({
+                'contact': contact,
+                'conversations': [conv],
+                'cost': estimate_conversation_cost(conv, workers),
+                'created_at': created_at,
+                'recent': created_at >= recent_since
+            })
+
+    conversation_units.sort(key=lambda unit: unit['created_at'], reverse=True)
+    return conversation_units + contact_units
+
+
+def unit_weight(unit: Dict) -> int:
+    """Poids d'une unité pour la progression: nombre de messages (au moins 1)"""
+    return max(sum(len(conv.get('messages', [])) for conv in unit['conversations']), 1)
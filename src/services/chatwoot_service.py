@@ -1,25 +1,84 @@
 import json
 import os
-from typing import Dict, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 import requests
 from src.api.chatwoot_client import ChatwootClient
-from src.utils.helpers import get_timestamp
-from configs.config import CHATWOOT_OUTPUT_DIR
+from src.services.chatwoot_mapping_service import MigrationMapping, conversation_key, message_key
+from src.services.chatwoot_schedule_service import (
+    build_work_units, build_recency_units, order_longest_first, predict_makespan, unit_weight
+)
+from src.utils.helpers import debug, get_timestamp, find_latest_file
+from src.utils.staging_store import load_records
+from src.utils.records import PREPARED_MESSAGES, record_hook
+from src.utils.metrics import get_metrics
+from src.utils.progress import ProgressReporter
+from src.utils.ndjson_index import NdjsonReader, ndjson_available, ndjson_path
+from src.utils.run_manifest import get_run_date, resolve_artifact
+from configs.config import (
+    CHATWOOT_OUTPUT_DIR, CHATWOOT_RATE_LIMIT, MIGRATION_WORKERS, MIGRATION_SCHEDULE, RECENT_DAYS
+)
+
+def prepared_data_paths() -> Tuple[str, str]:
+    """Chemins des contacts et conversations préparés (via le manifeste du run)"""
+    date = get_run_date()
+    contacts_path = resolve_artifact(
+        "chatwoot_contacts_prepared", f"{CHATWOOT_OUTPUT_DIR}/chatwoot_contacts_prepared_{date}.json")
+    conversations_path = resolve_artifact(
+        "chatwoot_conversations_prepared", f"{CHATWOOT_OUTPUT_DIR}/chatwoot_conversations_prepared_{date}.json")
+    return contacts_path, conversations_path
 
 def load_prepared_data():
-    date = get_timestamp()
-    contacts_path = f"{CHATWOOT_OUTPUT_DIR}/chatwoot_contacts_prepared_{date}.json"
-    conversations_path = f"{CHATWOOT_OUTPUT_DIR}/chatwoot_conversations_prepared_{date}.json"
+    contacts_path, conversations_path = prepared_data_paths()
+
+    contacts_data = load_records('prepared', 'chatwoot_contacts', contacts_path, 'contacts')
+    conversations_data = load_records('prepared', 'chatwoot_conversations', conversations_path, 'conversations',
+                                      record_hook(*PREPARED_MESSAGES))
+
+    print(f"Chargé: {len(contacts_data)} contacts, {len(conversations_data)} conversations")
+    return contacts_data, conversations_data
+
+def load_latest_prepared_data():
+    """Charger les derniers fichiers préparés, quelle que soit leur date"""
+    contacts_path = find_latest_file(CHATWOOT_OUTPUT_DIR, "chatwoot_contacts_prepared")
+    conversations_path = find_latest_file(CHATWOOT_OUTPUT_DIR, "chatwoot_conversations_prepared")
+    if not contacts_path or not conversations_path:
+        raise FileNotFoundError(f"Aucun fichier préparé dans {CHATWOOT_OUTPUT_DIR}")
 
     with open(contacts_path, 'r', encoding='utf-8') as f:
         contacts_data = json.load(f).get('contacts', [])
     with open(conversations_path, 'r', encoding='utf-8') as f:
-        conversations_data = json.load(f).get('conversations', [])
+        conversations_data = json.load(f, object_hook=record_hook(*PREPARED_MESSAGES)).get('conversations', [])
 
-    print(f"Chargé: {len(contacts_data)} contacts, {len(conversations_data)} conversations")
+    print(f"Chargé: {len(contacts_data)} contacts, {len(conversations_data)} conversations "
+          f"({os.path.basename(conversations_path)})")
     return contacts_data, conversations_data
 
+def open_prepared_ndjson(json_path: str) -> NdjsonReader:
+    """Ouvrir la copie NDJSON indexée d'un fichier préparé"""
+    path = ndjson_path(json_path)
+    if not ndjson_available(path):
+        raise FileNotFoundError(f"Index NDJSON absent: {path} (relancer la préparation)")
+    return NdjsonReader(path)
+
+def open_prepared_conversations() -> NdjsonReader:
+    """Ouvrir la copie NDJSON indexée des conversations préparées"""
+    return open_prepared_ndjson(prepared_data_paths()[1])
+
+def load_contact_conversations(email: str) -> List[Dict]:
+    """Conversations préparées d'un contact, sans charger tout le fichier"""
+    with open_prepared_conversations() as reader:
+        return reader.get('contact_email', email)
+
+def load_conversation(key: str) -> Optional[Dict]:
+    """Conversation préparée par clé source (ex: zendesk:123 ou intercom:456)"""
+    with open_prepared_conversations() as reader:
+        return reader.get_one('key', key)
+
 def group_conversations_by_contact(conversations: List[Dict]) -> Dict[str, List[Dict]]:
     grouped = {}
     for conv in conversations:
@@ -67,12 +126,46 @@ def import_contact_to_chatwoot(client: ChatwootClient, contact: Dict, inbox_id:
     if contact.get("avatar_url"):
         contact_data["avatar_url"] = contact["avatar_url"]
 
-    print(f"Création contact Chatwoot: {contact_data.get('email', contact_data.get('name'))}")
+    debug(f"Création contact Chatwoot: {contact_data.get('email', contact_data.get('name'))}")
     return client.create_contact(contact_data)
 
+def post_message(client: ChatwootClient, conversation_id: int, message: Dict):
+    attachment_files = []
+    for attachment in message.get('attachments', []):
+        try:
+            file_url = (
+                attachment.get('content_url') or
+                attachment.get('mapped_content_url') or
+                attachment.get('url')
+            )
+            if file_url:
+                response = requests.get(file_url, timeout=30)
+                if response.status_code == 200:
+                    filename = attachment.get('name') or attachment.get('file_name', 'attachment')
+                    attachment_files.append((filename, response.content))
+                    debug(f"Pièce jointe téléchargée: {filename}")
+        except Exception as e:
+            print(f"Erreur téléchargement pièce jointe: {e}")
+
+    if attachment_files:
+        return client.create_message_with_attachments(
+            conversation_id=conversation_id,
+            content=message['content'],
+            message_type=message.get('message_type', 'incoming'),
+            private=True if message.get('content_type_msg') == 'note' else False,
+            attachment_files=attachment_files
+        )
+    return client.create_message(
+        conversation_id=conversation_id,
+        content=message['content'],
+        message_type=message.get('message_type', 'incoming'),
+        private=True if message.get('content_type_msg') == 'note' else False
+    )
+
 def import_conversation_to_chatwoot(client: ChatwootClient, conversation: Dict,
                                    contact_id: int, source_id: str,
-                                   inbox_id: int, status: str) -> Dict:
+                                   inbox_id: int, status: str,
+                                   mapping: MigrationMapping = None) -> Dict:
     created_conv = client.create_conversation(
         source_id=source_id,
         inbox_id=inbox_id,
@@ -81,59 +174,219 @@ def import_conversation_to_chatwoot(client: ChatwootClient, conversation: Dict,
     )
     conversation_id = created_conv.get('id')
 
+    key = conversation_key(conversation)
+    if mapping and key:
+        mapping.set_conversation(key, conversation_id, conversation.get('contact_email'))
+
     messages_added = 0
     for message in conversation.get('messages', []):
-        attachment_files = []
-        for attachment in message.get('attachments', []):
-            try:
-                file_url = (
-                    attachment.get('content_url') or
-                    attachment.get('mapped_content_url') or
-                    attachment.get('url')
-                )
-                if file_url:
-                    response = requests.get(file_url, timeout=30)
-                    if response.status_code == 200:
-                        filename = attachment.get('name') or attachment.get('file_name', 'attachment')
-                        attachment_files.append((filename, response.content))
-                        print(f"Pièce jointe téléchargée: {filename}")
-            except Exception as e:
-                print(f"Erreur téléchargement pièce jointe: {e}")
-
         try:
-            if attachment_files:
-                client.create_message_with_attachments(
-                    conversation_id=conversation_id,
-                    content=message['content'],
-                    message_type=message.get('message_type', 'incoming'),
-                    private=True if message.get('content_type_msg') == 'note' else False,
-                    attachment_files=attachment_files
-                )
-            else:
-                client.create_message(
-                    conversation_id=conversation_id,
-                    content=message['content'],
-                    message_type=message.get('message_type', 'incoming'),
-                    private=True if message.get('content_type_msg') == 'note' else False
-                )
+            post_message(client, conversation_id, message)
             messages_added += 1
+            if mapping and key:
+                mapping.add_message(key, message_key(message))
         except Exception as e:
             print(f"Erreur message: {e}")
 
-    print(f"Conversation {conversation_id}: {messages_added} messages ajoutés")
+    debug(f"Conversation {conversation_id}: {messages_added} messages ajoutés")
     client.update_conversation_status(conversation_id, status)
+    if mapping and key:
+        mapping.set_status(key, status)
     return created_conv
 
-def migrate_all_data(limit: int = None):
+class ContactRegistry:
+    """
+    Contacts Chatwoot créés pendant le run: email -> (contact_id, source_id).
+    Avec reuse_mapping, les contacts déjà migrés lors d'un run précédent sont réutilisés.
+    """
+
+    def __init__(self, mapping: MigrationMapping = None, reuse_mapping: bool = False):
+        self._contacts = {}
+        self._lock = threading.Lock()
+        self._email_locks = {}
+        self.mapping = mapping
+
+        if mapping and reuse_mapping:
+            for email, entry in mapping.data['contacts'].items():
+                self._contacts[email] = (entry['contact_id'], entry['source_id'])
+
+    def get_or_create(self, client: ChatwootClient, contact: Dict, inbox_id: int) -> Tuple[int, str, bool]:
+        """Retourner le contact Chatwoot, en le créant à sa première utilisation"""
+        email = contact.get('email')
+        with self._lock:
+            email_lock = self._email_locks.setdefault(email, threading.Lock())
+
+        # Un seul worker crée un contact donné, les autres attendent son ID
+        with email_lock:
+            if email in self._contacts:
+                contact_id, source_id = self._contacts[email]
+                return contact_id, source_id, False
+
+            created_contact = import_contact_to_chatwoot(client, contact, inbox_id)
+            contact_payload = created_contact.get('payload', {}).get('contact', {})
+            contact_id = contact_payload.get('id')
+            contact_inboxes = contact_payload.get('contact_inboxes', [])
+            source_id = contact_inboxes[0].get('source_id') if contact_inboxes else None
+
+            self._contacts[email] = (contact_id, source_id)
+            if self.mapping:
+                self.mapping.set_contact(email, contact_id, source_id)
+            return contact_id, source_id, True
+
+def migrate_contact_unit(client: ChatwootClient, contact: Dict, conversations: List[Dict],
+                         inbox_id: int, registry: ContactRegistry) -> Dict[str, int]:
+    """
+    Importer un contact (si pas encore créé) et les conversations de l'unité.
+    Une conversation déjà dans la correspondance (run précédent ou interrompu) n'est pas
+    recréée: seuls ses messages manquants sont postés et son statut réappliqué
+    """
+    results = {'contacts_imported': 0, 'contacts_without_conv': 0,
+               'conversations_imported': 0, 'conversations_resumed': 0, 'messages_imported': 0}
+
+    contact_id, source_id, created = registry.get_or_create(client, contact, inbox_id)
+    if created:
+        results['contacts_imported'] += 1
+
+    if conversations:
+        for conv in conversations:
+            key = conversation_key(conv)
+            entry = registry.mapping.get_conversation(key) if registry.mapping and key else None
+            if entry is not None:
+                resumed = resume_conversation(client, conv, key, entry, registry.mapping)
+                results['conversations_resumed'] += 1
+                results['messages_imported'] += resumed['messages_appended']
+                continue
+            import_conversation_to_chatwoot(
+                client, conv, contact_id, source_id, inbox_id, status=conv.get('status'),
+                mapping=registry.mapping
+            )
+            results['conversations_imported'] += 1
+            results['messages_imported'] += len(conv.get('messages', []))
+    else:
+        results['contacts_without_conv'] += 1
+
+    return results
+
+def worker_runner(client: ChatwootClient, workers: int, fn):
+    """fn(client, item) exécutée avec un client Chatwoot propre à chaque worker"""
+    if workers == 1:
+        return lambda item: fn(client, item)
+
+    # Chaque worker a sa part du quota Chatwoot
+    local = threading.local()
+
+    def run(item):
+        if not hasattr(local, 'client'):
+            local.client = ChatwootClient(rate_limit=CHATWOOT_RATE_LIMIT / workers)
+        return fn(local.client, item)
+    return run
+
+def run_in_workers(client: ChatwootClient, items: List, workers: int, fn) -> List:
+    """Exécuter fn(client, item) sur N workers, un client Chatwoot par worker"""
+    run = worker_runner(client, workers, fn)
+    if workers == 1:
+        return [run(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, items))
+
+def run_streaming(client: ChatwootClient, items: Iterable, workers: int, fn) -> Iterator:
+    """
+    Comme run_in_workers, mais items est consommé au fil de l'eau:
+    au plus 2 x workers éléments sont en cours, les résultats sont produits dès qu'ils arrivent.
+    """
+    run = worker_runner(client, workers, fn)
+    if workers == 1:
+        for item in items:
+            yield run(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for item in items:
+            pending.add(executor.submit(run, item))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
+def print_migration_summary(results: Dict[str, int]):
+    print("\nRésumé de migration:")
+    print("=" * 30)
+    print(f"Contacts importés: {results['contacts_imported']}")
+    print(f"Contacts sans conversation: {results['contacts_without_conv']}")
+    print(f"Conversations importées: {results['conversations_imported']}")
+    print(f"Conversations reprises (déjà importées): {results['conversations_resumed']}")
+    print(f"Messages importés: {results['messages_imported']}")
+
+def migrate_streaming(client: ChatwootClient, inbox_id: int, limit: int = None,
+                      workers: int = MIGRATION_WORKERS) -> Dict[str, int]:
+    """
+    Import en flux: les contacts sont lus un à un depuis le NDJSON préparé et les
+    conversations de chaque contact sont chargées par l'index email au moment de son import.
+    La mémoire ne dépend pas de la taille du jeu de données.
+    """
+    contacts_path, conversations_path = prepared_data_paths()
+    results = {'contacts_imported': 0, 'contacts_without_conv': 0,
+               'conversations_imported': 0, 'conversations_resumed': 0, 'messages_imported': 0}
+
+    # Reprise: contacts et conversations de la correspondance réutilisés (rien n'est recréé)
+    mapping = MigrationMapping()
+    registry = ContactRegistry(mapping, reuse_mapping=True)
+
+    with open_prepared_ndjson(contacts_path) as contacts, open_prepared_ndjson(conversations_path) as conversations:
+        print(f"Import en flux: {len(contacts)} contacts, {len(conversations)} conversations, {workers} worker(s)")
+        stream = islice(contacts, limit) if limit else iter(contacts)
+
+        def run_contact(worker_client: ChatwootClient, contact: Dict) -> Dict[str, int]:
+            try:
+                contact_conversations = conversations.get('contact_email', contact.get('email'))
+                return migrate_contact_unit(worker_client, contact, contact_conversations, inbox_id, registry)
+            except Exception as e:
+                print(f"Erreur sur contact {contact.get('email')}: {e}")
+                return {}
+
+        total = min(limit, len(contacts)) if limit else len(contacts)
+        # Correspondance journalisée après chaque contact: un import interrompu sait ce qui existe déjà
+        try:
+            with ProgressReporter("Contacts", total, "chatwoot", CHATWOOT_RATE_LIMIT) as progress:
+                for unit_result in run_streaming(client, stream, workers, run_contact):
+                    for key, value in unit_result.items():
+                        results[key] += value
+                    mapping.checkpoint()
+                    progress.update()
+        finally:
+            mapping.save()
+    return results
+
+def migrate_all_data(limit: int = None, workers: int = MIGRATION_WORKERS, schedule: str = MIGRATION_SCHEDULE):
+    """
+    Migrer contacts et conversations vers Chatwoot.
+    workers: nombre d'imports parallèles (le quota Chatwoot est partagé entre eux)
+    schedule: "longest_first" (unités les plus coûteuses d'abord), "file" (ordre du fichier)
+              ou "recency" (conversations les plus récentes d'abord, tous contacts confondus)
+              ou "stream" (ordre du fichier, contacts et conversations lus à la demande: mémoire constante)
+    """
     print("Migration complète des contacts et conversations")
     print("=" * 50)
 
     INBOX_ID = 2
+    workers = max(workers or 1, 1)
     client = ChatwootClient()
     if not client.test_connection():
         print("Connexion échouée")
         return False
 
+    if schedule == "stream":
+        started = time.time()
+        results = migrate_streaming(client, INBOX_ID, limit, workers)
+        get_metrics().add_records(results['messages_imported'])
+        print_migration_summary(results)
+        print(f"Durée: {time.time() - started:.0f}s")
+        return True
+
     contacts, conversations = load_prepared_data()
     conversations_by_email = group_conversations_by_contact(conversations)
 
@@ -141,44 +394,186 @@ def migrate_all_data(limit: int = None):
         contacts = contacts[:limit]
         print(f"⚠ Limite activée: import de {limit} contacts seulement")
 
+    units = build_work_units(contacts, conversations_by_email, workers)
+    predicted_file_order = predict_makespan(units, workers)
+    if schedule == "longest_first":
+        units = order_longest_first(units)
+    elif schedule == "recency":
+        units = build_recency_units(contacts, conversations_by_email, workers)
+    predicted = predict_makespan(units, workers)
+
+    print(f"Ordonnancement: {schedule}, {workers} worker(s), {len(units)} unités")
+    print(f"Makespan prévu: {predicted:.0f}s (ordre fichier: {predicted_file_order:.0f}s)")
+
     results = {
         'contacts_imported': 0,
         'contacts_without_conv': 0,
         'conversations_imported': 0,
+        'conversations_resumed': 0,
         'messages_imported': 0
     }
 
-    for contact in contacts:
+    # Reprise: contacts et conversations de la correspondance réutilisés (rien n'est recréé)
+    mapping = MigrationMapping()
+    registry = ContactRegistry(mapping, reuse_mapping=True)
+
+    # Progression sur les données récentes (pondérée par le nombre de messages)
+    recent_total = sum(unit_weight(unit) for unit in units if unit.get('recent'))
+    recent_done = 0
+    last_percent = -1
+    progress_lock = threading.Lock()
+    if schedule == "recency":
+        print(f"Données récentes (< {RECENT_DAYS} jours): {recent_total} messages")
+
+    def report_progress(unit: Dict):
+        nonlocal recent_done, last_percent
+        if not unit.get('recent'):
+            return
+        with progress_lock:
+            recent_done += unit_weight(unit)
+            percent = 100 * recent_done / recent_total
+            # Affichage à chaque point de pourcentage franchi
+            if int(percent) == last_percent:
+                return
+            last_percent = int(percent)
+            print(f"Progression récente: {percent:.1f}% ({recent_done}/{recent_total} messages, "
+                  f"{time.time() - started:.0f}s)")
+
+    progress = ProgressReporter("Contacts", len(units), "chatwoot", CHATWOOT_RATE_LIMIT)
+
+    def run_unit(worker_client: ChatwootClient, unit: Dict) -> Dict[str, int]:
         try:
-            created_contact = import_contact_to_chatwoot(client, contact, INBOX_ID)
-            contact_payload = created_contact.get('payload', {}).get('contact', {})
-            contact_id = contact_payload.get('id')
-            contact_inboxes = contact_payload.get('contact_inboxes', [])
-            source_id = contact_inboxes[0].get('source_id') if contact_inboxes else None
+            unit_result = migrate_contact_unit(worker_client, unit['contact'], unit['conversations'],
+                                               INBOX_ID, registry)
+            report_progress(unit)
+            return unit_result
+        except Exception as e:
+            print(f"Erreur sur contact {unit['contact'].get('email')}: {e}")
+            return {}
+        finally:
+            mapping.checkpoint()
+            progress.update()
 
-            results['contacts_imported'] += 1
+    started = time.time()
+    try:
+        with progress:
+            unit_results = run_in_workers(client, units, workers, run_unit)
+    finally:
+        mapping.save()
+    actual = time.time() - started
 
-            contact_email = contact.get('email')
-            contact_conversations = conversations_by_email.get(contact_email, [])
+    for unit_result in unit_results:
+        for key, value in unit_result.items():
+            results[key] += value
 
-            if contact_conversations:
-                for conv in contact_conversations:
-                    created_conv = import_conversation_to_chatwoot(
-                        client, conv, contact_id, source_id, INBOX_ID, status=conv.get('status')
-                    )
-                    results['conversations_imported'] += 1
-                    results['messages_imported'] += len(conv.get('messages', []))
-            else:
-                results['contacts_without_conv'] += 1
+    get_metrics().add_records(results['messages_imported'])
+    print_migration_summary(results)
+    if recent_total:
+        print(f"Données récentes migrées: {100 * recent_done / recent_total:.1f}%")
+    print(f"Makespan prévu: {predicted:.0f}s, réel: {actual:.0f}s")
+    return True
+
+def resume_conversation(client: ChatwootClient, conversation: Dict, key: str, entry: Dict,
+                        mapping: MigrationMapping) -> Dict[str, int]:
+    """Conversation déjà importée: poster seulement les messages absents de la correspondance et le statut"""
+    results = {'messages_appended': 0, 'status_updated': 0}
+    conversation_id = entry['conversation_id']
+    posted = set(entry['messages'])
+    new_messages = [m for m in conversation.get('messages', []) if message_key(m) not in posted]
+
+    for message in new_messages:
+        try:
+            post_message(client, conversation_id, message)
+            mapping.add_message(key, message_key(message))
+            results['messages_appended'] += 1
         except Exception as e:
-            print(f"Erreur sur contact {contact.get('email')}: {e}")
+            print(f"Erreur message: {e}")
 
-    print("\nRésumé de migration:")
+    # Un nouveau message peut rouvrir la conversation: on réapplique le statut
+    status = conversation.get('status')
+    if new_messages or status != entry.get('status'):
+        client.update_conversation_status(conversation_id, status)
+        mapping.set_status(key, status)
+        results['status_updated'] += 1
+
+    return results
+
+def sync_conversation_delta(client: ChatwootClient, conversation: Dict, mapping: MigrationMapping,
+                            registry: ContactRegistry, contacts_by_email: Dict[str, Dict],
+                            inbox_id: int) -> Dict[str, int]:
+    """Poster seulement les nouveaux messages et le changement de statut d'une conversation"""
+    results = {'contacts_imported': 0, 'conversations_imported': 0,
+               'messages_appended': 0, 'status_updated': 0}
+
+    key = conversation_key(conversation)
+    entry = mapping.get_conversation(key) if key else None
+
+    # Conversation jamais importée: import complet
+    if entry is None:
+        contact = contacts_by_email.get(conversation.get('contact_email'))
+        if not contact:
+            return results
+        contact_id, source_id, created = registry.get_or_create(client, contact, inbox_id)
+        import_conversation_to_chatwoot(client, conversation, contact_id, source_id, inbox_id,
+                                        status=conversation.get('status'), mapping=mapping)
+        results['contacts_imported'] += int(created)
+        results['conversations_imported'] += 1
+        results['messages_appended'] += len(conversation.get('messages', []))
+        return results
+
+    results.update(resume_conversation(client, conversation, key, entry, mapping))
+    return results
+
+def migrate_delta(workers: int = MIGRATION_WORKERS):
+    """Synchronisation delta: nouveaux messages et statuts depuis le dernier import"""
+    print("Synchronisation delta vers Chatwoot")
+    print("=" * 50)
+
+    INBOX_ID = 2
+    workers = max(workers or 1, 1)
+    mapping = MigrationMapping()
+    if not mapping.data['conversations']:
+        print("Aucune correspondance trouvée, lancer d'abord une migration complète")
+        return False
+
+    client = ChatwootClient()
+    if not client.test_connection():
+        print("Connexion échouée")
+        return False
+
+    contacts, conversations = load_latest_prepared_data()
+    contacts_by_email = {c.get('email'): c for c in contacts}
+    registry = ContactRegistry(mapping, reuse_mapping=True)
+
+    def run_conversation(worker_client: ChatwootClient, conversation: Dict) -> Dict[str, int]:
+        try:
+            return sync_conversation_delta(worker_client, conversation, mapping, registry,
+                                           contacts_by_email, INBOX_ID)
+        except Exception as e:
+            print(f"Erreur sur conversation {conversation_key(conversation)}: {e}")
+            return {}
+        finally:
+            mapping.checkpoint()
+
+    started = time.time()
+    try:
+        conv_results = run_in_workers(client, conversations, workers, run_conversation)
+    finally:
+        mapping.save()
+
+    results = {'contacts_imported': 0, 'conversations_imported': 0,
+               'messages_appended': 0, 'status_updated': 0}
+    for conv_result in conv_results:
+        for key, value in conv_result.items():
+            results[key] += value
+
+    print("\nRésumé delta:")
     print("=" * 30)
-    print(f"Contacts importés: {results['contacts_imported']}")
-    print(f"Contacts sans conversation: {results['contacts_without_conv']}")
-    print(f"Conversations importées: {results['conversations_imported']}")
-    print(f"Messages importés: {results['messages_imported']}")
+    print(f"Nouveaux contacts: {results['contacts_imported']}")
+    print(f"Nouvelles conversations: {results['conversations_imported']}")
+    print(f"Messages ajoutés: {results['messages_appended']}")
+    print(f"Statuts mis à jour: {results['status_updated']}")
+    print(f"Durée: {time.time() - started:.0f}s")
     return True
 
 if __name__ == "__main__":
@@ -0,0 +1,215 @@
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+from configs.config import DEDUP_MAX_BLOCK_SIZE, DEFAULT_PHONE_COUNTRY_CODE
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Email comparable: minuscules, sans espaces ni alias +tag"""
+    if not email or '@' not in email:
+        return None
+    local, domain = email.strip().lower().rsplit('@', 1)
+    local = local.split('+', 1)[0]
+    return f"{local}@{domain}" if local and domain else None
+
+
+def email_local_part(email: Optional[str]) -> Optional[str]:
+    """Partie locale normalisée, sans ponctuation (jean.dupont, jean_dupont -> jeandupont)"""
+    normalized = normalize_email(email)
+    if not normalized:
+        return None
+    local = re.sub(r'[^a-z0-9]', '', normalized.split('@', 1)[0])
+    # Les parties locales trop courtes (ex: "jd") désignent trop de personnes différentes
+    return local if len(local) >= 4 else None
+
+
+def normalize_phone(phone: Optional[str], country_code: str = DEFAULT_PHONE_COUNTRY_CODE) -> Optional[str]:
+    """Numéro au format E.164 (+33612345678), numéros nationaux rattachés au pays par défaut"""
+    if not phone:
+        return None
+    phone = str(phone).strip()
+    digits = re.sub(r'\D', '', phone)
+    if phone.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith('0'):
+        digits = country_code + digits[1:]
+    return f"+{digits}" if 8 <= len(digits) <= 15 else None
+
+
+def name_tokens(name: Optional[str]) -> frozenset:
+    """Mots du nom sans accents ni casse (ordre indifférent)"""
+    if not name:
+        return frozenset()
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').lower()
+    return frozenset(token for token in re.split(r'[^a-z0-9]+', ascii_name) if len(token) >= 2)
+
+
+def names_match(a: frozenset, b: frozenset) -> bool:
+    """Noms compatibles: au moins la moitié des mots en commun"""
+    if not a or not b:
+        return False
+    return len(a & b) / len(a | b) >= 0.5
+
+
+class UnionFind:
+    """Ensembles disjoints (compression de chemin, union par taille)"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, item: int) -> int:
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a: int, b: int) -> bool:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return True
+
+
+def contact_keys(record: Dict) -> Dict:
+    """Clés de blocage d'un contact source"""
+    return {
+        'email': normalize_email(record.get('email')),
+        'local': email_local_part(record.get('email')),
+        'phone': normalize_phone(record.get('phone')),
+        'name': name_tokens(record.get('name'))
+    }
+
+
+def build_blocks(keys: List[Dict]) -> Dict[str, Dict]:
+    """Index de blocage: type de clé -> valeur -> indices des contacts"""
+    blocks = {'email': {}, 'phone': {}, 'local': {}, 'name': {}}
+    for index, key in enumerate(keys):
+        for block_type in ('email', 'phone', 'local'):
+            if key[block_type]:
+                blocks[block_type].setdefault(key[block_type], []).append(index)
+        if len(key['name']) >= 2:
+            blocks['name'].setdefault(' '.join(sorted(key['name'])), []).append(index)
+    return blocks
+
+
+def find_clusters(records: List[Dict], max_block_size: int = DEDUP_MAX_BLOCK_SIZE) -> List[Dict]:
+    """
+    Regrouper les contacts d'une même personne. Seuls les contacts d'un même bloc sont comparés:
+    - email normalisé identique (casse, alias +tag): fusion directe
+    - téléphone E.164 identique: fusion directe
+    - même partie locale d'email et noms compatibles
+    - même nom complet et parties locales ou téléphones compatibles
+    Les blocs de plus de max_block_size contacts (numéro standard, nom très courant) sont ignorés
+    pour les règles par paires, ce qui garde un nombre de comparaisons quasi linéaire.
+    Retourne les clusters de 2 contacts ou plus: {'members': [indices], 'reasons': [(i, j, raison)]}.
+    """
+    keys = [contact_keys(record) for record in records]
+    blocks = build_blocks(keys)
+    union_find = UnionFind(len(records))
+    reasons = []
+
+    def link(a: int, b: int, reason: str):
+        if union_find.union(a, b):
+            reasons.append((a, b, reason))
+
+    for members in blocks['email'].values():
+        for other in members[1:]:
+            link(members[0], other, 'email')
+
+    for members in blocks['phone'].values():
+        if len(members) <= max_block_size:
+            for other in members[1:]:
+                link(members[0], other, 'phone')
+
+    for members in blocks['local'].values():
+        if len(members) > max_block_size:
+            continue
+        for position, a in enumerate(members):
+            for b in members[position + 1:]:
+                if names_match(keys[a]['name'], keys[b]['name']):
+                    link(a, b, 'email_local+name')
+
+    for members in blocks['name'].values():
+        if len(members) > max_block_size:
+            continue
+        for position, a in enumerate(members):
+            for b in members[position + 1:]:
+                local_a, local_b = keys[a]['local'], keys[b]['local']
+                if local_a and local_b and (local_a in local_b or local_b in local_a):
+                    link(a, b, 'name+email_local')
+                elif keys[a]['phone'] and keys[a]['phone'][-8:] == (keys[b]['phone'] or '')[-8:]:
+                    link(a, b, 'name+phone')
+
+    clusters = {}
+    for index in range(len(records)):
+        clusters.setdefault(union_find.find(index), {'members': [], 'reasons': []})['members'].append(index)
+    for a, b, reason in reasons:
+        clusters[union_find.find(a)]['reasons'].append((a, b, reason))
+
+    return [cluster for cluster in clusters.values() if len(cluster['members']) > 1]
+
+
+def dedup_source_contacts(zendesk_data: List[Dict], intercom_data: List[Dict]) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+    """
+    Détecter les doublons entre et dans les deux sources, puis donner à tous les membres d'un
+    cluster l'email de son représentant (Intercom prioritaire, sinon un contact avec email):
+    la fusion par email de merge_and_deduplicate les regroupe ensuite.
+    Retourne les contacts (copies si modifiés) et le rapport des clusters.
+    """
+    records = [('zendesk', record) for record in zendesk_data] + [('intercom', record) for record in intercom_data]
+    clusters = find_clusters([record for _, record in records])
+
+    zendesk_out = list(zendesk_data)
+    intercom_out = list(intercom_data)
+    report = []
+
+    for cluster in clusters:
+        members = cluster['members']
+        # Représentant: Intercom avec email, puis Zendesk avec email, puis le premier contact
+        representative = min(members, key=lambda i: (records[i][0] != 'intercom' or not records[i][1].get('email'),
+                                                     not records[i][1].get('email'), i))
+        source, record = records[representative]
+        email = record.get('email') or f"no-email-{'zd' if source == 'zendesk' else 'ic'}-{record.get('id')}@alphorm.com"
+
+        for index in members:
+            member_source, member = records[index]
+            if member.get('email') == email:
+                continue
+            if member_source == 'zendesk':
+                zendesk_out[index] = {**member, 'email': email}
+            else:
+                intercom_out[index - len(zendesk_data)] = {**member, 'email': email}
+
+        def describe(index: int) -> Dict:
+            member_source, member = records[index]
+            return {'source': member_source, 'id': member.get('id'), 'email': member.get('email'),
+                    'name': member.get('name'), 'phone': member.get('phone')}
+
+        report.append({
+            'email': email,
+            'members': [describe(index) for index in members],
+            'reasons': [{'a': records[a][1].get('id'), 'b': records[b][1].get('id'), 'reason': reason}
+                        for a, b, reason in cluster['reasons']]
+        })
+
+    return zendesk_out, intercom_out, report
+
+
+def merged_source_ids(report: List[Dict]) -> Dict[str, Dict[str, List]]:
+    """IDs source de chaque cluster par email retenu: {'zendesk': [...], 'intercom': [...]}"""
+    merged = {}
+    for cluster in report:
+        ids = {'zendesk': [], 'intercom': []}
+        for member in cluster['members']:
+            ids[member['source']].append(member['id'])
+        merged[cluster['email']] = ids
+    return merged
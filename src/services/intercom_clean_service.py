@@ -1,45 +1,117 @@
-import json
 import os
+from functools import partial
 from typing import Dict, List
 from src.utils.helpers import save_json, get_file_size, get_timestamp
-from configs.config import INTERCOM_OUTPUT_DIR
+from src.utils.parallel import run_in_processes
+from src.services.snapshot_diff_service import incremental_map
+from src.utils.projection import compile_projection, project_records, Count, Each, Field, First, Pluck
+from src.utils.staging_store import load_records, stage_records, stream_records
+from src.utils.run_manifest import get_run_date, resolve_artifact, up_to_date_artifact, record_artifact
+from configs.config import INTERCOM_OUTPUT_DIR, INCREMENTAL_STAGES, CLEAN_PROCESSES
 
 
-def intercom_clean_articles() -> str:
+# Schémas de nettoyage: {champ de sortie: chemin source ou règle}, compilés une fois à l'import
+ARTICLE_SCHEMA = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'content': 'body',
+    'author_id': 'author_id',
+    'state': 'state',
+    'parent_id': 'parent_id',
+    'parent_type': 'parent_type',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+    'tags': Pluck('tags.tags', 'name', ''),
+    'url': 'url'
+}
+
+CONTACT_SCHEMA = {
+    'id': 'id',
+    'external_id': 'external_id',
+    'name': 'name',
+    'email': 'email',
+    'phone': 'phone',
+    'avatar': 'avatar',
+    'role': 'role',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+    'signed_up_at': 'signed_up_at',
+    'last_seen_at': 'last_seen_at',
+    'last_replied_at': 'last_replied_at',
+    'last_contacted_at': 'last_contacted_at',
+    'browser': 'browser',
+    'browser_language': 'browser_language',
+    'os': 'os',
+    'location': {
+        'country': 'location.country',
+        'city': 'location.city',
+        'country_code': 'location.country_code'
+    },
+    'tags': Pluck('tags.data', 'name', ''),
+    'company_ids': Pluck('companies.data', 'id', ''),
+    'unsubscribed_from_emails': 'unsubscribed_from_emails',
+    'custom_attributes': Field('custom_attributes', {})
+}
+
+MESSAGE_SCHEMA = {
+    'id': 'id',
+    'body': 'body',
+    'message_type': 'part_type',
+    'author_id': 'author.id',
+    'author_type': 'author.type',
+    'author_name': 'author.name',
+    'author_email': 'author.email',
+    'created_at': 'created_at',
+    'attachments': Field('attachments', [])
+}
+
+# Seulement les vrais messages (comment/note), contact principal = premier contact
+CONVERSATION_SCHEMA = {
+    'id': 'id',
+    'title': 'title',
+    'state': 'state',
+    'open': 'open',
+    'priority': 'priority',
+    'contact_id': First('contacts.contacts', 'id'),
+    'admin_assignee_id': 'admin_assignee_id',
+    'team_assignee_id': 'team_assignee_id',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+    'waiting_since': 'waiting_since',
+    'tags': Pluck('tags.tags', 'name', ''),
+    'source': {
+        'subject': 'source.subject',
+        'body': 'source.body',
+        'author_name': 'source.author.name',
+        'author_email': 'source.author.email'
+    },
+    'messages': Each('messages', MESSAGE_SCHEMA, where=('part_type', ('comment', 'note'))),
+    'message_count': Count('messages')
+}
+
+clean_article = compile_projection(ARTICLE_SCHEMA, 'clean_article')
+clean_contact = compile_projection(CONTACT_SCHEMA, 'clean_contact')
+clean_conversation = compile_projection(CONVERSATION_SCHEMA, 'clean_conversation')
+
+def intercom_clean_articles(incremental: bool = INCREMENTAL_STAGES, processes: int = CLEAN_PROCESSES) -> str:
     """Nettoyer les articles Intercom pour Chatwoot"""
-    date_today = get_timestamp()
-    origin_file = f"{INTERCOM_OUTPUT_DIR}/origin_export/intercom_articles_{date_today}.json"
+    date_today = get_run_date()
+    origin_file = resolve_artifact("intercom_articles", f"{INTERCOM_OUTPUT_DIR}/origin_export/intercom_articles_{date_today}.json")
+    
+    unchanged = up_to_date_artifact("intercom_articles_clean", [origin_file])
+    if unchanged:
+        print(f"Stage ignoré (entrées inchangées): {os.path.basename(unchanged)}")
+        return unchanged
     
     print(f"Nettoyage articles: {os.path.basename(origin_file)}")
     
-    with open(origin_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    articles = data.get('articles', [])
-    cleaned_articles = []
-    
-    for article in articles:
-        # Extraire les tags
-        tags_data = article.get('tags', {})
-        tags = []
-        if isinstance(tags_data, dict) and 'tags' in tags_data:
-            tags = [tag.get('name', '') for tag in tags_data.get('tags', [])]
-        
-        cleaned_article = {
-            'id': article.get('id'),
-            'title': article.get('title'),
-            'description': article.get('description'),
-            'content': article.get('body'),
-            'author_id': article.get('author_id'),
-            'state': article.get('state'),
-            'parent_id': article.get('parent_id'),
-            'parent_type': article.get('parent_type'),
-            'created_at': article.get('created_at'),
-            'updated_at': article.get('updated_at'),
-            'tags': tags,
-            'url': article.get('url')
-        }
-        cleaned_articles.append(cleaned_article)
+    if incremental:
+        articles = load_records('raw', 'intercom_articles', origin_file, 'articles')
+        cleaned_articles = incremental_map(articles, clean_article, 'articles', "intercom_articles_clean")
+    else:
+        # Enregistrements bruts lus en flux et projetés un par un
+        cleaned_articles = project_records(clean_article, stream_records('raw', 'intercom_articles', origin_file, 'articles'))
     
     cleaned_data = {
         'metadata': {
@@ -55,68 +127,31 @@ def intercom_clean_articles() -> str:
     
     filename = f"intercom_articles_clean_{date_today}.json"
     filepath = os.path.join(output_dir, filename)
-    save_json(cleaned_data, filepath)
+    save_json(cleaned_data, filepath, records_key='articles', processes=processes)
+    stage_records('clean', 'intercom_articles', cleaned_articles, filepath)
+    record_artifact("intercom_articles_clean", filepath, len(cleaned_articles), "clean", [origin_file])
     
     print(f"Articles nettoyés: {filename} ({get_file_size(filepath)}) - {len(cleaned_articles)} items")
     return filepath
 
-def intercom_clean_contacts() -> str:
+def intercom_clean_contacts(incremental: bool = INCREMENTAL_STAGES, processes: int = CLEAN_PROCESSES) -> str:
     """Nettoyer les contacts Intercom pour Chatwoot"""
-    date_today = get_timestamp()
-    origin_file = f"{INTERCOM_OUTPUT_DIR}/origin_export/intercom_contacts_{date_today}.json"
+    date_today = get_run_date()
+    origin_file = resolve_artifact("intercom_contacts", f"{INTERCOM_OUTPUT_DIR}/origin_export/intercom_contacts_{date_today}.json")
+    
+    unchanged = up_to_date_artifact("intercom_contacts_clean", [origin_file])
+    if unchanged:
+        print(f"Stage ignoré (entrées inchangées): {os.path.basename(unchanged)}")
+        return unchanged
     
     print(f"Nettoyage contacts: {os.path.basename(origin_file)}")
     
-    with open(origin_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    contacts = data.get('contacts', [])
-    cleaned_contacts = []
-    
-    for contact in contacts:
-        # Extraire location
-        location = contact.get('location', {})
-        
-        # Extraire tags
-        tags_data = contact.get('tags', {})
-        tags = []
-        if isinstance(tags_data, dict) and 'data' in tags_data:
-            tags = [tag.get('name', '') for tag in tags_data.get('data', [])]
-        
-        # Extraire companies IDs
-        companies_data = contact.get('companies', {})
-        company_ids = []
-        if isinstance(companies_data, dict) and 'data' in companies_data:
-            company_ids = [comp.get('id', '') for comp in companies_data.get('data', [])]
-        
-        cleaned_contact = {
-            'id': contact.get('id'),
-            'external_id': contact.get('external_id'),
-            'name': contact.get('name'),
-            'email': contact.get('email'),
-            'phone': contact.get('phone'),
-            'avatar': contact.get('avatar'),
-            'role': contact.get('role'),
-            'created_at': contact.get('created_at'),
-            'updated_at': contact.get('updated_at'),
-            'signed_up_at': contact.get('signed_up_at'),
-            'last_seen_at': contact.get('last_seen_at'),
-            'last_replied_at': contact.get('last_replied_at'),
-            'last_contacted_at': contact.get('last_contacted_at'),
-            'browser': contact.get('browser'),
-            'browser_language': contact.get('browser_language'),
-            'os': contact.get('os'),
-            'location': {
-                'country': location.get('country'),
-                'city': location.get('city'),
-                'country_code': location.get('country_code')
-            },
-            'tags': tags,
-            'company_ids': company_ids,
-            'unsubscribed_from_emails': contact.get('unsubscribed_from_emails'),
-            'custom_attributes': contact.get('custom_attributes', {})
-        }
-        cleaned_contacts.append(cleaned_contact)
+    if incremental:
+        contacts = load_records('raw', 'intercom_contacts', origin_file, 'contacts')
+        cleaned_contacts = incremental_map(contacts, clean_contact, 'contacts', "intercom_contacts_clean")
+    else:
+        # Enregistrements bruts lus en flux et projetés un par un
+        cleaned_contacts = project_records(clean_contact, stream_records('raw', 'intercom_contacts', origin_file, 'contacts'))
     
     cleaned_data = {
         'metadata': {
@@ -132,83 +167,31 @@ def intercom_clean_contacts() -> str:
     
     filename = f"intercom_contacts_clean_{date_today}.json"
     filepath = os.path.join(output_dir, filename)
-    save_json(cleaned_data, filepath)
+    save_json(cleaned_data, filepath, records_key='contacts', processes=processes)
+    stage_records('clean', 'intercom_contacts', cleaned_contacts, filepath)
+    record_artifact("intercom_contacts_clean", filepath, len(cleaned_contacts), "clean", [origin_file])
     
     print(f"Contacts nettoyés: {filename} ({get_file_size(filepath)}) - {len(cleaned_contacts)} items")
     return filepath
 
-def intercom_clean_conversations() -> str:
+def intercom_clean_conversations(incremental: bool = INCREMENTAL_STAGES, processes: int = CLEAN_PROCESSES) -> str:
     """Nettoyer les conversations Intercom pour Chatwoot"""
-    date_today = get_timestamp()
-    origin_file = f"{INTERCOM_OUTPUT_DIR}/origin_export/intercom_conversations_{date_today}.json"
+    date_today = get_run_date()
+    origin_file = resolve_artifact("intercom_conversations", f"{INTERCOM_OUTPUT_DIR}/origin_export/intercom_conversations_{date_today}.json")
+    
+    unchanged = up_to_date_artifact("intercom_conversations_clean", [origin_file])
+    if unchanged:
+        print(f"Stage ignoré (entrées inchangées): {os.path.basename(unchanged)}")
+        return unchanged
     
     print(f"Nettoyage conversations: {os.path.basename(origin_file)}")
     
-    with open(origin_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    conversations = data.get('conversations', [])
-    cleaned_conversations = []
-    
-    for conversation in conversations:
-        # Extraire contact principal
-        contacts_data = conversation.get('contacts', {}).get('contacts', [])
-        contact_id = contacts_data[0].get('id') if contacts_data else None
-        
-        # Extraire source info
-        source = conversation.get('source', {})
-        source_author = source.get('author', {})
-        
-        # Nettoyer les messages
-        messages = conversation.get('messages', [])
-        cleaned_messages = []
-        
-        for message in messages:
-            # Garder seulement les vrais messages (comment/note)
-            if message.get('part_type') in ['comment', 'note']:
-                author = message.get('author', {})
-                cleaned_message = {
-                    'id': message.get('id'),
-                    'body': message.get('body'),
-                    'message_type': message.get('part_type'),
-                    'author_id': author.get('id'),
-                    'author_type': author.get('type'),
-                    'author_name': author.get('name'),
-                    'author_email': author.get('email'),
-                    'created_at': message.get('created_at'),
-                    'attachments': message.get('attachments', [])
-                }
-                cleaned_messages.append(cleaned_message)
-        
-        # Extraire tags
-        tags_data = conversation.get('tags', {})
-        tags = []
-        if isinstance(tags_data, dict) and 'tags' in tags_data:
-            tags = [tag.get('name', '') for tag in tags_data.get('tags', [])]
-        
-        cleaned_conversation = {
-            'id': conversation.get('id'),
-            'title': conversation.get('title'),
-            'state': conversation.get('state'),
-            'open': conversation.get('open'),
-            'priority': conversation.get('priority'),
-            'contact_id': contact_id,
-            'admin_assignee_id': conversation.get('admin_assignee_id'),
-            'team_assignee_id': conversation.get('team_assignee_id'),
-            'created_at': conversation.get('created_at'),
-            'updated_at': conversation.get('updated_at'),
-            'waiting_since': conversation.get('waiting_since'),
-            'tags': tags,
-            'source': {
-                'subject': source.get('subject'),
-                'body': source.get('body'),
-                'author_name': source_author.get('name'),
-                'author_email': source_author.get('email')
-            },
-            'messages': cleaned_messages,
-            'message_count': len(cleaned_messages)
-        }
-        cleaned_conversations.append(cleaned_conversation)
+    if incremental:
+        conversations = load_records('raw', 'intercom_conversations', origin_file, 'conversations')
+        cleaned_conversations = incremental_map(conversations, clean_conversation, 'conversations', "intercom_conversations_clean")
+    else:
+        # Enregistrements bruts lus en flux et projetés un par un
+        cleaned_conversations = project_records(clean_conversation, stream_records('raw', 'intercom_conversations', origin_file, 'conversations'))
     
     cleaned_data = {
         'metadata': {
@@ -224,20 +207,27 @@ def intercom_clean_conversations() -> str:
     
     filename = f"intercom_conversations_clean_{date_today}.json"
     filepath = os.path.join(output_dir, filename)
-    save_json(cleaned_data, filepath)
+    save_json(cleaned_data, filepath, records_key='conversations', processes=processes)
+    stage_records('clean', 'intercom_conversations', cleaned_conversations, filepath)
+    record_artifact("intercom_conversations_clean", filepath, len(cleaned_conversations), "clean", [origin_file])
     
     print(f"Conversations nettoyées: {filename} ({get_file_size(filepath)}) - {len(cleaned_conversations)} items")
     return filepath
 
-def intercom_clean_all() -> Dict[str, str]:
-    """Nettoyer toutes les données Intercom"""
+def intercom_clean_all(incremental: bool = INCREMENTAL_STAGES, processes: int = CLEAN_PROCESSES) -> Dict[str, str]:
+    """Nettoyer toutes les données Intercom (processes > 1: une entité par processus)"""
     print("Nettoyage complet Intercom")
     print("=" * 25)
     
-    files = {}
-    files['conversations'] = intercom_clean_conversations()
-    files['contacts'] = intercom_clean_contacts()
-    files['articles'] = intercom_clean_articles()
+    functions = {
+        'conversations': partial(intercom_clean_conversations, incremental, processes),
+        'contacts': partial(intercom_clean_contacts, incremental, processes),
+        'articles': partial(intercom_clean_articles, incremental, processes)
+    }
+    if processes > 1:
+        files = run_in_processes(functions, 'clean', processes)
+    else:
+        files = {entity: function() for entity, function in functions.items()}
     
     print(f"\nNettoyage terminé - {len(files)} fichiers créés")
     return files
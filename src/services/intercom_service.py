@@ -1,8 +1,14 @@
 import os
-from typing import Dict
+from typing import Dict, List
 from src.api.intercom_client import IntercomClient
 from src.utils.helpers import save_json, get_file_size, get_timestamp
-from configs.config import INTERCOM_OUTPUT_DIR
+from src.utils.staging_store import load_records, stage_records
+from src.utils.ndjson_index import write_ndjson, ndjson_path
+from src.utils.run_manifest import get_run_date, record_artifact, resolve_artifact
+from configs.config import (
+    INTERCOM_OUTPUT_DIR, EXPORT_NDJSON, INTERCOM_REFERENCED_CONTACTS_ONLY, INTERCOM_EXPORT_WORKERS,
+    CONTACT_LOOKUP_BATCH_SIZE
+)
 
 
 class IntercomService:
@@ -22,9 +28,11 @@ class IntercomService:
             'articles': articles
         }
         
-        filename = f"intercom_articles_{get_timestamp()}.json"
+        filename = f"intercom_articles_{get_run_date()}.json"
         filepath = os.path.join(self.output_dir, filename)
         save_json(data, filepath)
+        stage_records('raw', 'intercom_articles', articles, filepath)
+        record_artifact("intercom_articles", filepath, len(articles), "export")
         
         print(f"Articles sauvés: {filename} ({get_file_size(filepath)}) - {len(articles)} items")
         return filepath
@@ -39,26 +47,54 @@ class IntercomService:
             'conversations': conversations
         }
         
-        filename = f"intercom_conversations_{get_timestamp()}.json"
+        filename = f"intercom_conversations_{get_run_date()}.json"
         filepath = os.path.join(self.output_dir, filename)
         save_json(data, filepath)
+        stage_records('raw', 'intercom_conversations', conversations, filepath)
+        if EXPORT_NDJSON:
+            write_ndjson(conversations, ndjson_path(filepath))
+        record_artifact("intercom_conversations", filepath, len(conversations), "export")
         
         print(f"Conversations sauvées: {filename} ({get_file_size(filepath)}) - {len(conversations)} items")
         return filepath
     
-    def export_contacts(self) -> str:
-        """Exporter seulement les contacts"""
+    def referenced_contact_ids(self) -> List[str]:
+        """IDs des contacts cités par les conversations exportées (ordre d'apparition, sans doublon)"""
+        conversations_file = resolve_artifact(
+            "intercom_conversations", f"{self.output_dir}/intercom_conversations_{get_run_date()}.json")
+        conversations = load_records('raw', 'intercom_conversations', conversations_file, 'conversations')
+        
+        contact_ids = {}
+        for conversation in conversations:
+            for contact in conversation.get('contacts', {}).get('contacts', []):
+                if contact.get('id'):
+                    contact_ids[contact['id']] = True
+        return list(contact_ids)
+    
+    def export_contacts(self, referenced_only: bool = INTERCOM_REFERENCED_CONTACTS_ONLY) -> str:
+        """
+        Exporter seulement les contacts.
+        referenced_only: seulement les contacts cités par l'export des conversations (recherche par lots)
+        """
         print("Export contacts...")
-        contacts = self.client.get_all_contacts()
+        if referenced_only:
+            contact_ids = self.referenced_contact_ids()
+            batches = -(-len(contact_ids) // CONTACT_LOOKUP_BATCH_SIZE)
+            print(f"Contacts référencés par les conversations: {len(contact_ids)} ({batches} recherches)")
+            contacts = self.client.get_contacts_many(contact_ids, CONTACT_LOOKUP_BATCH_SIZE, INTERCOM_EXPORT_WORKERS)
+        else:
+            contacts = self.client.get_all_contacts()
         
         data = {
             'metadata': {'exported_at': get_timestamp(include_time=True), 'count': len(contacts)},
             'contacts': contacts
         }
         
-        filename = f"intercom_contacts_{get_timestamp()}.json"
+        filename = f"intercom_contacts_{get_run_date()}.json"
         filepath = os.path.join(self.output_dir, filename)
         save_json(data, filepath)
+        stage_records('raw', 'intercom_contacts', contacts, filepath)
+        record_artifact("intercom_contacts", filepath, len(contacts), "export")
         
         print(f"Contacts sauvés: {filename} ({get_file_size(filepath)}) - {len(contacts)} items")
         return filepath
@@ -0,0 +1,231 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from src.api.zendesk_client import ZendeskClient
+from src.api.intercom_client import IntercomClient
+from src.api.chatwoot_client import ChatwootClient
+from src.services.zendesk_clean_service import clean_ticket, clean_user
+from src.services.intercom_clean_service import clean_conversation, clean_contact
+from src.services.zendesk_transform_service import transform_ticket
+from src.services.intercom_transform_service import transform_conversation
+from src.services.chatwoot_prepare_contacts_service import format_contact, source_email
+from src.services.chatwoot_prepare_conversations_service import build_contact_index, format_conversation
+from src.services.chatwoot_mapping_service import MigrationMapping
+from src.services.chatwoot_service import ContactRegistry, sync_conversation_delta
+from src.utils.helpers import save_json, get_timestamp, find_latest_file
+from configs.config import CHATWOOT_OUTPUT_DIR, LIVE_SYNC_INTERVAL, LIVE_SYNC_CACHE_SIZE
+
+
+STATE_PATH = f"{CHATWOOT_OUTPUT_DIR}/live_sync_state.json"
+
+
+class ContactCache:
+    """Cache LRU borné: ID source -> contact préparé (format Chatwoot)"""
+
+    def __init__(self, max_size: int = LIVE_SYNC_CACHE_SIZE):
+        self.max_size = max_size
+        self._items = OrderedDict()
+
+    def get(self, key) -> Optional[Dict]:
+        if key not in self._items:
+            return None
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key, contact: Dict):
+        self._items[key] = contact
+        self._items.move_to_end(key)
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+
+class LiveSyncService:
+    """Synchronisation continue Zendesk/Intercom -> Chatwoot par les API incrémentales"""
+
+    INBOX_ID = 2
+
+    def __init__(self, interval: int = LIVE_SYNC_INTERVAL):
+        self.interval = interval
+        self.zendesk = ZendeskClient()
+        self.intercom = IntercomClient()
+        self.chatwoot = ChatwootClient()
+
+        self.mapping = MigrationMapping()
+        self.registry = ContactRegistry(self.mapping, reuse_mapping=True)
+        self.zendesk_contacts = ContactCache()
+        self.intercom_contacts = ContactCache()
+        self.zendesk_index, self.intercom_index = self.load_contact_index()
+        self.state = self.load_state()
+
+    def load_contact_index(self) -> Tuple[Dict, Dict]:
+        """ID source -> email des derniers contacts préparés (contacts fusionnés au dédoublonnage compris)"""
+        path = find_latest_file(CHATWOOT_OUTPUT_DIR, "chatwoot_contacts_prepared")
+        if not path:
+            return {}, {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return build_contact_index(json.load(f).get('contacts', []))
+
+    def load_state(self) -> Dict:
+        """Charger les watermarks persistés (sinon: date du dernier import complet)"""
+        if os.path.exists(STATE_PATH):
+            with open(STATE_PATH, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            state.setdefault('intercom_seen', [])
+            return state
+
+        if os.path.exists(self.mapping.path):
+            start = int(os.path.getmtime(self.mapping.path))
+        else:
+            start = int(time.time())
+        return {'zendesk_watermark': start, 'intercom_watermark': start, 'intercom_seen': []}
+
+    def save_state(self):
+        """
+        Persister les watermarks. Les changements de correspondance sont d'abord journalisés
+        (coût proportionnel aux changements, fichier complet réécrit tous les MAPPING_COMPACT_EVERY):
+        un watermark écrit ne précède jamais les IDs Chatwoot des conversations traitées
+        """
+        self.mapping.checkpoint()
+        self.state['saved_at'] = get_timestamp(True)
+        os.makedirs(CHATWOOT_OUTPUT_DIR, exist_ok=True)
+        save_json(self.state, STATE_PATH)
+
+    def resolve_contact(self, source: str, source_id, cache: ContactCache, index: Dict,
+                        fetch: Callable[[object], Optional[Dict]], clean: Callable[[Dict], Dict]) -> Optional[Dict]:
+        """
+        Contact préparé d'un ID source. Un ID des contacts préparés garde l'email de son contact
+        (fusions du dédoublonnage); déjà migré, il n'a pas besoin d'appel API. Sinon contact lu
+        par l'API, avec l'adresse synthétique no-email-<zd|ic>-<id> s'il n'a pas d'email
+        """
+        contact = cache.get(source_id)
+        if contact is not None:
+            return contact
+
+        email = index.get(source_id)
+        if email and self.mapping.get_contact(email):
+            contact = {'email': email}
+        else:
+            raw_contact = fetch(source_id)
+            if not raw_contact:
+                return None
+            contact = format_contact(clean(raw_contact), source, source_email(raw_contact, source))
+            if email:
+                contact['email'] = email
+        cache.put(source_id, contact)
+        return contact
+
+    def resolve_zendesk_contact(self, requester_id: int) -> Optional[Dict]:
+        """Contact préparé d'un demandeur Zendesk (API si absent du cache et des contacts migrés)"""
+        return self.resolve_contact("zendesk", requester_id, self.zendesk_contacts, self.zendesk_index,
+                                    self.zendesk.get_user, clean_user)
+
+    def resolve_intercom_contact(self, contact_id: str) -> Optional[Dict]:
+        """Contact préparé d'un contact Intercom (API si absent du cache et des contacts migrés)"""
+        return self.resolve_contact("intercom", contact_id, self.intercom_contacts, self.intercom_index,
+                                    self.intercom.get_contact, clean_contact)
+
+    def push_conversation(self, conversation: Dict, contact: Dict) -> Dict[str, int]:
+        """Poster le delta d'une conversation préparée dans Chatwoot"""
+        return sync_conversation_delta(self.chatwoot, conversation, self.mapping, self.registry,
+                                       {contact.get('email'): contact}, self.INBOX_ID)
+
+    def poll_zendesk(self) -> Dict[str, int]:
+        """Traiter les tickets modifiés depuis le watermark Zendesk"""
+        stats = {'conversations': 0, 'messages': 0, 'orphans': 0}
+
+        for tickets, end_time in self.zendesk.iter_incremental_tickets(self.state['zendesk_watermark']):
+            for ticket in tickets:
+                contact = self.resolve_zendesk_contact(ticket.get('requester_id'))
+                if not contact:
+                    stats['orphans'] += 1
+                    continue
+
+                ticket['comments'] = self.zendesk.get_ticket_comments(ticket['id'])
+                transformed = transform_ticket(clean_ticket(ticket))
+                conversation = format_conversation(transformed, 'zendesk', contact['email'])
+
+                result = self.push_conversation(conversation, contact)
+                stats['conversations'] += 1
+                stats['messages'] += result.get('messages_appended', 0)
+
+            # Watermark avancé page par page: une reprise ne rejoue qu'une page
+            if end_time:
+                self.state['zendesk_watermark'] = end_time
+            self.save_state()
+
+        return stats
+
+    def mark_intercom_seen(self, conversation: Dict):
+        """
+        Avancer le watermark Intercom sur une conversation lue (traitée ou orpheline).
+        Les (id, updated_at) de la seconde du watermark sont gardés: la recherche suivante
+        inclut cette seconde, sans retraiter ce qui l'a déjà été
+        """
+        updated_at = conversation.get('updated_at') or 0
+        if updated_at > self.state['intercom_watermark']:
+            self.state['intercom_watermark'] = updated_at
+            self.state['intercom_seen'] = []
+        if updated_at == self.state['intercom_watermark']:
+            self.state['intercom_seen'].append(f"{conversation['id']}:{updated_at}")
+
+    def poll_intercom(self) -> Dict[str, int]:
+        """Traiter les conversations modifiées depuis le watermark Intercom (seconde du watermark incluse)"""
+        stats = {'conversations': 0, 'messages': 0, 'orphans': 0}
+
+        for conversations in self.intercom.iter_conversations_updated_since(self.state['intercom_watermark']):
+            for raw_conversation in conversations:
+                if f"{raw_conversation['id']}:{raw_conversation.get('updated_at') or 0}" in self.state['intercom_seen']:
+                    continue
+
+                raw_conversation['messages'] = self.intercom.get_conversation_messages(raw_conversation['id'])
+                transformed = transform_conversation(clean_conversation(raw_conversation))
+
+                contact = self.resolve_intercom_contact(transformed.get('contact_id'))
+                if contact:
+                    conversation = format_conversation(transformed, 'intercom', contact['email'])
+                    result = self.push_conversation(conversation, contact)
+                    stats['conversations'] += 1
+                    stats['messages'] += result.get('messages_appended', 0)
+                else:
+                    stats['orphans'] += 1
+
+                # Orphelines comprises: sans contact résolu, elles ne reviennent qu'une fois modifiées
+                self.mark_intercom_seen(raw_conversation)
+
+            self.save_state()
+
+        return stats
+
+    def run_once(self):
+        """Une passe de synchronisation sur les deux sources"""
+        started = time.time()
+        zendesk_stats = self.poll_zendesk()
+        intercom_stats = self.poll_intercom()
+        self.save_state()
+
+        print(f"[{get_timestamp(True)}] Zendesk: {zendesk_stats['conversations']} tickets, "
+              f"{zendesk_stats['messages']} messages | Intercom: {intercom_stats['conversations']} conversations, "
+              f"{intercom_stats['messages']} messages | Orphelins: "
+              f"{zendesk_stats['orphans'] + intercom_stats['orphans']} ({time.time() - started:.0f}s)")
+
+    def run(self):
+        """Boucle de synchronisation jusqu'à interruption (Ctrl+C)"""
+        print(f"Synchronisation continue toutes les {self.interval}s (Ctrl+C pour arrêter)")
+        if not self.chatwoot.test_connection():
+            print("Connexion Chatwoot échouée")
+            return False
+
+        try:
+            while True:
+                try:
+                    self.run_once()
+                except Exception as e:
+                    print(f"Erreur synchronisation: {e}")
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            self.save_state()
+            self.mapping.save()
+            print("\nSynchronisation arrêtée")
+        return True
@@ -0,0 +1,60 @@
+from typing import Dict, List, Set, Tuple
+from src.api.zendesk_client import ZendeskClient
+from src.api.intercom_client import IntercomClient
+from src.services.zendesk_clean_service import clean_user
+from src.services.intercom_clean_service import clean_contact
+from src.services.chatwoot_prepare_contacts_service import format_contact, source_email, add_prepared_contacts
+from configs.config import CONTACT_LOOKUP_BATCH_SIZE
+
+
+def find_missing_contacts(zendesk_tickets: List[Dict], intercom_convs: List[Dict],
+                          zendesk_index: Dict, intercom_index: Dict) -> Tuple[Set, Set]:
+    """IDs des demandeurs Zendesk et contacts Intercom absents de l'index des contacts"""
+    missing_zendesk = {ticket.get('requester_id') for ticket in zendesk_tickets
+                       if ticket.get('requester_id') and ticket.get('requester_id') not in zendesk_index}
+    missing_intercom = {conv.get('contact_id') for conv in intercom_convs
+                        if conv.get('contact_id') and conv.get('contact_id') not in intercom_index}
+    return missing_zendesk, missing_intercom
+
+
+def resolve_orphans(zendesk_tickets: List[Dict], intercom_convs: List[Dict],
+                    zendesk_index: Dict, intercom_index: Dict,
+                    batch_size: int = CONTACT_LOOKUP_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Récupérer en lots (users/show_many, contacts/search) les contacts référencés par des
+    conversations mais absents de l'export, les ajouter aux contacts préparés et compléter
+    les index zendesk_id/intercom_id -> email.
+    """
+    missing_zendesk, missing_intercom = find_missing_contacts(
+        zendesk_tickets, intercom_convs, zendesk_index, intercom_index)
+    stats = {'zendesk_missing': len(missing_zendesk), 'intercom_missing': len(missing_intercom),
+             'zendesk_resolved': 0, 'intercom_resolved': 0}
+    if not missing_zendesk and not missing_intercom:
+        return stats
+
+    print(f"Résolution des orphelins: {len(missing_zendesk)} demandeurs Zendesk, "
+          f"{len(missing_intercom)} contacts Intercom (lots de {batch_size})")
+
+    # Contacts sans email: adresse synthétique, comme lors de la fusion
+    new_contacts = []
+    if missing_zendesk:
+        for user in ZendeskClient().get_users_many(sorted(missing_zendesk), batch_size):
+            user = clean_user(user)
+            new_contacts.append(format_contact(user, "zendesk", source_email(user, "zendesk")))
+    if missing_intercom:
+        for contact in IntercomClient().get_contacts_many(sorted(missing_intercom), batch_size):
+            contact = clean_contact(contact)
+            new_contacts.append(format_contact(contact, "intercom", source_email(contact, "intercom")))
+
+    add_prepared_contacts(new_contacts)
+    for contact in new_contacts:
+        if contact.get('zendesk_id'):
+            zendesk_index[contact['zendesk_id']] = contact['email']
+            stats['zendesk_resolved'] += 1
+        if contact.get('intercom_id'):
+            intercom_index[contact['intercom_id']] = contact['email']
+            stats['intercom_resolved'] += 1
+
+    print(f"Orphelins résolus: ZD:{stats['zendesk_resolved']}/{stats['zendesk_missing']}, "
+          f"IC:{stats['intercom_resolved']}/{stats['intercom_missing']}")
+    return stats
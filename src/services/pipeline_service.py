@@ -0,0 +1,91 @@
+import importlib
+from functools import partial
+from typing import Callable, List
+from src.utils.task_graph import Task, TaskGraph
+from configs.config import (INTERCOM_REFERENCED_CONTACTS_ONLY, MIGRATION_WORKERS, MIGRATION_SCHEDULE,
+                            CLEAN_PROCESSES)
+
+
+def run_service(module: str, function: str, *args, **kwargs):
+    return getattr(importlib.import_module(f"src.services.{module}"), function)(*args, **kwargs)
+
+
+def call(module: str, function: str, *args, **kwargs) -> Callable[[], object]:
+    """
+    Tâche importée à l'exécution seulement: un run clean n'importe ni pandas ni les clients API.
+    partial (et non lambda): sérialisable pour les tâches exécutées dans un processus
+    """
+    return partial(run_service, module, function, *args, **kwargs)
+
+
+def export_call(module: str, service: str, entity: str) -> Callable[[], object]:
+    def run():
+        service_class = getattr(importlib.import_module(f"src.services.{module}"), service)
+        return getattr(service_class(), f"export_{entity}")()
+    return run
+
+
+def export_tasks() -> List[Task]:
+    """Exports: toujours exécutés, une seule requête en cours par API (quota partagé)"""
+    def zendesk(entity: str):
+        return Task(f"zendesk_{entity}", "export", export_call("zendesk_service", "ZendeskService", entity),
+                    outputs=[f"zendesk_{entity}"], source="zendesk", always=True, pool="zendesk")
+
+    def intercom(entity: str, inputs: List[str] = None):
+        return Task(f"intercom_{entity}", "export", export_call("intercom_service", "IntercomService", entity),
+                    inputs=inputs, outputs=[f"intercom_{entity}"], source="intercom", always=True, pool="intercom")
+
+    return [
+        zendesk("tickets"), zendesk("users"), zendesk("articles"), zendesk("macros"),
+        intercom("conversations"),
+        # Contacts référencés seulement: la liste vient des conversations exportées
+        intercom("contacts", ["intercom_conversations"] if INTERCOM_REFERENCED_CONTACTS_ONLY else None),
+        intercom("articles")
+    ]
+
+
+def clean_tasks(processes: int = CLEAN_PROCESSES) -> List[Task]:
+    """Clean: processes > 1, chaque tâche dans un processus et gros fichiers écrits par lots"""
+    def clean(source: str, entity: str):
+        return Task(f"{source}_{entity}_clean", "clean",
+                    call(f"{source}_clean_service", f"{source}_clean_{entity}", processes=processes),
+                    inputs=[f"{source}_{entity}"],
+                    outputs=[f"{source}_{entity}_clean"], source=source, process=True)
+
+    return [
+        clean("zendesk", "tickets"),
+        clean("zendesk", "users"),
+        clean("zendesk", "articles"),
+        clean("zendesk", "macros"),
+        clean("intercom", "conversations"),
+        clean("intercom", "contacts"),
+        clean("intercom", "articles")
+    ]
+
+
+def build_pipeline(limit: int = None, workers: int = MIGRATION_WORKERS,
+                   schedule: str = MIGRATION_SCHEDULE, processes: int = CLEAN_PROCESSES) -> TaskGraph:
+    """Graphe complet export -> clean -> transform -> prepare -> import"""
+    return TaskGraph([
+        *export_tasks(),
+        *clean_tasks(processes),
+        Task("zendesk_tickets_transformed", "transform",
+             call("zendesk_transform_service", "zendesk_transform_tickets"),
+             inputs=["zendesk_tickets_clean"], outputs=["zendesk_tickets_transformed"], source="zendesk"),
+        Task("intercom_conversations_transformed", "transform",
+             call("intercom_transform_service", "intercom_transform_conversations"),
+             inputs=["intercom_conversations_clean"], outputs=["intercom_conversations_transformed"],
+             source="intercom"),
+        Task("chatwoot_contacts_prepared", "prepare",
+             call("chatwoot_prepare_contacts_service", "prepare_contacts_for_chatwoot"),
+             inputs=["zendesk_users_clean", "intercom_contacts_clean"], outputs=["chatwoot_contacts_prepared"]),
+        Task("chatwoot_conversations_prepared", "prepare",
+             call("chatwoot_prepare_conversations_service", "prepare_conversations_for_chatwoot"),
+             inputs=["zendesk_tickets_transformed", "intercom_conversations_transformed",
+                     "chatwoot_contacts_prepared"],
+             outputs=["chatwoot_conversations_prepared"]),
+        # Toujours exécuté: l'import reprend là où il s'est arrêté (mapping) et --limit peut changer
+        Task("chatwoot_import", "import",
+             call("chatwoot_service", "migrate_all_data", limit=limit, workers=workers, schedule=schedule),
+             inputs=["chatwoot_contacts_prepared", "chatwoot_conversations_prepared"], always=True, pool="chatwoot")
+    ])
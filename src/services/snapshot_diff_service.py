@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional
+from src.utils.records import Record
+from src.utils.run_manifest import file_checksum, recorded_artifact
+
+
+def record_id(record: Dict):
+    """Clé par défaut d'un enregistrement: son champ id"""
+    return record.get('id')
+
+
+def record_hash(record: Dict) -> str:
+    """Empreinte du contenu d'un enregistrement (indépendante de l'ordre des clés)"""
+    raw = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(',', ':'),
+                     default=lambda value: value.to_dict() if isinstance(value, Record) else str(value))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def load_snapshot(filepath: str, entity: str) -> List[Dict]:
+    """Charger la liste d'enregistrements d'un fichier exporté ({'metadata', entity: [...]})"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f).get(entity, [])
+
+
+def diff_records(old_records: List[Dict], new_records: List[Dict],
+                 key: Callable[[Dict], object] = record_id) -> Dict:
+    """
+    Comparer deux snapshots d'une même entité par ID et empreinte.
+    Retourne added/changed (enregistrements du nouveau snapshot), removed (IDs)
+    et unchanged (IDs).
+    """
+    old_hashes = {key(record): record_hash(record) for record in old_records}
+
+    diff = {'added': [], 'changed': [], 'removed': [], 'unchanged': set()}
+    seen = set()
+    for record in new_records:
+        record_key = key(record)
+        seen.add(record_key)
+        if record_key not in old_hashes:
+            diff['added'].append(record)
+        elif old_hashes[record_key] != record_hash(record):
+            diff['changed'].append(record)
+        else:
+            diff['unchanged'].add(record_key)
+
+    diff['removed'] = [record_key for record_key in old_hashes if record_key not in seen]
+    return diff
+
+
+def diff_snapshot_files(old_path: str, new_path: str, entity: str,
+                        key: Callable[[Dict], object] = record_id) -> Dict:
+    """Comparer deux fichiers datés d'une même entité"""
+    return diff_records(load_snapshot(old_path, entity), load_snapshot(new_path, entity), key)
+
+
+def find_previous_pair(output_key: str) -> Optional[Dict]:
+    """
+    Dernier couple (entrée, sortie) d'un stage, tel qu'enregistré au manifeste: la sortie
+    précédente et le fichier exact dont elle a été produite, tous deux inchangés sur disque
+    (checksums). None si ce couple n'est pas connu ou n'existe plus.
+    """
+    entry = recorded_artifact(output_key)
+    if not entry or len(entry.get('inputs', {})) != 1:
+        return None
+    (previous_input, checksum), = entry['inputs'].items()
+    if not os.path.exists(previous_input) or file_checksum(previous_input) != checksum:
+        return None
+    return {'input': previous_input, 'output': entry['path']}
+
+
+def print_diff_stats(label: str, diff: Dict):
+    print(f"Incrémental {label}: +{len(diff['added'])} ~{len(diff['changed'])} "
+          f"-{len(diff['removed'])} ={len(diff['unchanged'])} réutilisés")
+
+
+def incremental_map(records: List[Dict], record_fn: Callable[[Dict], Dict], entity: str,
+                    output_key: str, output_entity: str = None) -> List[Dict]:
+    """
+    Appliquer record_fn seulement aux enregistrements ajoutés ou modifiés depuis l'entrée
+    de la sortie précédente du stage (output_key, couple enregistré au manifeste); les
+    autres sont repris de cette sortie. Sans couple enregistré, tous sont traités.
+    """
+    previous = find_previous_pair(output_key)
+    if not previous:
+        print(f"Incrémental {entity}: aucune sortie précédente enregistrée, traitement complet")
+        return [record_fn(record) for record in records]
+
+    diff = diff_records(load_snapshot(previous['input'], entity), records)
+    print_diff_stats(f"{entity} (vs {os.path.basename(previous['input'])})", diff)
+
+    previous_output = {record_id(record): record
+                       for record in load_snapshot(previous['output'], output_entity or entity)}
+
+    results = []
+    for record in records:
+        key = record_id(record)
+        if key in diff['unchanged'] and key in previous_output:
+            results.append(previous_output[key])
+        else:
+            results.append(record_fn(record))
+    return results
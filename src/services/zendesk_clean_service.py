@@ -1,35 +1,106 @@
-import json
 import os
+from functools import partial
 from typing import Dict, List
 from src.utils.helpers import save_json, get_file_size, get_timestamp
-from configs.config import ZENDESK_OUTPUT_DIR
+from src.utils.parallel import run_in_processes
+from src.services.snapshot_diff_service import incremental_map
+from src.utils.projection import compile_projection, project_records, Each, Field, KeyValues
+from src.utils.staging_store import load_records, stage_records, stream_records
+from src.utils.run_manifest import get_run_date, resolve_artifact, up_to_date_artifact, record_artifact
+from configs.config import ZENDESK_OUTPUT_DIR, INCREMENTAL_STAGES, CLEAN_PROCESSES
 
 
-def zendesk_clean_articles() -> str:
+# Schémas de nettoyage: {champ de sortie: chemin source ou règle}, compilés une fois à l'import
+ARTICLE_SCHEMA = {
+    'id': 'id',
+    'title': 'title',
+    'content': 'body',
+    'author_id': 'author_id',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+    'locale': 'locale',
+    'category_id': 'section_id'
+}
+
+# Actions structurées: {champ: valeur}, comment_value_html renommé en comment
+MACRO_SCHEMA = {
+    'id': 'id',
+    'title': 'title',
+    'raw_title': 'raw_title',
+    'description': 'description',
+    'active': 'active',
+    'default': 'default',
+    'position': 'position',
+    'actions': KeyValues('actions', rename={'comment_value_html': 'comment'}),
+    'restriction': 'restriction',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at'
+}
+
+COMMENT_SCHEMA = {
+    'id': 'id',
+    'author_id': 'author_id',
+    'body': 'body',
+    'html_body': 'html_body',
+    'public': 'public',
+    'created_at': 'created_at',
+    'attachments': Field('attachments', [])
+}
+
+TICKET_SCHEMA = {
+    'id': 'id',
+    'subject': 'subject',
+    'description': 'description',
+    'status': 'status',
+    'priority': 'priority',
+    'type': 'type',
+    'requester_id': 'requester_id',
+    'assignee_id': 'assignee_id',
+    'group_id': 'group_id',
+    'organization_id': 'organization_id',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+    'tags': Field('tags', []),
+    'comments': Each('comments', COMMENT_SCHEMA)
+}
+
+USER_SCHEMA = {
+    'id': 'id',
+    'name': 'name',
+    'email': 'email',
+    'phone': 'phone',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+    'time_zone': 'time_zone',
+    'locale': 'locale',
+    'organization_id': 'organization_id',
+    'active': 'active',
+    'tags': Field('tags', [])
+}
+
+clean_article = compile_projection(ARTICLE_SCHEMA, 'clean_article')
+clean_macro = compile_projection(MACRO_SCHEMA, 'clean_macro')
+clean_ticket = compile_projection(TICKET_SCHEMA, 'clean_ticket')
+clean_user = compile_projection(USER_SCHEMA, 'clean_user')
+
+def zendesk_clean_articles(incremental: bool = INCREMENTAL_STAGES, processes: int = CLEAN_PROCESSES) -> str:
     """Nettoyer les articles Zendesk pour Chatwoot"""
-    date_today = get_timestamp()  
-    origin_file = f"{ZENDESK_OUTPUT_DIR}/origin_export/zendesk_articles_{date_today}.json"
-    
-    print(f"Nettoyage articles: {os.path.basename(origin_file)}")
+    date_today = get_run_date()
+    origin_file = resolve_artifact("zendesk_articles", f"{ZENDESK_OUTPUT_DIR}/origin_export/zendesk_articles_{date_today}.json")
     
-    with open(origin_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    unchanged = up_to_date_artifact("zendesk_articles_clean", [origin_file])
+    if unchanged:
+        print(f"Stage ignoré (entrées inchangées): {os.path.basename(unchanged)}")
+        return unchanged
     
-    articles = data.get('articles', [])
-    cleaned_articles = []
+    print(f"Nettoyage articles: {os.path.basename(origin_file)}")
     
-    for article in articles:
-        cleaned_article = {
-            'id': article.get('id'),
-            'title': article.get('title'),
-            'content': article.get('body'),
-            'author_id': article.get('author_id'),
-            'created_at': article.get('created_at'),
-            'updated_at': article.get('updated_at'),
-            'locale': article.get('locale'),
-            'category_id': article.get('section_id')
-        }
-        cleaned_articles.append(cleaned_article)
+    if incremental:
+        articles = load_records('raw', 'zendesk_articles', origin_file, 'articles')
+        cleaned_articles = incremental_map(articles, clean_article, 'articles', "zendesk_articles_clean")
+    else:
+        # Enregistrements bruts lus en flux et projetés un par un
+        cleaned_articles = project_records(clean_article, stream_records('raw', 'zendesk_articles', origin_file, 'articles'))
     
     # Structure finale
     cleaned_data = {
@@ -43,61 +114,35 @@ def zendesk_clean_articles() -> str:
     
     # Sauvegarder les données nettoyées
     output_dir = f"{ZENDESK_OUTPUT_DIR}/clean_export_data"
+    os.makedirs(output_dir, exist_ok=True)
 
     filename = f"zendesk_articles_clean_{date_today}.json"
     filepath = os.path.join(output_dir, filename)
-    save_json(cleaned_data, filepath)
+    save_json(cleaned_data, filepath, records_key='articles', processes=processes)
+    stage_records('clean', 'zendesk_articles', cleaned_articles, filepath)
+    record_artifact("zendesk_articles_clean", filepath, len(cleaned_articles), "clean", [origin_file])
     
     print(f"Articles nettoyés: {filename} ({get_file_size(filepath)}) - {len(cleaned_articles)} items")
     return filepath
 
-def zendesk_clean_macros() -> str:
+def zendesk_clean_macros(incremental: bool = INCREMENTAL_STAGES, processes: int = CLEAN_PROCESSES) -> str:
     """Nettoyer les macros Zendesk pour Chatwoot"""
-    date_today = get_timestamp()
-    origin_file = f"{ZENDESK_OUTPUT_DIR}/origin_export/zendesk_macros_{date_today}.json"
+    date_today = get_run_date()
+    origin_file = resolve_artifact("zendesk_macros", f"{ZENDESK_OUTPUT_DIR}/origin_export/zendesk_macros_{date_today}.json")
     
-    print(f"Nettoyage macros: {os.path.basename(origin_file)}")
-    
-    with open(origin_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    unchanged = up_to_date_artifact("zendesk_macros_clean", [origin_file])
+    if unchanged:
+        print(f"Stage ignoré (entrées inchangées): {os.path.basename(unchanged)}")
+        return unchanged
     
-    macros = data.get('macros', [])
-    cleaned_macros = []
+    print(f"Nettoyage macros: {os.path.basename(origin_file)}")
     
-    for macro in macros:
-        # Structurer les actions
-        actions = macro.get('actions', [])
-        structured_actions = {}
-        
-        for action in actions:
-            field = action.get('field')
-            value = action.get('value')
-            
-            if field == 'comment_value_html':
-                structured_actions['comment'] = value
-            elif field == 'status':
-                structured_actions['status'] = value
-            elif field == 'assignee_id':
-                structured_actions['assignee_id'] = value
-            elif field == 'group_id':
-                structured_actions['group_id'] = value
-            else:
-                structured_actions[field] = value
-        
-        cleaned_macro = {
-            'id': macro.get('id'),
-            'title': macro.get('title'),
-            'raw_title': macro.get('raw_title'),
-            'description': macro.get('description'),
-            'active': macro.get('active'),
-            'default': macro.get('default'),
-            'position': macro.get('position'),
-            'actions': structured_actions,
-            'restriction': macro.get('restriction'),
-            'created_at': macro.get('created_at'),
-            'updated_at': macro.get('updated_at')
-        }
-        cleaned_macros.append(cleaned_macro)
+    if incremental:
+        macros = load_records('raw', 'zendesk_macros', origin_file, 'macros')
+        cleaned_macros = incremental_map(macros, clean_macro, 'macros', "zendesk_macros_clean")
+    else:
+        # Enregistrements bruts lus en flux et projetés un par un
+        cleaned_macros = project_records(clean_macro, stream_records('raw', 'zendesk_macros', origin_file, 'macros'))
     
     cleaned_data = {
         'metadata': {
@@ -113,59 +158,31 @@ def zendesk_clean_macros() -> str:
 
     filename = f"zendesk_macros_clean_{date_today}.json"
     filepath = os.path.join(output_dir, filename)
-    save_json(cleaned_data, filepath)
+    save_json(cleaned_data, filepath, records_key='macros', processes=processes)
+    stage_records('clean', 'zendesk_macros', cleaned_macros, filepath)
+    record_artifact("zendesk_macros_clean", filepath, len(cleaned_macros), "clean", [origin_file])
     
     print(f"Macros nettoyées: {filename} ({get_file_size(filepath)}) - {len(cleaned_macros)} items")
     return filepath
 
-def zendesk_clean_tickets() -> str:
+def zendesk_clean_tickets(incremental: bool = INCREMENTAL_STAGES, processes: int = CLEAN_PROCESSES) -> str:
     """Nettoyer les tickets Zendesk pour Chatwoot"""
-    date_today = get_timestamp()
-    origin_file = f"{ZENDESK_OUTPUT_DIR}/origin_export/zendesk_tickets_{date_today}.json"
-    
-    print(f"Nettoyage tickets: {os.path.basename(origin_file)}")
+    date_today = get_run_date()
+    origin_file = resolve_artifact("zendesk_tickets", f"{ZENDESK_OUTPUT_DIR}/origin_export/zendesk_tickets_{date_today}.json")
     
-    with open(origin_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    unchanged = up_to_date_artifact("zendesk_tickets_clean", [origin_file])
+    if unchanged:
+        print(f"Stage ignoré (entrées inchangées): {os.path.basename(unchanged)}")
+        return unchanged
     
-    tickets = data.get('tickets', [])
-    cleaned_tickets = []
+    print(f"Nettoyage tickets: {os.path.basename(origin_file)}")
     
-    for ticket in tickets:
-        # Nettoyer les commentaires
-        comments = ticket.get('comments', [])
-        cleaned_comments = []
-        
-        for comment in comments:
-            cleaned_comment = {
-                'id': comment.get('id'),
-                'author_id': comment.get('author_id'),
-                'body': comment.get('body'),
-                'html_body': comment.get('html_body'),
-                'public': comment.get('public'),
-                'created_at': comment.get('created_at'),
-                'attachments': comment.get('attachments', [])
-            }
-            cleaned_comments.append(cleaned_comment)
-        
-        # Nettoyer le ticket principal
-        cleaned_ticket = {
-            'id': ticket.get('id'),
-            'subject': ticket.get('subject'),
-            'description': ticket.get('description'),
-            'status': ticket.get('status'),
-            'priority': ticket.get('priority'),
-            'type': ticket.get('type'),
-            'requester_id': ticket.get('requester_id'),
-            'assignee_id': ticket.get('assignee_id'),
-            'group_id': ticket.get('group_id'),
-            'organization_id': ticket.get('organization_id'),
-            'created_at': ticket.get('created_at'),
-            'updated_at': ticket.get('updated_at'),
-            'tags': ticket.get('tags', []),
-            'comments': cleaned_comments
-        }
-        cleaned_tickets.append(cleaned_ticket)
+    if incremental:
+        tickets = load_records('raw', 'zendesk_tickets', origin_file, 'tickets')
+        cleaned_tickets = incremental_map(tickets, clean_ticket, 'tickets', "zendesk_tickets_clean")
+    else:
+        # Enregistrements bruts lus en flux et projetés un par un
+        cleaned_tickets = project_records(clean_ticket, stream_records('raw', 'zendesk_tickets', origin_file, 'tickets'))
     
     cleaned_data = {
         'metadata': {
@@ -181,39 +198,31 @@ def zendesk_clean_tickets() -> str:
 
     filename = f"zendesk_tickets_clean_{date_today}.json"
     filepath = os.path.join(output_dir, filename)
-    save_json(cleaned_data, filepath)
+    save_json(cleaned_data, filepath, records_key='tickets', processes=processes)
+    stage_records('clean', 'zendesk_tickets', cleaned_tickets, filepath)
+    record_artifact("zendesk_tickets_clean", filepath, len(cleaned_tickets), "clean", [origin_file])
     
     print(f"Tickets nettoyés: {filename} ({get_file_size(filepath)}) - {len(cleaned_tickets)} items")
     return filepath
 
-def zendesk_clean_users() -> str:
+def zendesk_clean_users(incremental: bool = INCREMENTAL_STAGES, processes: int = CLEAN_PROCESSES) -> str:
     """Nettoyer les contacts Zendesk pour Chatwoot"""
-    date_today = get_timestamp()
-    origin_file = f"{ZENDESK_OUTPUT_DIR}/origin_export/zendesk_users_{date_today}.json"
-    
-    print(f"Nettoyage contacts: {os.path.basename(origin_file)}")
+    date_today = get_run_date()
+    origin_file = resolve_artifact("zendesk_users", f"{ZENDESK_OUTPUT_DIR}/origin_export/zendesk_users_{date_today}.json")
     
-    with open(origin_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    unchanged = up_to_date_artifact("zendesk_users_clean", [origin_file])
+    if unchanged:
+        print(f"Stage ignoré (entrées inchangées): {os.path.basename(unchanged)}")
+        return unchanged
     
-    users = data.get('users', [])
-    cleaned_users = []
+    print(f"Nettoyage contacts: {os.path.basename(origin_file)}")
     
-    for user in users:
-        cleaned_user = {
-            'id': user.get('id'),
-            'name': user.get('name'),
-            'email': user.get('email'),
-            'phone': user.get('phone'),
-            'created_at': user.get('created_at'),
-            'updated_at': user.get('updated_at'),
-            'time_zone': user.get('time_zone'),
-            'locale': user.get('locale'),
-            'organization_id': user.get('organization_id'),
-            'active': user.get('active'),
-            'tags': user.get('tags', [])
-        }
-        cleaned_users.append(cleaned_user)
+    if incremental:
+        users = load_records('raw', 'zendesk_users', origin_file, 'users')
+        cleaned_users = incremental_map(users, clean_user, 'users', "zendesk_users_clean")
+    else:
+        # Enregistrements bruts lus en flux et projetés un par un
+        cleaned_users = project_records(clean_user, stream_records('raw', 'zendesk_users', origin_file, 'users'))
     
     cleaned_data = {
         'metadata': {
@@ -229,21 +238,28 @@ def zendesk_clean_users() -> str:
     
     filename = f"zendesk_users_clean_{date_today}.json"
     filepath = os.path.join(output_dir, filename)
-    save_json(cleaned_data, filepath)
+    save_json(cleaned_data, filepath, records_key='users', processes=processes)
+    stage_records('clean', 'zendesk_users', cleaned_users, filepath)
+    record_artifact("zendesk_users_clean", filepath, len(cleaned_users), "clean", [origin_file])
     
     print(f"Contacts nettoyés: {filename} ({get_file_size(filepath)}) - {len(cleaned_users)} items")
     return filepath
 
-def zendesk_clean_all() -> Dict[str, str]:
-    """Nettoyer toutes les données Zendesk"""
+def zendesk_clean_all(incremental: bool = INCREMENTAL_STAGES, processes: int = CLEAN_PROCESSES) -> Dict[str, str]:
+    """Nettoyer toutes les données Zendesk (processes > 1: une entité par processus)"""
     print("Nettoyage complet Zendesk")
     print("=" * 25)
     
-    files = {}
-    files['tickets'] = zendesk_clean_tickets()
-    files['users'] = zendesk_clean_users()
-    files['articles'] = zendesk_clean_articles()
-    files['macros'] = zendesk_clean_macros()
+    functions = {
+        'tickets': partial(zendesk_clean_tickets, incremental, processes),
+        'users': partial(zendesk_clean_users, incremental, processes),
+        'articles': partial(zendesk_clean_articles, incremental, processes),
+        'macros': partial(zendesk_clean_macros, incremental, processes)
+    }
+    if processes > 1:
+        files = run_in_processes(functions, 'clean', processes)
+    else:
+        files = {entity: function() for entity, function in functions.items()}
     
     print(f"\nNettoyage terminé - {len(files)} fichiers créés")
     return files
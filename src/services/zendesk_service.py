@@ -2,7 +2,10 @@ import os
 from typing import Dict, List
 from src.api.zendesk_client import ZendeskClient
 from src.utils.helpers import save_json, get_file_size, get_timestamp
-from configs.config import ZENDESK_OUTPUT_DIR
+from src.utils.staging_store import stage_records
+from src.utils.ndjson_index import write_ndjson, ndjson_path
+from src.utils.run_manifest import get_run_date, record_artifact
+from configs.config import ZENDESK_OUTPUT_DIR, EXPORT_NDJSON
 
 
 class ZendeskService:
@@ -22,9 +25,13 @@ class ZendeskService:
             'tickets': tickets
         }
         
-        filename = f"zendesk_tickets_{get_timestamp()}.json"
+        filename = f"zendesk_tickets_{get_run_date()}.json"
         filepath = os.path.join(self.output_dir, filename)
         save_json(data, filepath)
+        stage_records('raw', 'zendesk_tickets', tickets, filepath)
+        if EXPORT_NDJSON:
+            write_ndjson(tickets, ndjson_path(filepath))
+        record_artifact("zendesk_tickets", filepath, len(tickets), "export")
         
         print(f"Tickets sauvés: {filename} ({get_file_size(filepath)}) - {len(tickets)} items")
         return filepath
@@ -39,9 +46,11 @@ class ZendeskService:
             'users': users
         }
         
-        filename = f"zendesk_users_{get_timestamp()}.json"
+        filename = f"zendesk_users_{get_run_date()}.json"
         filepath = os.path.join(self.output_dir, filename)
         save_json(data, filepath)
+        stage_records('raw', 'zendesk_users', users, filepath)
+        record_artifact("zendesk_users", filepath, len(users), "export")
         
         print(f"Contacts sauvés: {filename} ({get_file_size(filepath)}) - {len(users)} items")
         return filepath
@@ -56,9 +65,11 @@ class ZendeskService:
             'articles': articles
         }
         
-        filename = f"zendesk_articles_{get_timestamp()}.json"
+        filename = f"zendesk_articles_{get_run_date()}.json"
         filepath = os.path.join(self.output_dir, filename)
         save_json(data, filepath)
+        stage_records('raw', 'zendesk_articles', articles, filepath)
+        record_artifact("zendesk_articles", filepath, len(articles), "export")
         
         print(f"Articles sauvés: {filename} ({get_file_size(filepath)}) - {len(articles)} items")
         return filepath
@@ -73,9 +84,11 @@ class ZendeskService:
             'macros': macros
         }
         
-        filename = f"zendesk_macros_{get_timestamp()}.json"
+        filename = f"zendesk_macros_{get_run_date()}.json"
         filepath = os.path.join(self.output_dir, filename)
         save_json(data, filepath)
+        stage_records('raw', 'zendesk_macros', macros, filepath)
+        record_artifact("zendesk_macros", filepath, len(macros), "export")
         
         print(f"Macros sauvés: {filename} ({get_file_size(filepath)}) - {len(macros)} items")
         return filepath
@@ -1,84 +1,96 @@
-import json
 import os
+from typing import Dict
 from src.utils.helpers import clean_markdown_formatting, save_json, get_file_size, get_timestamp, html_to_markdown, format_date_header
-from configs.config import ZENDESK_OUTPUT_DIR
+from src.services.snapshot_diff_service import incremental_map
+from src.utils.staging_store import load_records, stage_records
+from src.utils.records import ZendeskComment, intern_value
+from src.utils.run_manifest import get_run_date, resolve_artifact, up_to_date_artifact, record_artifact
+from configs.config import ZENDESK_OUTPUT_DIR, INCREMENTAL_STAGES
 
 
-def zendesk_transform_tickets() -> str:
-    """Transformer les tickets Zendesk pour Chatwoot"""
-    date_today = get_timestamp()
-    input_file = f"{ZENDESK_OUTPUT_DIR}/clean_export_data/zendesk_tickets_clean_{date_today}.json"
-    
-    print(f"Transformation tickets: {os.path.basename(input_file)}")
-    
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    tickets = data.get('tickets', [])
-    transformed_tickets = []
+def transform_ticket(ticket: Dict) -> Dict:
+    """Transformer un ticket Zendesk (commentaires en Markdown avec date d'origine)"""
+    comments = ticket.get('comments', [])
+    transformed_comments = []
     
-    for ticket in tickets:
-        comments = ticket.get('comments', [])
-        transformed_comments = []
-        
-        for comment in comments:
-            html_body = comment.get('html_body', '')
-            if html_body:
-                markdown_content = html_to_markdown(html_body)
-            else:
-                body = comment.get('body', '')
-                markdown_content = body.replace('\n', '<br>')
-                if markdown_content:
-                    markdown_content = clean_markdown_formatting(markdown_content)
-            
-            created_at = comment.get('created_at', '')
-            date_header = format_date_header(created_at)
-            
+    for comment in comments:
+        html_body = comment.get('html_body', '')
+        if html_body:
+            markdown_content = html_to_markdown(html_body)
+        else:
+            body = comment.get('body', '')
+            markdown_content = body.replace('\n', '<br>')
             if markdown_content:
-                final_content = f"{date_header}<br><br>{markdown_content}"
-            else:
-                final_content = date_header
-            
-            transformed_comment = {
-                'id': comment.get('id'),
-                'author_id': comment.get('author_id'),
-                'content': final_content,
-                'public': comment.get('public'),
-                'created_at': comment.get('created_at'),
-                'attachments': comment.get('attachments', [])
-            }
-            transformed_comments.append(transformed_comment)
+                markdown_content = clean_markdown_formatting(markdown_content)
         
-        description = ticket.get('description', '')
-        created_at = ticket.get('created_at', '')
+        created_at = comment.get('created_at', '')
+        date_header = format_date_header(created_at)
         
-        if description:
-            description_with_br = description.replace('\n', '<br>')
-            
-            cleaned_description = clean_markdown_formatting(description_with_br)
-            
-            description_header = format_date_header(created_at)
-            transformed_description = f"{description_header}<br><br>{cleaned_description}"
+        if markdown_content:
+            final_content = f"{date_header}<br><br>{markdown_content}"
         else:
-            transformed_description = ""
+            final_content = date_header
+        
+        transformed_comment = ZendeskComment(
+            id=comment.get('id'),
+            author_id=comment.get('author_id'),
+            content=final_content,
+            public=comment.get('public'),
+            created_at=comment.get('created_at'),
+            attachments=comment.get('attachments', [])
+        )
+        transformed_comments.append(transformed_comment)
+    
+    description = ticket.get('description', '')
+    created_at = ticket.get('created_at', '')
+    
+    if description:
+        description_with_br = description.replace('\n', '<br>')
         
-        transformed_ticket = {
-            'id': ticket.get('id'),
-            'subject': ticket.get('subject'),
-            'description': transformed_description,
-            'status': ticket.get('status'),
-            'priority': ticket.get('priority'),
-            'type': ticket.get('type'),
-            'requester_id': ticket.get('requester_id'),
-            'assignee_id': ticket.get('assignee_id'),
-            'group_id': ticket.get('group_id'),
-            'organization_id': ticket.get('organization_id'),
-            'created_at': ticket.get('created_at'),
-            'updated_at': ticket.get('updated_at'),
-            'tags': ticket.get('tags', []),
-            'comments': transformed_comments
-        }
-        transformed_tickets.append(transformed_ticket)
+        cleaned_description = clean_markdown_formatting(description_with_br)
+        
+        description_header = format_date_header(created_at)
+        transformed_description = f"{description_header}<br><br>{cleaned_description}"
+    else:
+        transformed_description = ""
+    
+    return {
+        'id': ticket.get('id'),
+        'subject': ticket.get('subject'),
+        'description': transformed_description,
+        'status': intern_value(ticket.get('status')),
+        'priority': ticket.get('priority'),
+        'type': ticket.get('type'),
+        'requester_id': ticket.get('requester_id'),
+        'assignee_id': ticket.get('assignee_id'),
+        'group_id': ticket.get('group_id'),
+        'organization_id': ticket.get('organization_id'),
+        'created_at': ticket.get('created_at'),
+        'updated_at': ticket.get('updated_at'),
+        'tags': ticket.get('tags', []),
+        'comments': transformed_comments
+    }
+
+def zendesk_transform_tickets(incremental: bool = INCREMENTAL_STAGES) -> str:
+    """Transformer les tickets Zendesk pour Chatwoot"""
+    date_today = get_run_date()
+    input_file = resolve_artifact("zendesk_tickets_clean", f"{ZENDESK_OUTPUT_DIR}/clean_export_data/zendesk_tickets_clean_{date_today}.json")
+    
+    unchanged = up_to_date_artifact("zendesk_tickets_transformed", [input_file])
+    if unchanged:
+        print(f"Stage ignoré (entrées inchangées): {os.path.basename(unchanged)}")
+        return unchanged
+    
+    print(f"Transformation tickets: {os.path.basename(input_file)}")
+    
+    tickets = load_records('clean', 'zendesk_tickets', input_file, 'tickets')
+    transformed_tickets = []
+    
+    if incremental:
+        transformed_tickets = incremental_map(tickets, transform_ticket, 'tickets', "zendesk_tickets_transformed")
+    else:
+        for ticket in tickets:
+            transformed_tickets.append(transform_ticket(ticket))
     
     transformed_data = {
         'metadata': {
@@ -96,6 +108,8 @@ def zendesk_transform_tickets() -> str:
     filename = f"zendesk_tickets_transformed_{date_today}.json"
     filepath = os.path.join(output_dir, filename)
     save_json(transformed_data, filepath)
+    stage_records('transformed', 'zendesk_tickets', transformed_tickets, filepath)
+    record_artifact("zendesk_tickets_transformed", filepath, len(transformed_tickets), "transform", [input_file])
     
     print(f"Tickets transformés: {filename} ({get_file_size(filepath)}) - {len(transformed_tickets)} items")
     return filepath
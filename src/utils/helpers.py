@@ -2,13 +2,34 @@ import json
 import os
 import re
 from datetime import datetime
-from typing import Any
+from typing import Any, List, Optional, Tuple
+from src.utils.metrics import get_metrics
+from src.utils.records import json_default
+from configs.config import LOG_LEVEL, CLEAN_CHUNK_SIZE
 
 
-def save_json(data: Any, filepath: str) -> str:
-    """Sauvegarder des données en JSON"""
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def debug(message: str):
+    """Message de détail (par requête, par contact), affiché seulement avec LOG_LEVEL=DEBUG"""
+    if LOG_LEVEL == 'DEBUG':
+        print(message)
+
+def save_json(data: Any, filepath: str, records_key: str = None, processes: int = 1,
+              chunk_size: int = CLEAN_CHUNK_SIZE) -> str:
+    """
+    Sauvegarder des données en JSON.
+    records_key + processes > 1: la liste data[records_key] est sérialisée par lots de
+    chunk_size dans un pool de processus (json indenté: encodeur Python pur, l'essentiel du
+    temps d'écriture). Fichier identique à l'écriture séquentielle.
+    """
+    if records_key and processes > 1 and len(data[records_key]) > chunk_size:
+        from src.utils.parallel import encode_json_chunked
+        text = encode_json_chunked(data, records_key, processes, chunk_size)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False, default=json_default)
+    get_metrics().add_bytes_written(os.path.getsize(filepath))
     return filepath
 
 def get_file_size(filepath: str) -> str:
@@ -26,6 +47,24 @@ def get_timestamp(include_time: bool = False) -> str:
         return datetime.now().strftime("%Y%m%d_%H%M%S")
     return datetime.now().strftime("%Y%m%d")
 
+def find_dated_files(directory: str, prefix: str) -> List[Tuple[str, str]]:
+    """Lister les fichiers datés ({prefix}_YYYYMMDD.json) d'un dossier: [(date, chemin)] triés"""
+    if not os.path.isdir(directory):
+        return []
+    pattern = re.compile(rf'^{re.escape(prefix)}_(\d{{8}})\.json$')
+    files = []
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match:
+            files.append((match.group(1), os.path.join(directory, name)))
+    return sorted(files)
+
+def find_latest_file(directory: str, prefix: str, before: str = None) -> Optional[str]:
+    """Trouver le fichier daté le plus récent (optionnellement strictement avant une date)"""
+    files = [(date, path) for date, path in find_dated_files(directory, prefix)
+             if before is None or date < before]
+    return files[-1][1] if files else None
+
 def ensure_dir(directory: str) -> str:
     """Créer un dossier s'il n'existe pas"""
     os.makedirs(directory, exist_ok=True)
@@ -0,0 +1,401 @@
+import json
+import os
+import re
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+from src.utils.profiling import start_stage_profile, stop_stage_profile
+
+
+# Bornes des histogrammes de latence (secondes)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Segments d'URL variables: IDs numériques, hexadécimaux (Intercom) ou UUID
+ID_SEGMENT = re.compile(r'^(\d+|[0-9a-f]{16,}|[0-9a-f-]{36})(\.json)?$', re.IGNORECASE)
+
+
+def endpoint_template(url: str) -> str:
+    """Chemin d'une URL avec les IDs remplacés par {id} (ex: /api/v2/tickets/{id}/comments)"""
+    segments = urlparse(url).path.split('/')
+    return '/'.join('{id}' if ID_SEGMENT.match(segment) else segment for segment in segments)
+
+
+def peak_rss_bytes() -> int:
+    """Pic de mémoire résidente du processus depuis son démarrage (ru_maxrss est en Ko sous Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def current_rss_bytes() -> int:
+    """Mémoire résidente actuelle du processus (/proc/self/statm, Linux); ailleurs: son pic"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+class Histogram:
+    """Histogramme cumulatif à bornes fixes"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Borne supérieure du bucket contenant le quantile q"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum_seconds': round(self.total, 3),
+            'avg_seconds': round(self.total / self.count, 4) if self.count else None,
+            'p50_seconds': self.quantile(0.5),
+            'p95_seconds': self.quantile(0.95),
+            'buckets': {str(bound): count for bound, count in zip((*self.buckets, '+Inf'), self.counts)}
+        }
+
+
+class StageMetrics:
+    """
+    Mesures d'un stage: durée, enregistrements, octets lus/écrits, mémoire.
+    wall_seconds: du premier début au dernier fin de ses tâches (tâches parallèles comptées
+    une fois), task_seconds: somme des durées des tâches.
+    rss_delta_bytes: plus forte hausse de la mémoire résidente pendant une tâche du stage
+    (processus entier: inclut les tâches parallèles d'autres stages);
+    process_peak_rss_bytes: pic du processus depuis son démarrage, relevé à la fin du stage
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.first_started = None
+        self.last_ended = None
+        self.task_seconds = 0.0
+        self.runs = 0
+        self.records = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.rss_delta = 0
+        self.process_peak_rss = 0
+        self.profile = None  # dossier des profils cProfile/tracemalloc (PROFILE_STAGES)
+
+    @property
+    def wall_seconds(self) -> float:
+        if self.first_started is None:
+            return 0.0
+        return self.last_ended - self.first_started
+
+    def add_run(self, started: float, ended: float):
+        self.first_started = started if self.first_started is None else min(self.first_started, started)
+        self.last_ended = ended if self.last_ended is None else max(self.last_ended, ended)
+        self.task_seconds += ended - started
+        self.runs += 1
+
+    def to_dict(self) -> Dict:
+        wall_seconds = self.wall_seconds
+        return {
+            'wall_seconds': round(wall_seconds, 3),
+            'task_seconds': round(self.task_seconds, 3),
+            'runs': self.runs,
+            'records': self.records,
+            'records_per_second': round(self.records / wall_seconds, 1) if wall_seconds else None,
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'rss_delta_bytes': self.rss_delta,
+            'process_peak_rss_bytes': self.process_peak_rss,
+            'profile': self.profile
+        }
+
+
+class EndpointMetrics:
+    """Mesures d'un endpoint: requêtes, statuts, latences, retries"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.retries = 0
+        self.bytes_received = 0
+        self.statuses = {}
+        self.latency = Histogram()
+
+    def to_dict(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'throttled_429': self.throttled,
+            'retries': self.retries,
+            'bytes_received': self.bytes_received,
+            'statuses': self.statuses,
+            'latency': self.latency.to_dict()
+        }
+
+
+class RunMetrics:
+    """
+    Instrumentation du run: stages (export, clean, transform, prepare, import),
+    endpoints par service API et attente dans les rate limiters.
+    Thread-safe: les workers d'import enregistrent en parallèle.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current_stage = None
+        self._local = threading.local()
+        self.started_at = time.time()
+        self.stages: Dict[str, StageMetrics] = {}
+        self.endpoints: Dict[str, Dict[str, EndpointMetrics]] = {}
+        self.rate_limit_sleep: Dict[str, float] = {}
+
+    # Stages
+
+    def current_stage(self) -> Optional[str]:
+        """
+        Stage en cours: celui du thread s'il en a ouvert un (tâches parallèles du graphe),
+        sinon le dernier ouvert (workers démarrés par un stage)
+        """
+        return getattr(self._local, 'stage', None) or self._current_stage
+
+    def _stage(self, name: str) -> StageMetrics:
+        if name not in self.stages:
+            self.stages[name] = StageMetrics(name)
+        return self.stages[name]
+
+    @contextmanager
+    def stage(self, name: str, task: str = None, profile: bool = True):
+        """
+        Mesurer une tâche d'un stage: with get_metrics().stage('clean', 'zendesk_tickets_clean'): ...
+        Profilée si le stage est dans PROFILE_STAGES (profile=False: tâche profilée ailleurs,
+        ex: dans le processus worker qui l'exécute)
+        """
+        previous, previous_local = self._current_stage, getattr(self._local, 'stage', None)
+        self._current_stage = self._local.stage = name
+        profiler = start_stage_profile(name, task) if profile else None
+        rss_before = current_rss_bytes()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            ended = time.perf_counter()
+            rss_delta = current_rss_bytes() - rss_before
+            profile = stop_stage_profile(profiler) if profiler else None
+            with self._lock:
+                stage = self._stage(name)
+                stage.add_run(started, ended)
+                stage.rss_delta = max(stage.rss_delta, rss_delta)
+                stage.process_peak_rss = max(stage.process_peak_rss, peak_rss_bytes())
+                stage.profile = profile or stage.profile
+            self._current_stage, self._local.stage = previous, previous_local
+
+    def merge_stage(self, name: str, measures: Dict):
+        """Ajouter les mesures d'un stage exécuté dans un processus worker (durée mesurée par le parent)"""
+        with self._lock:
+            stage = self._stage(name)
+            stage.records += measures['records']
+            stage.bytes_read += measures['bytes_read']
+            stage.bytes_written += measures['bytes_written']
+            stage.rss_delta = max(stage.rss_delta, measures['rss_delta_bytes'])
+            stage.process_peak_rss = max(stage.process_peak_rss, measures['process_peak_rss_bytes'])
+            stage.profile = measures['profile'] or stage.profile
+
+    def add_records(self, count: int, stage: str = None):
+        stage = stage or self.current_stage()
+        if stage:
+            with self._lock:
+                self._stage(stage).records += count
+
+    def add_bytes_read(self, count: int):
+        stage = self.current_stage()
+        if stage:
+            with self._lock:
+                self._stage(stage).bytes_read += count
+
+    def add_bytes_written(self, count: int):
+        stage = self.current_stage()
+        if stage:
+            with self._lock:
+                self._stage(stage).bytes_written += count
+
+    # API
+
+    def _endpoint(self, service: str, endpoint: str) -> EndpointMetrics:
+        return self.endpoints.setdefault(service, {}).setdefault(endpoint, EndpointMetrics())
+
+    def record_request(self, service: str, url: str, method: str, status: int, latency: float, size: int = 0):
+        endpoint = f"{method} {endpoint_template(url)}"
+        with self._lock:
+            metrics = self._endpoint(service, endpoint)
+            metrics.requests += 1
+            metrics.statuses[str(status)] = metrics.statuses.get(str(status), 0) + 1
+            metrics.latency.observe(latency)
+            metrics.bytes_received += size
+            if status == 429:
+                metrics.throttled += 1
+            elif status >= 400:
+                metrics.errors += 1
+
+    def record_retry(self, service: str, url: str, method: str = "GET"):
+        endpoint = f"{method} {endpoint_template(url)}"
+        with self._lock:
+            self._endpoint(service, endpoint).retries += 1
+
+    def request_count(self, service: str) -> int:
+        """Nombre de requêtes envoyées à un service depuis le début du run"""
+        with self._lock:
+            return sum(m.requests for m in self.endpoints.get(service, {}).values())
+
+    def record_rate_limit_sleep(self, service: str, seconds: float):
+        with self._lock:
+            self.rate_limit_sleep[service] = self.rate_limit_sleep.get(service, 0.0) + seconds
+
+    # Rapports
+
+    def report(self) -> Dict:
+        with self._lock:
+            return {
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+                'wall_seconds': round(time.time() - self.started_at, 3),
+                # Pics des stages inclus: ceux des tâches exécutées dans un processus worker
+                'peak_rss_bytes': max([peak_rss_bytes()] + [stage.process_peak_rss for stage in self.stages.values()]),
+                'stages': {name: stage.to_dict() for name, stage in self.stages.items()},
+                'api': {
+                    service: {
+                        'requests': sum(m.requests for m in endpoints.values()),
+                        'throttled_429': sum(m.throttled for m in endpoints.values()),
+                        'retries': sum(m.retries for m in endpoints.values()),
+                        'rate_limit_sleep_seconds': round(self.rate_limit_sleep.get(service, 0.0), 3),
+                        'endpoints': {name: m.to_dict() for name, m in endpoints.items()}
+                    }
+                    for service, endpoints in self.endpoints.items()
+                }
+            }
+
+    def save_report(self, filepath: str) -> str:
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
+        return filepath
+
+    def prometheus_lines(self) -> List[str]:
+        """Métriques au format texte Prometheus (node_exporter textfile collector)"""
+        lines = []
+        report = self.report()
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP migration_{name} {help_text}")
+            lines.append(f"# TYPE migration_{name} {kind}")
+
+        metric('stage_wall_seconds', 'gauge', 'Durée des stages (premier début au dernier fin de leurs tâches)')
+        for name, stage in report['stages'].items():
+            lines.append(f'migration_stage_wall_seconds{{stage="{name}"}} {stage["wall_seconds"]}')
+        metric('stage_rss_delta_bytes', 'gauge', 'Plus forte hausse de mémoire résidente pendant une tâche du stage')
+        for name, stage in report['stages'].items():
+            lines.append(f'migration_stage_rss_delta_bytes{{stage="{name}"}} {stage["rss_delta_bytes"]}')
+        metric('stage_records', 'gauge', 'Enregistrements traités par stage')
+        for name, stage in report['stages'].items():
+            lines.append(f'migration_stage_records{{stage="{name}"}} {stage["records"]}')
+        metric('stage_bytes_written', 'gauge', 'Octets écrits par stage')
+        for name, stage in report['stages'].items():
+            lines.append(f'migration_stage_bytes_written{{stage="{name}"}} {stage["bytes_written"]}')
+
+        metric('api_requests_total', 'counter', 'Requêtes API par endpoint')
+        for service, data in report['api'].items():
+            for endpoint, m in data['endpoints'].items():
+                lines.append(f'migration_api_requests_total{{service="{service}",endpoint="{endpoint}"}} {m["requests"]}')
+        metric('api_throttled_total', 'counter', 'Réponses 429 par service')
+        for service, data in report['api'].items():
+            lines.append(f'migration_api_throttled_total{{service="{service}"}} {data["throttled_429"]}')
+        metric('api_rate_limit_sleep_seconds', 'counter', 'Attente dans le rate limiter par service')
+        for service, data in report['api'].items():
+            lines.append(f'migration_api_rate_limit_sleep_seconds{{service="{service}"}} {data["rate_limit_sleep_seconds"]}')
+
+        metric('api_latency_seconds', 'histogram', 'Latence des requêtes API')
+        with self._lock:
+            for service, endpoints in self.endpoints.items():
+                for endpoint, m in endpoints.items():
+                    labels = f'service="{service}",endpoint="{endpoint}"'
+                    cumulative = 0
+                    for bound, count in zip((*m.latency.buckets, '+Inf'), m.latency.counts):
+                        cumulative += count
+                        lines.append(f'migration_api_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'migration_api_latency_seconds_sum{{{labels}}} {m.latency.total:.3f}')
+                    lines.append(f'migration_api_latency_seconds_count{{{labels}}} {m.latency.count}')
+
+        metric('peak_rss_bytes', 'gauge', 'Pic de mémoire résidente des processus du run')
+        lines.append(f"migration_peak_rss_bytes {report['peak_rss_bytes']}")
+        return lines
+
+    def write_prometheus(self, filepath: str) -> str:
+        # Écriture atomique: le collector ne lit jamais un fichier partiel
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.prometheus_lines()) + '\n')
+        os.replace(tmp_path, filepath)
+        return filepath
+
+    def print_summary(self):
+        """Résumé console: où est passé le temps"""
+        report = self.report()
+        print("\nTemps par stage:")
+        for name, stage in report['stages'].items():
+            rate = f", {stage['records_per_second']}/s" if stage['records_per_second'] else ""
+            tasks = f" ({stage['runs']} tâches, {stage['task_seconds']:.1f}s cumulées)" if stage['runs'] > 1 else ""
+            print(f"  {name}: {stage['wall_seconds']:.1f}s{tasks}, {stage['records']} enregistrements{rate}, "
+                  f"mémoire +{stage['rss_delta_bytes'] / 1024 / 1024:.0f} MB")
+        for service, data in report['api'].items():
+            print(f"  API {service}: {data['requests']} requêtes, {data['throttled_429']} x 429, "
+                  f"{data['retries']} retries, {data['rate_limit_sleep_seconds']:.1f}s d'attente rate limit")
+        print(f"  Pic mémoire: {report['peak_rss_bytes'] / 1024 / 1024:.0f} MB")
+
+
+_metrics = RunMetrics()
+
+
+def get_metrics() -> RunMetrics:
+    """Métriques partagées du processus"""
+    return _metrics
+
+
+def reset_metrics() -> RunMetrics:
+    """Processus worker: nouvelles métriques pour chaque tâche reçue du parent"""
+    global _metrics
+    _metrics = RunMetrics()
+    return _metrics
+
+
+def session_hook(service: str):
+    """Hook requests: enregistre chaque réponse (statut, latence, taille) pour un service"""
+    def hook(response, *args, **kwargs):
+        size = int(response.headers.get('Content-Length') or 0)
+        _metrics.record_request(service, response.url, response.request.method, response.status_code,
+                                response.elapsed.total_seconds(), size)
+        return response
+    return hook
+
+
+def instrument_session(session, service: str):
+    """Instrumenter une session requests"""
+    session.hooks['response'].append(session_hook(service))
+    return session
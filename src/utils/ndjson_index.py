@@ -0,0 +1,133 @@
+import json
+import mmap
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from src.utils.metrics import get_metrics
+from src.utils.records import json_default
+
+
+def ndjson_path(json_path: str) -> str:
+    """Chemin NDJSON associé à un fichier JSON daté (même nom, extension .ndjson)"""
+    return os.path.splitext(json_path)[0] + ".ndjson"
+
+
+def index_path(path: str) -> str:
+    """Chemin de l'index d'un fichier NDJSON (base SQLite voisine .index.db)"""
+    return f"{path}.index.db"
+
+
+def write_ndjson(records: Iterable[Dict], path: str, indexes: Dict[str, Callable[[Dict], object]] = None) -> int:
+    """
+    Écrire un enregistrement JSON par ligne et l'index des positions dans une base SQLite
+    voisine: une ligne (index, clé, offset, longueur) par position, triée par (index, clé).
+    Une clé peut pointer vers plusieurs lignes (ex: toutes les conversations d'un email).
+    Sans index (parcours seul), la base ne garde que le nombre de lignes et la taille.
+    Retourne le nombre d'enregistrements.
+    """
+    indexes = indexes or {}
+    positions = []
+    count = 0
+    offset = 0
+
+    with open(path, 'wb') as f:
+        for record in records:
+            line = json.dumps(record, ensure_ascii=False, default=json_default).encode('utf-8') + b'\n'
+            f.write(line)
+            for name, key_fn in indexes.items():
+                key = key_fn(record)
+                if key is not None:
+                    positions.append((name, str(key), offset, len(line)))
+            offset += len(line)
+            count += 1
+
+    # Base écrite à côté puis renommée: un lecteur ne voit jamais d'index partiel
+    temp_path = f"{index_path(path)}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    conn = sqlite3.connect(temp_path)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        with conn:
+            conn.execute("CREATE TABLE meta (count INTEGER NOT NULL, size INTEGER NOT NULL)")
+            conn.execute("INSERT INTO meta VALUES (?, ?)", (count, offset))
+            # Table triée par sa clé primaire (WITHOUT ROWID): chaque position stockée une seule fois
+            conn.execute("CREATE TABLE positions (name TEXT NOT NULL, key TEXT NOT NULL, offset INTEGER NOT NULL, "
+                         "length INTEGER NOT NULL, PRIMARY KEY (name, key, offset)) WITHOUT ROWID")
+            positions.sort()
+            conn.executemany("INSERT INTO positions VALUES (?, ?, ?, ?)", positions)
+    finally:
+        conn.close()
+    os.replace(temp_path, index_path(path))
+    get_metrics().add_bytes_written(offset)
+    return count
+
+
+class NdjsonReader:
+    """
+    Accès direct à un fichier NDJSON indexé: le fichier est mappé en mémoire, l'index est
+    interrogé à la demande (rien n'est chargé à l'ouverture) et seules les lignes demandées
+    sont décodées. Utilisable depuis plusieurs threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index = sqlite3.connect(f"file:{index_path(path)}?mode=ro", uri=True, check_same_thread=False)
+        self.count, size = self._index.execute("SELECT count, size FROM meta").fetchone()
+
+        self._file = open(path, 'rb')
+        # mmap refuse les fichiers vides
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _decode(self, offset: int, length: int) -> Dict:
+        return json.loads(self._map[offset:offset + length])
+
+    def keys(self, index: str) -> List[str]:
+        """Clés d'un index, dans l'ordre de leur première ligne"""
+        with self._lock:
+            rows = self._index.execute(
+                "SELECT key FROM positions WHERE name = ? GROUP BY key ORDER BY MIN(offset)", (index,)).fetchall()
+        return [key for (key,) in rows]
+
+    def get(self, index: str, key) -> List[Dict]:
+        """Enregistrements associés à une clé (liste vide si absente)"""
+        with self._lock:
+            rows = self._index.execute(
+                "SELECT offset, length FROM positions WHERE name = ? AND key = ? ORDER BY offset",
+                (index, str(key))).fetchall()
+        return [self._decode(offset, length) for offset, length in rows]
+
+    def get_one(self, index: str, key) -> Optional[Dict]:
+        records = self.get(index, key)
+        return records[0] if records else None
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Parcourir tous les enregistrements dans l'ordre du fichier"""
+        if self._map is None:
+            return
+        self._map.seek(0)
+        for line in iter(self._map.readline, b''):
+            yield json.loads(line)
+
+
+def ndjson_available(path: str) -> bool:
+    """Le fichier NDJSON et son index existent-ils"""
+    return os.path.exists(path) and os.path.exists(index_path(path))
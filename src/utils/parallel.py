@@ -0,0 +1,143 @@
+import json
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple
+from src.utils.records import json_default
+
+
+# Pool de processus partagé par les tâches du run (créé à la première utilisation).
+# Jamais de pool dans un worker: le travail parallélisable y est fait en ligne (au plus
+# `processes` processus au total, pas processes x processes)
+_pool = None
+_pool_lock = threading.Lock()
+
+# Remplace la liste d'enregistrements dans le squelette du document (échappé par json: \u0000)
+RECORDS_PLACEHOLDER = "\x00records\x00"
+
+
+def get_process_pool(processes: int) -> ProcessPoolExecutor:
+    """
+    Pool partagé: le nombre total de processus reste `processes` même si plusieurs tâches
+    du graphe l'utilisent en même temps. spawn: le parent a des threads (fork non sûr)
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def in_worker_process() -> bool:
+    """Exécuté dans un processus worker (du pool partagé ou d'un autre multiprocessing)"""
+    return multiprocessing.parent_process() is not None
+
+
+def shutdown_process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def task_label(function: Callable[[], object]) -> str:
+    """Nom d'une fonction soumise (functools.partial compris), pour ses profils"""
+    return getattr(getattr(function, 'func', function), '__name__', 'task')
+
+
+def _run_worker(function: Callable[[], object], stage: str, task: str, manifest_data: Dict, run_date: str,
+                log_to_stderr: bool) -> Tuple[object, Dict, Dict]:
+    """
+    Exécuté dans un processus du pool: la fonction travaille sur une copie du manifeste et
+    des métriques neuves. Retourne (résultat, artefacts enregistrés, mesures du stage)
+    """
+    from src.utils.metrics import reset_metrics
+    from src.utils.run_manifest import use_worker_manifest
+
+    manifest = use_worker_manifest(manifest_data, run_date)
+    previous = dict(manifest.data['artifacts'])
+    metrics = reset_metrics()
+    stdout = sys.stdout
+    # Sortie json de la CLI: le journal du parent va sur stderr, celui des workers aussi
+    if log_to_stderr:
+        sys.stdout = sys.stderr
+    try:
+        with metrics.stage(stage, task):
+            result = function()
+    finally:
+        sys.stdout.flush()
+        sys.stdout = stdout
+
+    artifacts = {key: entry for key, entry in manifest.data['artifacts'].items() if previous.get(key) != entry}
+    return result, artifacts, metrics.stages[stage].to_dict()
+
+
+def submit_in_process(function: Callable[[], object], stage: str, processes: int, task: str = None) -> Future:
+    """
+    Lancer une fonction (sérialisable: fonction de module, functools.partial) dans le pool.
+    task: nom de la tâche pour ses profils (défaut: nom de la fonction)
+    """
+    from src.utils.run_manifest import get_manifest
+    manifest = get_manifest()
+    return get_process_pool(processes).submit(
+        _run_worker, function, stage, task or task_label(function), manifest.snapshot(), manifest.get_run_date(),
+        sys.stdout is not sys.__stdout__)
+
+
+def finish_in_process(future: Future, stage: str):
+    """Attendre le résultat et reprendre artefacts et mesures dans le manifeste et les métriques du parent"""
+    from src.utils.metrics import get_metrics
+    from src.utils.run_manifest import get_manifest
+    result, artifacts, measures = future.result()
+    if artifacts:
+        get_manifest().merge_artifacts(artifacts)
+    get_metrics().merge_stage(stage, measures)
+    return result
+
+
+def run_in_process(function: Callable[[], object], stage: str, processes: int, task: str = None):
+    return finish_in_process(submit_in_process(function, stage, processes, task), stage)
+
+
+def run_in_processes(functions: Dict[str, Callable[[], object]], stage: str, processes: int) -> Dict[str, object]:
+    """
+    Exécuter des fonctions indépendantes (une par entité) en parallèle; résultats dans l'ordre des clés.
+    Depuis un worker: l'une après l'autre dans ce processus
+    """
+    if in_worker_process():
+        return {key: function() for key, function in functions.items()}
+    futures = {key: submit_in_process(function, stage, processes) for key, function in functions.items()}
+    return {key: finish_in_process(future, stage) for key, future in futures.items()}
+
+
+def chunked(records: List, size: int) -> List[List]:
+    return [records[start:start + size] for start in range(0, len(records), size)]
+
+
+def encode_chunk(records: List) -> str:
+    """
+    Lot d'éléments d'une liste de premier niveau, tel que json.dump(indent=2) l'écrit:
+    éléments indentés de 4 espaces, séparés par ",\\n" (les chaînes JSON n'ont pas de saut de ligne brut)
+    """
+    separator = ",\n    "
+    return separator.join(json.dumps(record, indent=2, ensure_ascii=False, default=json_default)
+                          .replace("\n", "\n    ") for record in records)
+
+
+def encode_json_chunked(data: Dict, records_key: str, processes: int, chunk_size: int) -> str:
+    """
+    Sérialiser un document {'metadata': ..., records_key: [...]} comme json.dump(indent=2),
+    la liste étant encodée par lots en parallèle. Le texte produit est identique octet pour octet.
+    Depuis un worker (tâche clean déjà dans le pool): lots encodés en ligne, sans pool imbriqué
+    """
+    records = data[records_key]
+    skeleton = json.dumps({**data, records_key: [RECORDS_PLACEHOLDER]}, indent=2, ensure_ascii=False,
+                          default=json_default)
+    placeholder = json.dumps(RECORDS_PLACEHOLDER)
+    if in_worker_process():
+        chunks = map(encode_chunk, chunked(records, chunk_size))
+    else:
+        chunks = get_process_pool(processes).map(encode_chunk, chunked(records, chunk_size))
+    return skeleton.replace(placeholder, ",\n    ".join(chunks), 1)
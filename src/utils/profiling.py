@@ -0,0 +1,201 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from typing import Dict, List, Optional
+from configs.config import OUTPUT_DIR, PROFILE_STAGES, PROFILE_TOP
+
+
+# Profilages en cours, par thread: cProfile suit le thread qui l'active (tâches parallèles du
+# graphe profilées chacune), tracemalloc est global au processus (partagé, arrêté par le dernier)
+_active: Dict[int, 'StageProfiler'] = {}
+_active_lock = threading.Lock()
+_own_tracemalloc = False
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def profiling_enabled(stage: str) -> bool:
+    return 'all' in PROFILE_STAGES or stage in PROFILE_STAGES
+
+
+def short_path(filename: str) -> str:
+    """Chemin relatif au projet, sinon paquet/module (ex: json/encoder.py)"""
+    if not os.path.isabs(filename):
+        return filename
+    if filename.startswith(PROJECT_DIR + os.sep):
+        return os.path.relpath(filename, PROJECT_DIR)
+    return os.sep.join(filename.split(os.sep)[-2:])
+
+
+def profile_dir() -> str:
+    """outputs/profiles/<run_id>/, à côté des artefacts et du rapport du run"""
+    from src.utils.run_manifest import get_manifest
+    run_id = get_manifest().data.get('run_id') or 'hors_run'
+    return f"{OUTPUT_DIR}/profiles/{run_id}"
+
+
+def _profile_new_thread(frame, event, arg):
+    """
+    Hook threading.setprofile (Python < 3.12): un thread démarré pendant un profilage (workers
+    d'import) a son propre profiler, rattaché à la tâche profilée si elle est seule en cours
+    """
+    sys.setprofile(None)
+    # Threads du graphe de tâches (préfixe "task"): leurs tâches se profilent elles-mêmes
+    if threading.current_thread().name.startswith("task"):
+        return
+    with _active_lock:
+        owners = list(_active.values())
+    if len(owners) == 1:
+        owners[0].profile_thread()
+
+
+class StageProfiler:
+    """
+    cProfile + tracemalloc sur une tâche d'un stage. Écrit dans profile_dir(), sous le nom
+    <stage>_<tâche> (suffixe _2, _3... si déjà pris dans le run, rien n'est écrasé):
+    .prof (pstats, lisible avec snakeviz), _profile.txt (fonctions les plus coûteuses) et
+    _memory.txt (pic et principales allocations).
+    Les threads démarrés pendant la tâche (workers d'import) ont chacun leur profiler,
+    fusionné à la fin (Python 3.12+: cProfile couvre déjà tous les threads).
+    tracemalloc voit tout le processus: si d'autres tâches tournent en même temps, leurs
+    allocations sont incluses (signalé dans _memory.txt; mesure exacte: --jobs 1).
+    """
+
+    def __init__(self, stage: str, task: str = None, top: int = PROFILE_TOP):
+        self.stage = stage
+        self.name = f"{stage}_{task}" if task and task != stage else stage
+        self.top = top
+        self.profile = cProfile.Profile()
+        self.thread_profiles: List[cProfile.Profile] = []
+        self.concurrent = False  # une autre tâche profilée a tourné pendant celle-ci
+        self.base = None
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def profile_thread(self):
+        profile = cProfile.Profile()
+        with self._lock:
+            self.thread_profiles.append(profile)
+        profile.enable()
+
+    def start(self):
+        """Démarrer dans le thread de la tâche (ValueError si cProfile est déjà pris, Python 3.12+)"""
+        global _own_tracemalloc
+        self.profile.enable()
+        with _active_lock:
+            if _active:
+                self.concurrent = True
+                for other in _active.values():
+                    other.concurrent = True
+            else:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _own_tracemalloc = True
+                tracemalloc.reset_peak()
+                if sys.version_info < (3, 12):
+                    threading.setprofile(_profile_new_thread)
+            _active[threading.get_ident()] = self
+        self._snapshot = tracemalloc.take_snapshot()
+
+    def stop(self) -> str:
+        """Arrêter, écrire les fichiers et afficher le résumé. Retourne le dossier des profils"""
+        global _own_tracemalloc
+        self.profile.disable()
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        with _active_lock:
+            _active.pop(threading.get_ident(), None)
+            if not _active:
+                threading.setprofile(None)
+                if _own_tracemalloc:
+                    tracemalloc.stop()
+                    _own_tracemalloc = False
+            directory = profile_dir()
+            os.makedirs(directory, exist_ok=True)
+            self.base = base = self._free_base(directory)
+            # Réserver le nom tout de suite: une tâche parallèle du même nom prend le suivant
+            open(f"{base}.prof", 'wb').close()
+
+        stats = pstats.Stats(self.profile)
+        for profile in self.thread_profiles:
+            stats.add(profile)
+        stats.dump_stats(f"{base}.prof")
+
+        report = io.StringIO()
+        stats.stream = report
+        print(f"Tâche {self.name}: fonctions triées par temps propre", file=report)
+        stats.sort_stats('tottime').print_stats(self.top)
+        print(f"Tâche {self.name}: fonctions triées par temps cumulé", file=report)
+        stats.sort_stats('cumulative').print_stats(self.top)
+        with open(f"{base}_profile.txt", 'w', encoding='utf-8') as f:
+            f.write(report.getvalue())
+
+        allocations = self._top_allocations(snapshot)
+        with open(f"{base}_memory.txt", 'w', encoding='utf-8') as f:
+            f.write(f"Tâche {self.name}: pic tracemalloc {peak / 1024 / 1024:.1f} MB\n")
+            if self.concurrent:
+                f.write("Attention: d'autres tâches tournaient en parallèle, leurs allocations sont "
+                        "incluses (tracemalloc couvre tout le processus; mesure exacte: --jobs 1)\n")
+            f.write("Allocations restantes en fin de tâche (par ligne):\n")
+            for stat in allocations:
+                f.write(f"{stat}\n")
+
+        self._print_summary(stats, peak, allocations)
+        return directory
+
+    def _free_base(self, directory: str) -> str:
+        """Préfixe des fichiers de la tâche, pas encore utilisé dans le dossier du run"""
+        base = f"{directory}/{self.name}"
+        attempt = 1
+        while os.path.exists(f"{base}.prof"):
+            attempt += 1
+            base = f"{directory}/{self.name}_{attempt}"
+        return base
+
+    def _top_allocations(self, snapshot) -> List:
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                   tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+                   tracemalloc.Filter(False, '<unknown>')]
+        differences = snapshot.filter_traces(filters).compare_to(self._snapshot.filter_traces(filters), 'lineno')
+        return [stat for stat in differences if stat.size_diff > 0][:self.top]
+
+    def _print_summary(self, stats: pstats.Stats, peak: int, allocations: List):
+        threads = f", {len(self.thread_profiles)} threads cumulés" if self.thread_profiles else ""
+        concurrent = ", tâches parallèles incluses" if self.concurrent else ""
+        print(f"\nProfil de {self.name} (pic mémoire {peak / 1024 / 1024:.1f} MB{concurrent}{threads}):")
+        hottest = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:5]
+        for (filename, line, function), (_, calls, own, cumulative, _) in hottest:
+            print(f"  {own:7.2f}s propre {cumulative:7.2f}s cumulé {calls:>9} appels  "
+                  f"{short_path(filename)}:{line}({function})")
+        for stat in allocations[:3]:
+            frame = stat.traceback[0]
+            print(f"  +{stat.size_diff / 1024 / 1024:.1f} MB  {short_path(frame.filename)}:{frame.lineno}")
+        print(f"  Détails: {self.base}_profile.txt")
+
+
+def start_stage_profile(stage: str, task: str = None) -> Optional[StageProfiler]:
+    """
+    Démarrer le profilage d'une tâche d'un stage s'il est demandé (PROFILE_STAGES) et que son
+    thread n'en a pas déjà un en cours. Python 3.12+: un seul profil cProfile à la fois dans le
+    processus, les tâches parallèles suivantes ne sont pas profilées
+    """
+    if not profiling_enabled(stage):
+        return None
+    with _active_lock:
+        if threading.get_ident() in _active:
+            return None
+    profiler = StageProfiler(stage, task)
+    try:
+        profiler.start()
+    except ValueError:
+        print(f"Profilage de {profiler.name} ignoré: un autre profil cProfile est actif (--jobs 1 pour tout profiler)")
+        return None
+    return profiler
+
+
+def stop_stage_profile(profiler: StageProfiler) -> str:
+    return profiler.stop()
@@ -0,0 +1,101 @@
+import sys
+import threading
+import time
+from typing import Optional
+from src.utils.metrics import get_metrics
+from configs.config import PROGRESS_INTERVAL
+
+
+def format_duration(seconds: float) -> str:
+    """Durée lisible: 45s, 12m05s, 3h20m"""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+class ProgressReporter:
+    """
+    Progression d'une boucle longue: débit (éléments/s), ETA lissée par moyenne mobile
+    exponentielle et marge restante sur le quota API du service.
+    update() ne fait qu'incrémenter un compteur; l'affichage est limité à un toutes les
+    `interval` secondes. Thread-safe (workers d'import).
+    """
+
+    def __init__(self, label: str, total: Optional[int] = None, service: str = None,
+                 rate_limit: float = None, interval: float = PROGRESS_INTERVAL, alpha: float = 0.3):
+        self.label = label
+        self.total = total
+        self.service = service
+        self.rate_limit = rate_limit  # requêtes par minute autorisées pour le service
+        self.interval = interval
+        self.alpha = alpha
+        self.done = 0
+        self.rate = None  # éléments/s lissés
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._last_draw = self.started
+        self._last_done = 0
+        self._last_requests = self._request_count()
+        self._tty = sys.stdout.isatty()
+
+    def _request_count(self) -> int:
+        return get_metrics().request_count(self.service) if self.service else 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def update(self, count: int = 1):
+        with self._lock:
+            self.done += count
+            now = time.monotonic()
+            if now - self._last_draw >= self.interval:
+                self._draw(now)
+
+    def _headroom(self, elapsed: float) -> Optional[float]:
+        """Part du quota API non utilisée depuis le dernier affichage"""
+        if not self.service or not self.rate_limit:
+            return None
+        requests = self._request_count()
+        used = (requests - self._last_requests) / elapsed * 60 / self.rate_limit
+        self._last_requests = requests
+        return max(0.0, 1.0 - used)
+
+    def _draw(self, now: float):
+        elapsed = now - self._last_draw
+        instant_rate = (self.done - self._last_done) / elapsed
+        self.rate = instant_rate if self.rate is None else self.alpha * instant_rate + (1 - self.alpha) * self.rate
+        headroom = self._headroom(elapsed)
+        self._last_draw = now
+        self._last_done = self.done
+
+        parts = [f"{self.label}: {self.done}" + (f"/{self.total} ({100 * self.done / self.total:.1f}%)"
+                                                 if self.total else "")]
+        parts.append(f"{self.rate:.1f}/s")
+        if self.total and self.rate:
+            parts.append(f"ETA {format_duration((self.total - self.done) / self.rate)}")
+        if headroom is not None:
+            parts.append(f"quota {self.service}: {100 * headroom:.0f}% libre")
+        line = " | ".join(parts)
+
+        if self._tty:
+            sys.stdout.write(f"\r{line:<100}")
+            sys.stdout.flush()
+        else:
+            print(line)
+
+    def close(self):
+        """Ligne finale: total traité, durée et débit moyen"""
+        elapsed = time.monotonic() - self.started
+        average = self.done / elapsed if elapsed else 0.0
+        line = f"{self.label}: {self.done} traités en {format_duration(elapsed)} ({average:.1f}/s)"
+        if self._tty:
+            sys.stdout.write(f"\r{line:<100}\n")
+            sys.stdout.flush()
+        else:
+            print(line)
@@ -0,0 +1,255 @@
+from typing import Callable, Dict, Iterable, List, Tuple
+
+
+class Field:
+    """
+    Valeur au chemin pointé `path` ('source.author.name'). Parents absents ou non dict:
+    lus comme {}. default: valeur si la clé finale est absente (littéral JSON, neuf à chaque appel)
+    """
+
+    def __init__(self, path: str, default=None):
+        self.path = path
+        self.default = default
+
+
+class Pluck(Field):
+    """Aplatir une liste de dicts en liste de valeurs: [item.get(key, default) for item in path]"""
+
+    def __init__(self, path: str, key: str, default=None):
+        super().__init__(path)
+        self.key = key
+        self.item_default = default
+
+
+class First(Field):
+    """Valeur `key` du premier élément de la liste `path` (None si vide ou absente)"""
+
+    def __init__(self, path: str, key: str):
+        super().__init__(path)
+        self.key = key
+
+
+class Each(Field):
+    """
+    Sous-liste projetée élément par élément avec son propre schéma.
+    where=(champ, valeurs): garder seulement les éléments dont le champ est dans valeurs
+    """
+
+    def __init__(self, path: str, schema: Dict, where: Tuple[str, Tuple] = None):
+        super().__init__(path)
+        self.schema = schema
+        self.where = where
+
+
+class KeyValues(Field):
+    """
+    Liste de paires [{key: k, value: v}, ...] aplatie en dict {k: v}; rename: clés renommées.
+    Une clé répétée garde sa première position et sa dernière valeur
+    """
+
+    def __init__(self, path: str, key: str = 'field', value: str = 'value', rename: Dict[str, str] = None):
+        super().__init__(path)
+        self.key = key
+        self.value = value
+        self.rename = rename or {}
+
+
+class Count:
+    """Nombre d'éléments d'un champ de sortie déclaré plus haut dans le même schéma"""
+
+    def __init__(self, field: str):
+        self.field = field
+
+
+class Compute:
+    """
+    Échappatoire: valeur calculée par function(enregistrement source). La fonction peut être
+    appelée deux fois pour un même enregistrement (repli de la version rapide): sans effet de bord
+    """
+
+    def __init__(self, function: Callable[[Dict], object]):
+        self.function = function
+
+
+LITERAL_TYPES = (type(None), bool, int, float, str)
+
+
+def _literal(value) -> str:
+    """Source Python d'un défaut: les listes/dicts sont recréés à chaque appel (jamais partagés)"""
+    if isinstance(value, LITERAL_TYPES) or (isinstance(value, (list, dict)) and not value):
+        return repr(value)
+    raise ValueError(f"Défaut de projection non littéral: {value!r}")
+
+
+class _Scope:
+    """Enregistrement en cours de lecture: variable du dict, parents déjà lus, indentation"""
+
+    def __init__(self, record: str, indent: int):
+        self.record = record
+        self.indent = indent
+        self.parents = {(): record}
+        self.known = {}
+
+
+class _Compiler:
+    """
+    Génère le source d'une fonction de projection, en deux versions du même schéma:
+    - rapide: accès direct record['clé'], sans défaut ni contrôle de type (cas courant: les
+      exports ont toutes les clés). Une clé absente ou un type inattendu lève KeyError/TypeError
+    - tolérante (repli): record.get('clé', défaut), parents absents ou non dict lus comme {}
+    Dans les deux: parents des chemins pointés lus une seule fois, sous-listes en boucles en
+    ligne (pas d'appel de fonction par élément), chaque objet construit en un seul littéral dict.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.namespace = {'_EMPTY': {}}
+        self.lines = []
+        self.counter = 0
+        self.strict = True
+
+    def _local(self, prefix: str) -> str:
+        self.counter += 1
+        return f"{prefix}{self.counter}"
+
+    def _constant(self, value) -> str:
+        name = self._local('_c')
+        self.namespace[name] = value
+        return name
+
+    def _emit(self, scope: _Scope, line: str, extra: int = 0):
+        self.lines.append("    " * (scope.indent + extra) + line)
+
+    def _parent(self, scope: _Scope, parts: Tuple[str, ...]) -> str:
+        """Variable du dict parent d'un chemin (lue au premier usage)"""
+        if parts not in scope.parents:
+            parent = self._parent(scope, parts[:-1])
+            var = self._local('p')
+            if self.strict:
+                self._emit(scope, f"{var} = {parent}[{parts[-1]!r}]")
+            else:
+                self._emit(scope, f"{var} = {parent}.get({parts[-1]!r})")
+                self._emit(scope, f"{var} = {var} if type({var}) is dict else _EMPTY")
+            scope.parents[parts] = var
+        return scope.parents[parts]
+
+    def _read(self, scope: _Scope, path: str, default=None) -> str:
+        if default is None and path in scope.known:
+            return scope.known[path]
+        parts = tuple(path.split('.'))
+        parent = self._parent(scope, parts[:-1])
+        if self.strict:
+            return f"{parent}[{parts[-1]!r}]"
+        if default is None:
+            return f"{parent}.get({parts[-1]!r})"
+        return f"{parent}.get({parts[-1]!r}, {_literal(default)})"
+
+    def _fetch(self, scope: _Scope, path: str) -> str:
+        var = self._local('v')
+        self._emit(scope, f"{var} = {self._read(scope, path)}")
+        return var
+
+    def _iterable(self, var: str) -> str:
+        return var if self.strict else f"({var} if type({var}) is list else ())"
+
+    def _item(self, item: str, key: str, default=None) -> str:
+        if self.strict:
+            return f"{item}[{key!r}]"
+        if default is None:
+            return f"{item}.get({key!r})"
+        return f"{item}.get({key!r}, {_literal(default)})"
+
+    def _each(self, scope: _Scope, spec: Each) -> str:
+        source = self._fetch(scope, spec.path)
+        output = self._local('o')
+        item = self._local('i')
+        self._emit(scope, f"{output} = []")
+        self._emit(scope, f"for {item} in {self._iterable(source)}:")
+        inner = _Scope(item, scope.indent + 1)
+        if spec.where:
+            field, values = spec.where
+            # Valeur du filtre réutilisée si le sous-schéma lit le même champ
+            value = self._local('w')
+            self._emit(inner, f"{value} = {self._item(item, field)}")
+            self._emit(inner, f"if {value} in {tuple(values)!r}:")
+            inner.indent += 1
+            inner.known[field] = value
+        self._emit(inner, f"{output}.append({self._object(inner, spec.schema)})")
+        return output
+
+    def _value(self, scope: _Scope, spec, outputs: Dict[str, str]) -> str:
+        """Expression (ou variable locale) de la valeur d'un champ de sortie"""
+        if isinstance(spec, str):
+            spec = Field(spec)
+        if isinstance(spec, dict):
+            return self._object(scope, spec)
+        if isinstance(spec, Count):
+            return f"len({outputs[spec.field]})"
+        if isinstance(spec, Compute):
+            return f"{self._constant(spec.function)}({scope.record})"
+        if isinstance(spec, Each):
+            return self._each(scope, spec)
+        if isinstance(spec, Pluck):
+            var = self._fetch(scope, spec.path)
+            values = f"[{self._item('item', spec.key, spec.item_default)} for item in {var}]"
+            return values if self.strict else f"{values} if type({var}) is list else []"
+        if isinstance(spec, First):
+            var = self._fetch(scope, spec.path)
+            return f"{self._item(f'{var}[0]', spec.key)} if {var} else None"
+        if isinstance(spec, KeyValues):
+            var = self._fetch(scope, spec.path)
+            key = self._item('item', spec.key)
+            if spec.rename:
+                key = f"{self._constant(spec.rename)}.get({key}, {key})"
+            values = f"{{{key}: {self._item('item', spec.value)} for item in {var}}}"
+            return values if self.strict else f"{values} if type({var}) is list else {{}}"
+        if isinstance(spec, Field):
+            return self._read(scope, spec.path, spec.default)
+        raise TypeError(f"Spécification de projection inconnue: {spec!r}")
+
+    def _object(self, scope: _Scope, schema: Dict) -> str:
+        """Littéral dict d'un objet de sortie (les lectures préalables sont émises dans scope)"""
+        counted = {spec.field for spec in schema.values() if isinstance(spec, Count)}
+        outputs = {}
+        for key, spec in schema.items():
+            value = self._value(scope, spec, outputs)
+            # Un champ compté plus loin (Count) est d'abord affecté à une variable locale
+            if key in counted and not value.isidentifier():
+                var = self._local('o')
+                self._emit(scope, f"{var} = {value}")
+                value = var
+            outputs[key] = value
+        return "{" + ", ".join(f"{key!r}: {value}" for key, value in outputs.items()) + "}"
+
+    def compile(self, schema: Dict) -> str:
+        self.lines.append("    try:")
+        scope = _Scope('record', 2)
+        self._emit(scope, f"return {self._object(scope, schema)}")
+        self.lines.append("    except (KeyError, TypeError):")
+        self.lines.append("        pass")
+        self.strict = False
+        scope = _Scope('record', 1)
+        self._emit(scope, f"return {self._object(scope, schema)}")
+        return f"def {self.name}(record):\n" + "\n".join(self.lines)
+
+
+def compile_projection(schema: Dict, name: str = 'project') -> Callable[[Dict], Dict]:
+    """
+    Compiler un schéma de nettoyage {champ de sortie: spécification} en fonction Python:
+    le source généré n'a ni boucle sur le schéma ni résolution de chemin à l'exécution.
+    Spécifications: chemin pointé (str), Field, Pluck, First, Each, KeyValues, Count,
+    Compute, ou dict imbriqué (objet de sortie dont les chemins partent de l'enregistrement).
+    La fonction garde son source dans .source (lecture, débogage)
+    """
+    compiler = _Compiler(name)
+    source = compiler.compile(schema)
+    exec(compile(source, f"<projection {name}>", 'exec'), compiler.namespace)
+    function = compiler.namespace[name]
+    function.source = source
+    return function
+
+
+def project_records(projection: Callable[[Dict], Dict], records: Iterable[Dict]) -> List[Dict]:
+    """Projeter un flux d'enregistrements (chaque source est libérée dès sa projection)"""
+    return [projection(record) for record in records]
+
@@ -0,0 +1,32 @@
+import threading
+import time
+from src.utils.metrics import get_metrics
+
+
+class RateLimiter:
+    """
+    Intervalle minimal entre deux requêtes d'un client (requêtes par minute).
+    Thread-safe; le temps passé à attendre est compté dans les métriques du service.
+    """
+
+    def __init__(self, requests_per_minute: float, service: str):
+        self.service = service
+        self.rate = requests_per_minute / 60  # requêtes par seconde
+        self.last_request = 0
+        self.slept = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> float:
+        """Attendre le prochain créneau; retourne la durée d'attente"""
+        with self._lock:
+            sleep_time = 1 / self.rate - (time.time() - self.last_request)
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            else:
+                sleep_time = 0.0
+            self.last_request = time.time()
+
+        if sleep_time:
+            self.slept += sleep_time
+            get_metrics().record_rate_limit_sleep(self.service, sleep_time)
+        return sleep_time
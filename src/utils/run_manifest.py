@@ -0,0 +1,201 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+from src.utils.metrics import get_metrics
+from src.utils.helpers import save_json, get_timestamp, find_latest_file
+from configs.config import OUTPUT_DIR
+
+
+MANIFEST_PATH = f"{OUTPUT_DIR}/run_manifest.json"
+
+
+# Checksums déjà calculés: {chemin absolu: [taille, mtime_ns, sha256]}, conservés dans le manifeste
+_checksums: Dict[str, List] = {}
+_checksums_lock = threading.Lock()
+
+
+def file_checksum(filepath: str) -> str:
+    """
+    SHA-256 d'un fichier, lu par blocs. Mémorisé par (chemin, taille, mtime_ns): un fichier
+    inchangé n'est relu ni par les vérifications successives d'un run, ni par les runs suivants
+    """
+    path = os.path.abspath(filepath)
+    stat = os.stat(path)
+    with _checksums_lock:
+        cached = _checksums.get(path)
+    if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    with _checksums_lock:
+        _checksums[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+    return digest.hexdigest()
+
+
+def _known_checksums() -> Dict[str, List]:
+    """Checksums mémorisés des fichiers encore présents, à écrire dans le manifeste"""
+    with _checksums_lock:
+        return {path: cached for path, cached in _checksums.items() if os.path.exists(path)}
+
+
+class RunManifest:
+    """
+    Manifeste des artefacts produits par les stages: chemin, nombre d'enregistrements,
+    checksum, stage producteur et checksums des entrées utilisées.
+    La clé d'un artefact est le préfixe de son fichier (ex: zendesk_tickets_clean).
+    """
+
+    def __init__(self, path: Optional[str] = MANIFEST_PATH, data: Dict = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.run_date = None
+        self.data = {'run_id': None, 'run_date': None, 'artifacts': {}, 'tasks': {}}
+
+        if data is not None:
+            self.data.update(data)
+        elif os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.data.update(json.load(f))
+
+        with _checksums_lock:
+            for cached_path, cached in self.data.get('checksums', {}).items():
+                _checksums.setdefault(cached_path, cached)
+
+    def start_run(self) -> str:
+        """Démarrer un run: la date des fichiers produits reste fixe jusqu'à la fin"""
+        with self._lock:
+            self.run_date = get_timestamp()
+            self.data['run_id'] = get_timestamp(True)
+            self.data['run_date'] = self.run_date
+            self._save()
+        print(f"Run {self.data['run_id']} (manifeste: {self.path})")
+        return self.data['run_id']
+
+    def get_run_date(self) -> str:
+        """Date utilisée pour nommer les fichiers du run en cours"""
+        return self.run_date or get_timestamp()
+
+    def resolve(self, key: str, default_path: str) -> str:
+        """
+        Chemin d'entrée d'un stage: artefact du manifeste, sinon le fichier du jour,
+        sinon le plus récent fichier daté du même dossier.
+        """
+        entry = self.data['artifacts'].get(key)
+        if entry and os.path.exists(entry['path']):
+            return entry['path']
+        if os.path.exists(default_path):
+            return default_path
+        latest = find_latest_file(os.path.dirname(default_path), key)
+        return latest or default_path
+
+    def up_to_date(self, key: str, input_paths: List[str]) -> Optional[str]:
+        """Chemin de l'artefact si ni lui ni ses entrées n'ont changé depuis sa production"""
+        entry = self.data['artifacts'].get(key)
+        if not entry or not os.path.exists(entry['path']):
+            return None
+        if any(not os.path.exists(path) for path in input_paths):
+            return None
+        if file_checksum(entry['path']) != entry['checksum']:
+            return None
+
+        current_inputs = {path: file_checksum(path) for path in input_paths}
+        if current_inputs != entry.get('inputs'):
+            return None
+        return entry['path']
+
+    def recorded(self, key: str) -> Optional[Dict]:
+        """
+        Entrée du manifeste d'un artefact (path, inputs {chemin: checksum}...), seulement si son
+        fichier existe encore tel qu'il a été enregistré
+        """
+        entry = self.data['artifacts'].get(key)
+        if not entry or not os.path.exists(entry['path']):
+            return None
+        if file_checksum(entry['path']) != entry['checksum']:
+            return None
+        return copy.deepcopy(entry)
+
+    def record(self, key: str, filepath: str, count: int, stage: str, input_paths: List[str] = None):
+        """Enregistrer un artefact produit par un stage"""
+        entry = {
+            'path': filepath,
+            'count': count,
+            'checksum': file_checksum(filepath),
+            'stage': stage,
+            'produced_at': get_timestamp(True),
+            'inputs': {path: file_checksum(path) for path in (input_paths or [])}
+        }
+        with self._lock:
+            self.data['artifacts'][key] = entry
+            self._save()
+
+    def record_task(self, name: str, inputs: Dict[str, Optional[str]], seconds: float):
+        """Enregistrer l'exécution réussie d'une tâche du graphe et le hash de ses entrées"""
+        with self._lock:
+            self.data['tasks'][name] = {'inputs': inputs, 'seconds': seconds, 'completed_at': get_timestamp(True)}
+            self._save()
+
+    def snapshot(self) -> Dict:
+        """Copie des données, pour un processus worker (même run, mêmes artefacts)"""
+        with self._lock:
+            return copy.deepcopy(self.data)
+
+    def merge_artifacts(self, entries: Dict[str, Dict]):
+        """Reprendre les artefacts enregistrés par un processus worker"""
+        with self._lock:
+            self.data['artifacts'].update(entries)
+            self._save()
+
+    def _save(self):
+        # Manifeste d'un worker (path None): en mémoire, le parent reprend ses artefacts
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.data['checksums'] = _known_checksums()
+        save_json(self.data, self.path)
+
+
+_manifest = None
+
+
+def get_manifest() -> RunManifest:
+    """Manifeste partagé du processus"""
+    global _manifest
+    if _manifest is None:
+        _manifest = RunManifest()
+    return _manifest
+
+
+def use_worker_manifest(data: Dict, run_date: str) -> RunManifest:
+    """Processus worker: manifeste copié du parent, jamais écrit sur disque"""
+    global _manifest
+    _manifest = RunManifest(path=None, data=data)
+    _manifest.run_date = run_date
+    return _manifest
+
+
+def get_run_date() -> str:
+    return get_manifest().get_run_date()
+
+
+def resolve_artifact(key: str, default_path: str) -> str:
+    return get_manifest().resolve(key, default_path)
+
+
+def up_to_date_artifact(key: str, input_paths: List[str]) -> Optional[str]:
+    return get_manifest().up_to_date(key, input_paths)
+
+
+def recorded_artifact(key: str) -> Optional[Dict]:
+    return get_manifest().recorded(key)
+
+
+def record_artifact(key: str, filepath: str, count: int, stage: str, input_paths: List[str] = None):
+    get_metrics().add_records(count)
+    get_manifest().record(key, filepath, count, stage, input_paths)
@@ -0,0 +1,247 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from src.utils.metrics import get_metrics
+from src.utils.ndjson_index import NdjsonReader, ndjson_available, ndjson_path
+from src.utils.records import json_default
+from src.utils.run_manifest import file_checksum
+from configs.config import OUTPUT_DIR, STAGING_BACKEND, STAGING_BATCH_SIZE
+
+
+STAGING_DB_PATH = f"{OUTPUT_DIR}/staging.db"
+TABLES = ('raw', 'clean', 'transformed', 'prepared')
+
+
+def default_record_key(record: Dict):
+    """Clé source par défaut: id, sinon email (contacts préparés)"""
+    return record.get('id') if record.get('id') is not None else record.get('email')
+
+
+class StagingStore:
+    """
+    Stockage intermédiaire SQLite: une table par stage (raw, clean, transformed, prepared),
+    une ligne par enregistrement, indexée par entité + ID source, email et updated_at.
+    La table staging_meta garde le fichier JSON dont chaque entité est la copie (chemin, taille,
+    mtime, checksum): les lectures ne passent par SQLite que pour ce fichier-là.
+    """
+
+    def __init__(self, path: str = STAGING_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.conn:
+            for table in TABLES:
+                self.conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        entity TEXT NOT NULL,
+                        source_id TEXT NOT NULL,
+                        email TEXT,
+                        updated_at TEXT,
+                        data TEXT NOT NULL,
+                        PRIMARY KEY (entity, source_id)
+                    )""")
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_email ON {table} (entity, email)")
+                self.conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{table}_updated_at ON {table} (entity, updated_at)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS staging_meta (
+                    stage TEXT NOT NULL,
+                    entity TEXT NOT NULL,
+                    source_path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    checksum TEXT NOT NULL,
+                    PRIMARY KEY (stage, entity)
+                )""")
+
+    @staticmethod
+    def _check_table(table: str):
+        if table not in TABLES:
+            raise ValueError(f"Table de staging inconnue: {table}")
+
+    @staticmethod
+    def _row(entity: str, record: Dict, key: Callable[[Dict], object]) -> Tuple:
+        updated_at = record.get('updated_at') or record.get('created_at')
+        return (
+            entity,
+            str(key(record)),
+            record.get('email') or record.get('contact_email'),
+            str(updated_at) if updated_at is not None else None,
+            json.dumps(record, ensure_ascii=False, default=json_default)
+        )
+
+    def write_records(self, table: str, entity: str, records: List[Dict],
+                      key: Callable[[Dict], object] = default_record_key,
+                      replace_entity: bool = False, batch_size: int = STAGING_BATCH_SIZE,
+                      source_path: str = None) -> int:
+        """
+        Écrire des enregistrements par lots (replace_entity: remplace toute l'entité).
+        source_path: fichier JSON dont les lignes sont la copie, enregistré dans la même transaction
+        """
+        self._check_table(table)
+        query = f"INSERT OR REPLACE INTO {table} (entity, source_id, email, updated_at, data) VALUES (?, ?, ?, ?, ?)"
+        source = None
+        if source_path:
+            stat = os.stat(source_path)
+            source = (table, entity, os.path.abspath(source_path), stat.st_size, stat.st_mtime_ns,
+                      file_checksum(source_path))
+
+        with self._lock, self.conn:
+            if replace_entity:
+                self.conn.execute(f"DELETE FROM {table} WHERE entity = ?", (entity,))
+                self.conn.execute("DELETE FROM staging_meta WHERE stage = ? AND entity = ?", (table, entity))
+            for start in range(0, len(records), batch_size):
+                batch = records[start:start + batch_size]
+                self.conn.executemany(query, [self._row(entity, record, key) for record in batch])
+            if source:
+                self.conn.execute("INSERT OR REPLACE INTO staging_meta VALUES (?, ?, ?, ?, ?, ?)", source)
+        return len(records)
+
+    def staged_from(self, table: str, entity: str, json_path: str) -> bool:
+        """
+        Les lignes d'une entité sont-elles la copie de ce fichier JSON, dans son état actuel?
+        Même chemin, taille et mtime: oui sans relire le fichier; sinon comparaison du checksum
+        """
+        self._check_table(table)
+        row = self.conn.execute(
+            "SELECT source_path, size, mtime_ns, checksum FROM staging_meta WHERE stage = ? AND entity = ?",
+            (table, entity)).fetchone()
+        if not row or not os.path.exists(json_path) or row[0] != os.path.abspath(json_path):
+            return False
+        stat = os.stat(json_path)
+        if (stat.st_size, stat.st_mtime_ns) == (row[1], row[2]):
+            return True
+        return stat.st_size == row[1] and file_checksum(json_path) == row[3]
+
+    def iter_records(self, table: str, entity: str, where: str = "", params: Tuple = (),
+                     batch_size: int = STAGING_BATCH_SIZE, object_hook: Callable = None) -> Iterator[Dict]:
+        """Parcourir les enregistrements d'une entité par lots (ordre d'insertion)"""
+        self._check_table(table)
+        cursor = self.conn.execute(
+            f"SELECT data FROM {table} WHERE entity = ? {where} ORDER BY rowid", (entity, *params))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for (data,) in rows:
+                yield json.loads(data, object_hook=object_hook)
+
+    def read_records(self, table: str, entity: str, object_hook: Callable = None) -> List[Dict]:
+        return list(self.iter_records(table, entity, object_hook=object_hook))
+
+    def get_record(self, table: str, entity: str, source_id) -> Optional[Dict]:
+        """Lire un enregistrement par ID source"""
+        self._check_table(table)
+        row = self.conn.execute(
+            f"SELECT data FROM {table} WHERE entity = ? AND source_id = ?", (entity, str(source_id))).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find_by_email(self, table: str, entity: str, email: str) -> List[Dict]:
+        """Lire les enregistrements d'une entité liés à un email"""
+        return list(self.iter_records(table, entity, "AND email = ?", (email,)))
+
+    def updated_since(self, table: str, entity: str, updated_at: str) -> Iterator[Dict]:
+        """Enregistrements modifiés depuis une date (pour les re-runs partiels)"""
+        return self.iter_records(table, entity, "AND updated_at > ?", (str(updated_at),))
+
+    def count(self, table: str, entity: str) -> int:
+        self._check_table(table)
+        return self.conn.execute(f"SELECT COUNT(*) FROM {table} WHERE entity = ?", (entity,)).fetchone()[0]
+
+    def contact_index(self) -> Tuple[Dict, Dict]:
+        """Index zendesk_id/intercom_id -> email des contacts préparés, sans décoder les documents"""
+        zendesk_index = {}
+        intercom_index = {}
+        rows = self.conn.execute(
+            "SELECT json_extract(data, '$.zendesk_id'), json_extract(data, '$.intercom_id'), "
+            "json_extract(data, '$.merged_ids'), email FROM prepared WHERE entity = 'chatwoot_contacts'")
+        for zendesk_id, intercom_id, merged_ids, email in rows:
+            if zendesk_id:
+                zendesk_index[zendesk_id] = email
+            if intercom_id:
+                intercom_index[intercom_id] = email
+            if merged_ids:
+                merged_ids = json.loads(merged_ids)
+                for merged_id in merged_ids.get('zendesk', []):
+                    zendesk_index[merged_id] = email
+                for merged_id in merged_ids.get('intercom', []):
+                    intercom_index[merged_id] = email
+        return zendesk_index, intercom_index
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def use_staging_store() -> bool:
+    """Le backend SQLite est-il activé (STAGING_BACKEND=sqlite)"""
+    return STAGING_BACKEND == 'sqlite'
+
+
+def get_store() -> StagingStore:
+    """Store partagé du processus"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StagingStore()
+    return _store
+
+
+def load_records(table: str, entity: str, json_path: str, json_key: str,
+                 object_hook: Callable = None) -> List[Dict]:
+    """
+    Charger les entrées d'un stage: SQLite si activé et alimenté depuis ce même fichier JSON
+    (staged_from), sinon le fichier JSON.
+    object_hook: conversion à la lecture (ex: messages en enregistrements compacts, src.utils.records)
+    """
+    if use_staging_store():
+        store = get_store()
+        if store.staged_from(table, entity, json_path):
+            print(f"Lecture staging SQLite: {table}/{entity}")
+            return store.read_records(table, entity, object_hook)
+
+    get_metrics().add_bytes_read(os.path.getsize(json_path))
+    with open(json_path, 'r', encoding='utf-8') as f:
+        return json.load(f, object_hook=object_hook).get(json_key, [])
+
+
+def stream_records(table: str, entity: str, json_path: str, json_key: str) -> Iterator[Dict]:
+    """
+    Parcourir les entrées d'un stage une par une: SQLite par lots si activé et alimenté depuis
+    ce même fichier JSON, sinon
+    la copie NDJSON de l'export (EXPORT_NDJSON, pas plus ancienne que le JSON), ligne par
+    ligne; à défaut le fichier JSON. Chaque enregistrement peut être libéré après usage.
+    """
+    if use_staging_store():
+        store = get_store()
+        if store.staged_from(table, entity, json_path):
+            print(f"Lecture staging SQLite: {table}/{entity}")
+            yield from store.iter_records(table, entity)
+            return
+
+    path = ndjson_path(json_path)
+    if ndjson_available(path) and os.path.getmtime(path) >= os.path.getmtime(json_path):
+        get_metrics().add_bytes_read(os.path.getsize(path))
+        with NdjsonReader(path) as reader:
+            yield from reader
+        return
+
+    yield from load_records(table, entity, json_path, json_key)
+
+
+def stage_records(table: str, entity: str, records: List[Dict], json_path: str,
+                  key: Callable[[Dict], object] = default_record_key):
+    """
+    Enregistrer la sortie complète d'un stage dans SQLite si le backend est activé.
+    json_path: fichier JSON déjà écrit dont les lignes sont la copie
+    """
+    if use_staging_store():
+        get_store().write_records(table, entity, records, key, replace_entity=True, source_path=json_path)
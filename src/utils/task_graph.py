@@ -0,0 +1,168 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+from src.utils.metrics import get_metrics
+from src.utils.parallel import run_in_process
+from src.utils.run_manifest import file_checksum, get_manifest
+
+
+class Task:
+    """
+    Tâche du pipeline. inputs/outputs sont des clés d'artefacts du manifeste
+    (ex: zendesk_tickets -> zendesk_tickets_clean); les dépendances en sont déduites.
+    always: toujours exécutée (exports: la source est l'API, pas un fichier).
+    pool: ressource partagée (ex: API Zendesk) dont une seule tâche à la fois peut disposer.
+    process: exécutable dans un processus séparé (run sérialisable, travail CPU sur de gros fichiers).
+    """
+
+    def __init__(self, name: str, stage: str, run: Callable[[], object], inputs: List[str] = None,
+                 outputs: List[str] = None, source: str = None, always: bool = False, pool: str = None,
+                 process: bool = False):
+        self.name = name
+        self.stage = stage
+        self.run = run
+        self.inputs = inputs or []
+        self.outputs = outputs or []
+        self.source = source
+        self.always = always
+        self.pool = pool
+        self.process = process
+
+
+def artifact_checksum(key: str) -> Optional[str]:
+    """Hash du contenu actuel d'un artefact du manifeste (None s'il n'existe pas)"""
+    entry = get_manifest().data['artifacts'].get(key)
+    if not entry or not os.path.exists(entry['path']):
+        return None
+    return file_checksum(entry['path'])
+
+
+class TaskGraph:
+    """
+    Ordonnanceur façon make: exécute les tâches dès que leurs dépendances sont terminées
+    (en parallèle jusqu'à `jobs`) et ignore celles dont le contenu des entrées n'a pas changé
+    depuis leur dernière exécution réussie (hashes dans la section 'tasks' du manifeste).
+    """
+
+    def __init__(self, tasks: List[Task]):
+        self.tasks = {task.name: task for task in tasks}
+        producers = {key: task.name for task in tasks for key in task.outputs}
+        # Entrée sans producteur dans le graphe: artefact existant (run précédent)
+        self.dependencies = {task.name: {producers[key] for key in task.inputs if key in producers}
+                             for task in tasks}
+        self.order = self.topological_order()
+
+    def topological_order(self) -> List[str]:
+        """Tâches triées de façon à ce que chacune suive ses dépendances (ordre de déclaration sinon)"""
+        order, done = [], set()
+        while len(order) < len(self.tasks):
+            ready = [name for name in self.tasks
+                     if name not in done and self.dependencies[name] <= done]
+            if not ready:
+                cycle = [name for name in self.tasks if name not in done]
+                raise ValueError(f"Dépendances circulaires entre tâches: {', '.join(cycle)}")
+            order.extend(ready)
+            done.update(ready)
+        return order
+
+    def select(self, stages: List[str] = None, sources: List[str] = None) -> 'TaskGraph':
+        """Sous-graphe: tâches des stages et sources demandés (tâches sans source toujours gardées)"""
+        return TaskGraph([task for task in self.tasks.values()
+                          if (not stages or task.stage in stages)
+                          and (not sources or task.source is None or task.source in sources)])
+
+    def without(self, names: List[str]) -> 'TaskGraph':
+        return TaskGraph([task for task in self.tasks.values() if task.name not in names])
+
+    def input_checksums(self, task: Task) -> Dict[str, Optional[str]]:
+        return {key: artifact_checksum(key) for key in task.inputs}
+
+    def is_up_to_date(self, task: Task) -> bool:
+        """Entrées identiques (contenu) à la dernière exécution et sorties intactes"""
+        if task.always:
+            return False
+        previous = get_manifest().data.get('tasks', {}).get(task.name)
+        if not previous or previous['inputs'] != self.input_checksums(task):
+            return False
+        artifacts = get_manifest().data['artifacts']
+        for key in task.outputs:
+            entry = artifacts.get(key)
+            if not entry or artifact_checksum(key) != entry['checksum']:
+                return False
+        return True
+
+    def record(self, task: Task, seconds: float):
+        get_manifest().record_task(task.name, self.input_checksums(task), round(seconds, 3))
+
+    def run_task(self, task: Task, force: bool, processes: int = 1) -> str:
+        """
+        Exécuter une tâche dans son stage (métriques, profilage). Retourne son statut.
+        processes > 1: les tâches process=True passent par le pool de processus partagé.
+        Une tâche qui retourne False (ex: connexion Chatwoot échouée) est en échec
+        """
+        if not force and self.is_up_to_date(task):
+            print(f"Tâche ignorée (entrées inchangées): {task.name}")
+            return 'ignorée'
+        started = time.perf_counter()
+        in_process = task.process and processes > 1
+        with get_metrics().stage(task.stage, task.name, profile=not in_process):
+            if in_process:
+                result = run_in_process(task.run, task.stage, processes, task.name)
+            else:
+                result = task.run()
+        if result is False:
+            raise RuntimeError(f"{task.name} a signalé un échec")
+        self.record(task, time.perf_counter() - started)
+        return 'ok'
+
+    def run(self, jobs: int = 1, force: bool = False, processes: int = 1) -> Dict[str, str]:
+        """
+        Exécuter le graphe. Une tâche en échec bloque ses descendantes, pas les branches
+        indépendantes. Retourne le statut de chaque tâche (ok, ignorée, échec, bloquée)
+        """
+        status: Dict[str, str] = {}
+        pending = {name: self.dependencies[name] for name in self.order}
+        running = {}
+        busy_pools = set()
+
+        with ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="task") as executor:
+            while pending or running:
+                for name, dependencies in list(pending.items()):
+                    if len(running) >= max(1, jobs):
+                        break
+                    task = self.tasks[name]
+                    if any(status.get(dependency) in ('échec', 'bloquée') for dependency in dependencies):
+                        status[name] = 'bloquée'
+                        del pending[name]
+                        print(f"Tâche bloquée (dépendance en échec): {name}")
+                        continue
+                    if not all(dependency in status for dependency in dependencies) or task.pool in busy_pools:
+                        continue
+                    del pending[name]
+                    if task.pool:
+                        busy_pools.add(task.pool)
+                    running[executor.submit(self.run_task, task, force, processes)] = task
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    busy_pools.discard(task.pool)
+                    try:
+                        status[task.name] = future.result()
+                    except Exception as e:
+                        status[task.name] = 'échec'
+                        print(f"Erreur tâche {task.name}: {e}")
+        return status
+
+
+def print_task_summary(status: Dict[str, str]):
+    counts = {}
+    for result in status.values():
+        counts[result] = counts.get(result, 0) + 1
+    print("\nTâches: " + ", ".join(f"{count} {result}" for result, count in counts.items()))
+    for name, result in status.items():
+        if result in ('échec', 'bloquée'):
+            print(f"  {name}: {result}")